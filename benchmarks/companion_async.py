@@ -0,0 +1,77 @@
+"""Companion concurrency benchmark: many simultaneous conversations against a local fake model.
+
+The model is mental_health_ai's LocalClient / AsyncLocalClient with a fixed latency per
+completion, so the numbers show how much waiting on the provider overlaps. The blocking
+path (update_memory_with_gpt, one call at a time) is timed on a sample of turns.
+
+    python benchmarks/companion_async.py [--conversations N] [--turns T] [--latency S] [--concurrency C]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mental_health_ai as mha  # noqa: E402
+
+MESSAGES = [
+    "I can't stop thinking about the night the water came in",
+    "my sister is staying with us now and the house feels crowded",
+    "some days I feel okay and then it all comes back",
+    "I don't know how to talk to my kids about it",
+]
+
+
+async def run_async(conversations: int, turns: int, latency: float, concurrency: int):
+    service = mha.AsyncCompanion(mha.SessionStore(None), max_concurrency=concurrency,
+                                 client=mha.AsyncLocalClient(delay=latency))
+    latencies = []
+
+    async def conversation(i: int):
+        for turn in range(turns):
+            start = time.perf_counter()
+            await service.reply(f"user{i}", MESSAGES[(i + turn) % len(MESSAGES)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(conversations)))
+    return time.perf_counter() - start, latencies, service.peak_in_flight
+
+
+def run_blocking(turns: int, latency: float) -> float:
+    mha.use_client(mha.LocalClient(delay=latency))
+    store = mha.SessionStore(None)
+    start = time.perf_counter()
+    for i in range(turns):
+        mha.update_memory_with_gpt(MESSAGES[i % len(MESSAGES)], store.get(f"user{i}"))
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conversations', type=int, default=300)
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, default=mha.MAX_CONCURRENT_COMPLETIONS)
+    args = parser.parse_args(argv)
+
+    total_turns = args.conversations * args.turns
+    elapsed, latencies, peak = asyncio.run(run_async(args.conversations, args.turns, args.latency, args.concurrency))
+    sample = min(20, total_turns)
+    blocking = run_blocking(sample, args.latency) / sample * total_turns
+
+    latencies.sort()
+    print(f"turns                  : {total_turns} ({args.conversations} conversations x {args.turns})")
+    print(f"model latency          : {args.latency * 1000:.0f} ms, concurrency limit {args.concurrency}")
+    print(f"async service          : {elapsed:.2f} s ({total_turns / elapsed:.0f} turns/s, peak {peak} in flight)")
+    print(f"turn latency p50/p95   : {statistics.median(latencies) * 1000:.0f} / "
+          f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+    print(f"blocking, one at a time: {blocking:.2f} s (extrapolated from {sample} turns)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
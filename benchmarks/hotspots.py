@@ -0,0 +1,54 @@
+"""Hotspot clustering benchmark: build and re-cluster 100k synthetic geolocated reports.
+
+    python benchmarks/hotspots.py [--reports N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from hotspots import HotspotIndex  # noqa: E402
+
+CENTRES = [(43.46, -80.52), (45.42, -75.69), (43.65, -79.38), (49.28, -123.12), (53.55, -113.49)]
+TYPES = ['flood', 'fire', 'storm', 'earthquake']
+
+
+def synthetic_points(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        if rng.random() < 0.8:
+            lat, lon = rng.choice(CENTRES)
+            yield lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05), rng.choice(TYPES)
+        else:
+            yield rng.uniform(42, 55), rng.uniform(-125, -60), rng.choice(TYPES)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    points = list(synthetic_points(args.reports + 1000))
+    index = HotspotIndex(eps_km=2.0, min_reports=5)
+    start = time.perf_counter()
+    for lat, lon, dtype in points[:args.reports]:
+        index.add(lat, lon, dtype)
+    built = time.perf_counter()
+    clusters = index.clusters()
+    clustered = time.perf_counter()
+    for lat, lon, dtype in points[args.reports:]:
+        index.add(lat, lon, dtype)
+    index.clusters()
+    incremental = time.perf_counter()
+
+    print(f"index {args.reports} reports : {built - start:.3f} s")
+    print(f"cluster                : {clustered - built:.3f} s ({len(clusters)} clusters)")
+    print(f"add 1000 + re-cluster  : {incremental - clustered:.3f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
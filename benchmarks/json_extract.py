@@ -0,0 +1,102 @@
+"""Model output parsing benchmark over a synthetic corpus of clean and malformed replies.
+
+Compares the old first-"{"-to-last-"}" slice + json.loads with extract_json (how many
+outputs each recovers, and parse time), and times streaming through ReplyStream in
+small chunks, where the reply is re-parsed as each chunk arrives.
+
+    python benchmarks/json_extract.py [--outputs N] [--chunk C]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mental_health_ai as mha  # noqa: E402
+
+REPLIES = [
+    "That sounds incredibly hard. It's okay to feel {overwhelmed} right now.",
+    "Thank you for sharing that with me. Would it help to talk about what happened?",
+    "Try breathing in for 4, holding for 4 and out for 4 [box breathing].",
+    "You're not alone in this. Many people feel \"numb\" after a disaster.",
+]
+EMOTIONS = ["sad", "tired", "anxious", "numb", "hopeful"]
+
+
+def envelope(rng) -> str:
+    memory = {"recent_emotions": rng.sample(EMOTIONS, 2), "location": rng.choice(["Halifax", "Calgary"])}
+    return json.dumps({"response": rng.choice(REPLIES), "memory": memory})
+
+
+MALFORMATIONS = {
+    "clean": lambda rng, text: text,
+    "chatter": lambda rng, text: "Sure! Here is the JSON: " + text + " Let me know if you need anything {else}.",
+    "fenced": lambda rng, text: "```json\n" + text + "\n```",
+    "trailing comma": lambda rng, text: text[:-1] + ",}",
+    "truncated": lambda rng, text: text[:rng.randint(len(text) // 2, len(text) - 2)],
+    "junk first": lambda rng, text: "{thinking...} " + text,
+}
+
+
+def corpus(n: int, seed: int = 5):
+    rng = random.Random(seed)
+    kinds = list(MALFORMATIONS)
+    for i in range(n):
+        kind = kinds[i % len(kinds)]
+        yield kind, MALFORMATIONS[kind](rng, envelope(rng))
+
+
+def slice_parse(text: str):
+    """The parser this replaced."""
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    return json.loads(text[start:end])
+
+
+def timed(parse, outputs):
+    ok = {}
+    start = time.perf_counter()
+    for kind, text in outputs:
+        try:
+            parsed = parse(text)
+        except ValueError:
+            continue
+        if isinstance(parsed, dict) and parsed.get("response"):
+            ok[kind] = ok.get(kind, 0) + 1
+    return time.perf_counter() - start, ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--outputs', type=int, default=30000)
+    parser.add_argument('--chunk', type=int, default=8, help="characters per streamed chunk")
+    args = parser.parse_args(argv)
+
+    outputs = list(corpus(args.outputs))
+    per_kind = args.outputs // len(MALFORMATIONS)
+    old_time, old_ok = timed(slice_parse, outputs)
+    new_time, new_ok = timed(lambda text: mha.extract_json(text, partial=True), outputs)
+
+    sample = outputs[:max(args.outputs // 10, 1)]
+    start = time.perf_counter()
+    for _, text in sample:
+        stream = mha.ReplyStream(lambda piece: None)
+        for i in range(0, len(text), args.chunk):
+            stream.feed(text[i:i + args.chunk])
+        stream.close()
+    streamed = time.perf_counter() - start
+
+    print(f"outputs                 : {len(outputs)} ({per_kind} of each kind)")
+    print(f"first/last brace slice  : {old_time:.3f} s, recovered {sum(old_ok.values())}")
+    print(f"extract_json            : {new_time:.3f} s, recovered {sum(new_ok.values())}")
+    for kind in MALFORMATIONS:
+        print(f"  {kind:<22}: {old_ok.get(kind, 0):>6} -> {new_ok.get(kind, 0)}")
+    print(f"streamed ({args.chunk}-char chunks) : {streamed / len(sample) * 1e6:.0f} us per output")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
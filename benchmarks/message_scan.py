@@ -0,0 +1,148 @@
+"""Keyword detection benchmark: run the companion's local detectors over a synthetic message corpus.
+
+Times keyword matching alone (the search sweep KeywordScanner.scan uses against the
+lookahead finditer it replaced, both over the scanner's trie regex), then whole detection through the scanner against the previous
+approach of one lowercase-and-search pass per detector, and counts how often the fuzzy
+date parser runs. End to end the two detection paths cost about the same without
+python-dateutil; the saving is in the date parses the scanner gates away.
+
+    python benchmarks/message_scan.py [--messages N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import companion_router as detectors  # noqa: E402
+
+TEMPLATES = [
+    "I feel {feeling} today",
+    "my {relation} died in a {disaster} {when}",
+    "our {relation} passed away because of the {disaster}",
+    "when did my {relation} die?",
+    "what should I do in a {disaster}?",
+    "the {disaster} destroyed our street and I can't stop thinking about it",
+    "I haven't slept since the {disaster}, everything feels {feeling}",
+    "thank you",
+    "hello",
+    "sometimes I want to die",
+    "we lost our home {when} and I don't know where to go",
+    "I keep replaying the moment the water came in, it was {feeling}",
+]
+FILLERS = {
+    "feeling": ["sad", "numb", "anxious", "exhausted", "hopeless", "okay"],
+    "relation": detectors.RELATIONS,
+    "disaster": list(detectors.DISASTER_ADVICE),
+    "when": ["yesterday", "last night", "on Monday at 3pm", "two weeks ago", ""],
+}
+
+
+def corpus(n: int, seed: int = 11):
+    rng = random.Random(seed)
+    for _ in range(n):
+        template = rng.choice(TEMPLATES)
+        yield template.format(**{key: rng.choice(values) for key, values in FILLERS.items()})
+
+
+LEGACY_LOSS = r"(my|our)\s+(dad|mom|father|mother|brother|sister|friend|pet)\s*(\w*)\s*(died|passed|lost|killed|gone)"
+LEGACY_CAUSE = r"(?:due to|in a|from a|because of|in a)\s+([\w\s]+)"
+
+
+def legacy_detect(message: str):
+    """The per-detector passes used before the scanner (a date parse for every loss match)."""
+    found = [d for d in detectors.DISASTER_ADVICE if d in message.lower()]
+    losses = re.findall(LEGACY_LOSS, message.lower())
+    re.search(LEGACY_CAUSE, message.lower())
+    parses = 0
+    for _ in losses:
+        detectors.extract_time_from_text(message)
+        parses += 1
+    crisis = any(k in message.lower() for k in detectors.CRISIS_KEYWORDS)
+    text = message.lower()
+    if "what time" in text or "when" in text:
+        re.search(r"(my|our)?\s*(mom|dad|father|mother|brother|sister|friend|pet|\w+)", text)
+    return found, crisis, parses
+
+
+def single_pass_detect(message: str):
+    """The same detection through one scanner pass, with regexes and date parsing gated on its results."""
+    scan = detectors.scanner.scan(message)
+    found = scan.get("disaster", [])
+    parses = 0
+    if "relation" in scan and "loss" in scan:
+        text = message.lower()
+        if detectors._LOSS_RE.findall(text):
+            detectors._CAUSE_RE.search(text)
+            if "temporal" in scan or "digit" in scan:
+                detectors.extract_time_from_text(message)
+                parses += 1
+    crisis = "crisis" in scan
+    if "time_question" in scan:
+        detectors._TIME_QUESTION_RE.search(message.lower())
+    return found, crisis, parses
+
+
+def lookahead_matches(messages):
+    """The scanner's previous matcher: its trie regex in a lookahead, tried at every offset."""
+    pattern = re.compile("(?=(" + detectors.trie_pattern(detectors.scanner._groups) + "))")
+    return [[m.group(1) for m in pattern.finditer(message.lower())] for message in messages]
+
+
+def sweep_matches(messages):
+    """The matcher KeywordScanner.scan uses: search() resumed one character after each match."""
+    search = detectors.scanner._pattern.search
+    found = []
+    for message in messages:
+        text = message.lower()
+        words = []
+        match = search(text)
+        while match is not None:
+            words.append(match.group())
+            match = search(text, match.start() + 1)
+        found.append(words)
+    return found
+
+
+def best_of(repeats, fn, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(detect, messages):
+    return sum(detect(message)[2] for message in messages)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=5, help="best of this many runs is reported")
+    args = parser.parse_args(argv)
+
+    messages = list(corpus(args.messages))
+    for message in messages[:200]:
+        assert legacy_detect(message)[:2] == single_pass_detect(message)[:2], message
+    lookahead, expected = best_of(args.repeats, lookahead_matches, messages)
+    sweep, found = best_of(args.repeats, sweep_matches, messages)
+    assert found == expected
+    legacy, legacy_parses = best_of(args.repeats, run, legacy_detect, messages)
+    single, parses = best_of(args.repeats, run, single_pass_detect, messages)
+
+    print(f"messages          : {len(messages)}")
+    print(f"keyword matching  : lookahead finditer {lookahead:.3f} s, search sweep {sweep:.3f} s")
+    print(f"per-detector scans: {legacy:.3f} s ({legacy_parses} date parses)")
+    print(f"single-pass scan  : {single:.3f} s ({parses} date parses)")
+    if detectors.date_parser is None:
+        print("(python-dateutil not installed: date parsing costs nothing here)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Startup-time benchmark for main.py.
+
+Drives main() up to the first user decision (blank gov password, then declining to continue
+as non-government) under ``python -X importtime`` and prints the import breakdown.
+Exits non-zero if startup imports exceed BUDGET_MS or pull in any of DEFERRED_MODULES.
+
+    python benchmarks/startup.py [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed before the first prompt is answered
+BUDGET_MS = 75.0
+
+# Modules that must only be imported once a feature needs them
+DEFERRED_MODULES = ['mental_health_ai', 'openai', 'dotenv', 'dateutil', 'urllib.request']
+
+HARNESS = (
+    "import builtins, sys\n"
+    "answers = iter(['', 'quit'])\n"
+    "builtins.input = lambda prompt='': next(answers)\n"
+    "import main\n"
+    "main.main()\n"
+    "print('MODULES:' + ','.join(sorted(sys.modules)))\n"
+)
+
+
+def run_startup(importtime: bool = True) -> Tuple[str, str]:
+    """Run the startup harness in a fresh interpreter and return (stdout, stderr)."""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', HARNESS]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True)
+    return proc.stdout, proc.stderr
+
+
+def loaded_modules(stdout: str) -> List[str]:
+    for line in stdout.splitlines():
+        if line.startswith('MODULES:'):
+            return line[len('MODULES:'):].split(',')
+    return []
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Return top-level (module, self_us, cumulative_us) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        # Nested imports are indented under their parent
+        if name.startswith('  ') and name[2:3] == ' ':
+            continue
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--top', type=int, default=15, help="number of imports to list")
+    args = parser.parse_args(argv)
+
+    stdout, stderr = run_startup()
+    rows = parse_importtime(stderr)
+    total_ms = sum(cumulative for _, _, cumulative in rows) / 1000
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    print(f"\nTotal startup import time: {total_ms:.1f} ms (budget {BUDGET_MS:.0f} ms)")
+
+    failed = False
+    eager = [m for m in DEFERRED_MODULES if m in loaded_modules(stdout)]
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_ms > BUDGET_MS:
+        print("FAIL: startup import time is over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,22 +6,27 @@ def main():
     - Government users can add supplies or check inventory.
     - Non-government users can request aid and trucks will be dispatched as needed.
     """
-    import json
     import sys
     sys.path.append('src')  # Add src directory to Python path
     from storage import Storage
     from trucks import Truck
     from help_stations import HelpStation
     from report_utils import geocode
-    # mental health module (optional)
-    try:
-        import mental_health_ai
-    except Exception:
-        mental_health_ai = None
     from typing import List, Dict, Tuple, Optional
     import re
-    import subprocess
-    import importlib
+
+    # The mental health module pulls in dotenv/openai/dateutil, so it is imported on first use of 'mental'
+    _mental_health_ai = []
+
+    def load_mental_health_ai():
+        """Import mental_health_ai once; returns None if it or its dependencies are unavailable."""
+        if not _mental_health_ai:
+            try:
+                import mental_health_ai as module
+            except Exception:
+                module = None
+            _mental_health_ai.append(module)
+        return _mental_health_ai[0]
 
     print("Welcome to the Aid Dispatch System")
 
@@ -43,23 +48,43 @@ def main():
         """Return list of (name, unit) tuples for supplies."""
         return [(name, unit or '') for name, unit in SUPPLY_CATEGORIES.items()]
 
-    # Use persistent storage so supplies survive program restarts
+    # Authentication flow: ask for gov password; blank or incorrect => non-gov
+    GOV_PASSWORD = 'gov'
+    pwd = input("Enter gov password (leave blank if non-government): ").strip()
+
+    # Use persistent storage so supplies survive program restarts.
+    # Storage reads its file on first use; aid centres are only loaded when a menu needs them.
     storage = Storage('data/storage.json')
     trucks = Truck()
-    help_stations = HelpStation()
+    _help_stations = []
+
+    def get_help_stations() -> HelpStation:
+        if not _help_stations:
+            _help_stations.append(HelpStation())
+        return _help_stations[0]
+
+    _triage_queue = []
+
+    def get_triage_queue():
+        """Pending aid requests, most urgent first; kept in data/queue.json between sessions.
+
+        Queued requests are the rationer's pending demand, so when stock is short each
+        dispatch is capped at the request's fair share instead of whatever is left.
+        """
+        if not _triage_queue:
+            from triage import TriageQueue
+            from rationing import Rationer
+            _triage_queue.append(TriageQueue(get_help_stations(), rationer=Rationer(storage),
+                                             persistence_file='data/queue.json'))
+        return _triage_queue[0]
 
     # Seed some trucks
     for i in range(1, 6):
         trucks.add_truck(f"Truck {i}")
 
-
-    # Authentication flow: ask for gov password; blank or incorrect => non-gov
-    GOV_PASSWORD = 'gov'
-    pwd = input("Enter gov password (leave blank if non-government): ").strip()
-
     if pwd == GOV_PASSWORD:
         while True:
-            action = input("Enter 'add' to add supplies, 'check' inventory, 'reports' to manage reports, 'stations' to manage aid centres, or 'exit': ").strip().lower()
+            action = input("Enter 'add' to add supplies, 'check' inventory, 'reports' to manage reports, 'hotspots' to see report clusters, 'dispatches' for the last 7 days of dispatches, 'expired' to discard expired lots, 'stations' to manage aid centres, or 'exit': ").strip().lower()
             if action == 'stations':
                 while True:
                     print("\nAid Centre Management")
@@ -71,13 +96,20 @@ def main():
                     choice = input("Enter choice (1-4): ").strip()
                     if choice == '1':
                         name = input("Enter aid centre name: ").strip()
-                        if help_stations.add_station(name):
-                            print(f"Added aid centre: {name}")
+                        # Located like requests (geocoded lat/lon) so triage can measure the distance between them
+                        print("Aid centre address (leave blank if unknown).")
+                        street = input("Street           : ").strip()
+                        city = input("City / Town      : ").strip()
+                        country = input("Country          : ").strip()
+                        coords = geocode(None, street, city, country) if (street or city) else None
+                        location = coords[:2] if coords else None
+                        if get_help_stations().add_station(name, location):
+                            print(f"Added aid centre: {name}" + (f" at {coords[2]}" if coords else ""))
                         else:
                             print("Failed to add station - name empty or already exists")
                     
                     elif choice == '2':
-                        all_stations = help_stations.list_stations()
+                        all_stations = get_help_stations().list_stations()
                         if all_stations:
                             print("\nRegistered Aid Centres:")
                             for station in all_stations:
@@ -87,7 +119,7 @@ def main():
                     
                     elif choice == '3':
                         name = input("Enter aid centre name to delete: ").strip()
-                        if help_stations.delete_station(name):
+                        if get_help_stations().delete_station(name):
                             print(f"Deleted aid centre: {name}")
                         else:
                             print("Station not found")
@@ -115,7 +147,7 @@ def main():
 
                 if supply == 'medical':
                     # Medical supplies are tracked as available/unavailable (1/0)
-                    storage.add_supplies(supply, 1)
+                    storage.add_supplies(supply, 1, actor='gov')
                     print(f"Added medical supplies to storage.")
                     continue
 
@@ -128,8 +160,19 @@ def main():
                     print("Invalid quantity. Please enter a number.")
                     continue
 
-                storage.add_supplies(supply, quantity)
-                print(f"Added {format_supply_name(supply, quantity, unit)} to storage.")
+                expiry = input("Expiry date (YYYY-MM-DD, leave blank if it does not expire): ").strip()
+                depot = input("Aid centre holding this stock (leave blank for central storage): ").strip()
+                try:
+                    if depot:
+                        from depots import DepotNetwork
+                        DepotNetwork(get_help_stations(), storage).add_stock(depot, supply, quantity, actor='gov',
+                                                                              expiry=expiry or None)
+                    else:
+                        storage.add_supplies(supply, quantity, actor='gov', expiry=expiry or None)
+                except ValueError as e:
+                    print(f"Error: {e}")
+                    continue
+                print(f"Added {format_supply_name(supply, quantity, unit)} to {depot or 'storage'}.")
             elif action == 'reports':
                 while True:
                     print("\nDisaster Reports Management")
@@ -230,6 +273,7 @@ def main():
                     print("No supplies in storage.")
                 else:
                     print("\nCurrent supplies in storage:")
+                    days_left = storage.days_of_stock()
                     for supply, quantity in supplies.items():
                         # Convert to lowercase for comparison
                         supply_lower = supply.lower()
@@ -238,13 +282,51 @@ def main():
                         
                         if supply_lower == 'medical':
                             status = "Available" if quantity > 0 else "Not available"
-                            print(f"Medical supplies: {status}")
+                            line = f"Medical supplies: {status}"
                         elif category:
                             unit = SUPPLY_CATEGORIES[category]
-                            print(f"{format_supply_name(category, quantity, unit)}")
+                            line = f"{format_supply_name(category, quantity, unit)}"
                         else:
                             # Handle legacy or unknown supplies
-                            print(f"{supply}: {quantity}")
+                            line = f"{supply}: {quantity}"
+                        # Forecast from recent dispatches; nothing shown until an item has been drawn down
+                        if days_left.get(supply) is not None:
+                            line += f" (~{days_left[supply]:.1f} days of stock remaining)"
+                        print(line)
+                    expired = storage.sweep_expired()
+                    if expired:
+                        print("\nExpired lots (not dispatched; enter 'expired' to discard them):")
+                        for lot in expired:
+                            print(f" - {lot['item']}: {lot['quantity']} expired {lot['expiry']}")
+            elif action == 'expired':
+                discarded = storage.sweep_expired(discard=True)
+                if not discarded:
+                    print("No expired lots in storage.")
+                else:
+                    print("\nDiscarded expired lots:")
+                    for lot in discarded:
+                        print(f" - {lot['item']}: {lot['quantity']} expired {lot['expiry']}")
+            elif action == 'dispatches':
+                from datetime import datetime, timedelta
+                since = datetime.utcnow() - timedelta(days=7)
+                totals = storage.ledger.dispatch_totals(start=since)
+                if not totals:
+                    print("No supplies dispatched in the last 7 days.")
+                else:
+                    print("\nSupplies dispatched in the last 7 days:")
+                    for supply, quantity in sorted(totals.items()):
+                        unit = SUPPLY_CATEGORIES.get(supply)
+                        print(f" - {format_supply_name(supply, quantity, unit) if unit else f'{supply}: {quantity}'}")
+            elif action == 'hotspots':
+                from hotspots import hotspots_from_storage
+                index = hotspots_from_storage(storage)
+                clusters = index.clusters()
+                if not clusters:
+                    print(f"No incident clusters found ({index.located} geolocated reports).")
+                else:
+                    print(f"\nIncident clusters from {index.located} geolocated reports:")
+                    for i, c in enumerate(clusters[:10], start=1):
+                        print(f"{i}. {c['size']} reports near {c['lat']:.4f}, {c['lon']:.4f} - mostly {c['dominant_type']}")
             elif action == 'exit':
                 break
             else:
@@ -264,10 +346,15 @@ def main():
         # persist requester name so it's available after program restarts
         storage.add_requester(user_name)
 
+        # A filed report tells triage how urgent this requester's needs are and where they are
+        request_disaster_type = ''
+        request_location = None
+
         # Prompt to file a disaster report
         report_choice = input("Would you like to file a disaster report? (y/n): ").strip().lower()
         if report_choice == 'y':
             disaster_type = input("Type of natural disaster (e.g., flood, earthquake): ").strip()
+            request_disaster_type = disaster_type
             details = input("Please provide brief details about the situation: ").strip()
 
             # Ask for address components and attempt geocoding (same behaviour as data analysis report)
@@ -279,13 +366,18 @@ def main():
 
             coords = geocode(number or None, street, city, country)
             if coords is None:
-                storage.add_report(user_name, disaster_type, details)
-                print("Thank you — your report has been saved and will be visible to government users.")
+                report = storage.add_report(user_name, disaster_type, details)
+                saved_msg = "Thank you — your report has been saved and will be visible to government users."
             else:
                 lat, lon, display = coords
+                request_location = (lat, lon)
                 details_with_location = f"{details} | location_resolved: {display} | lat:{lat} lon:{lon}"
-                storage.add_report(user_name, disaster_type, details_with_location)
-                print("Thank you — your report has been saved (address resolved) and will be visible to government users.")
+                report = storage.add_report(user_name, disaster_type, details_with_location)
+                saved_msg = "Thank you — your report has been saved (address resolved) and will be visible to government users."
+            if report.get('duplicate_of'):
+                print("Thank you — this matches a report already filed nearby; we've added you to that incident.")
+            else:
+                print(saved_msg)
 
         # For non-government users: do not ask for latitude/longitude.
         # Always attempt to dispatch a truck when supplies are available.
@@ -297,7 +389,9 @@ def main():
                 supplies = storage.get_supplies()
                 available_supplies = []
                 
-                for supply, quantity in supplies.items():
+                for supply in supplies:
+                    # Expired stock is on hand but cannot be dispatched
+                    quantity = storage.check_inventory(supply)
                     supply_lower = supply.lower()
                     category = next((cat for cat in SUPPLY_CATEGORIES.keys() if cat.lower() == supply_lower), None)
                     
@@ -339,32 +433,31 @@ def main():
                             print("Invalid input. Please enter a number.")
                             continue
                     
-                    # Find available truck
-                    available_truck = None
-                    for name, available in trucks.trucks.items():
-                        if available:
-                            available_truck = name
-                            break
-
-                    if available_truck:
-                        trucks.dispatch_truck(available_truck)
-                        try:
-                            # Double check the current inventory before removing
-                            current_quantity = storage.check_inventory(supply)
-                            if quantity > current_quantity:
-                                print(f"Sorry, only {current_quantity} {unit} of {supply} available now.")
-                                continue
-                                
-                            storage.remove_supplies(supply, quantity)
-                            if supply == 'medical':
-                                print(f"{available_truck} has been dispatched with medical supplies to {user_name}'s location.")
-                            else:
-                                print(f"{available_truck} has been dispatched with {quantity} {unit} of {supply} to {user_name}'s location.")
-                        except ValueError as e:
-                            print(f"Error: {str(e)}")
-                            continue
+                    try:
+                        household = int(input("How many people is this for? (default 1): ").strip() or 1)
+                    except ValueError:
+                        household = 1
+
+                    # Queue the request and let triage send the free trucks to the most urgent requests,
+                    # which may include requests still waiting from earlier sessions
+                    queue = get_triage_queue()
+                    request_id = queue.submit(user_name, supply, quantity, request_disaster_type, request_location,
+                                              household=household)
+                    dispatched = queue.dispatch(storage, trucks)
+                    mine = next(((request, truck) for request, truck in dispatched if request['id'] == request_id), None)
+                    others = len(dispatched) - (1 if mine else 0)
+                    if others:
+                        print(f"{others} more urgent queued request(s) were dispatched first.")
+                    if mine is None:
+                        print(f"Your request is queued (position {queue.position(request_id)} of {len(queue)}) "
+                              "and will be sent when a truck and stock are free.")
+                    elif supply == 'medical':
+                        print(f"{mine[1]} has been dispatched with medical supplies to {user_name}'s location.")
                     else:
-                        print("No trucks available to dispatch at the moment.")
+                        print(f"{mine[1]} has been dispatched with {mine[0]['sent']} {unit} of {supply} to {user_name}'s location.")
+                        if mine[0]['sent'] < quantity:
+                            print(f"Stock is short, so this is your fair share of the {supply} "
+                                  f"left for everyone waiting ({quantity} {unit} requested).")
                     
                     # Ask if they want to request more
                     more = input("\nWould you like to request more supplies? (y/n): ").strip().lower()
@@ -375,7 +468,7 @@ def main():
                     print("Invalid input. Please try again.")
 
             elif action == 'stations':
-                all_stations = help_stations.list_stations()
+                all_stations = get_help_stations().list_stations()
                 if all_stations:
                     print("\nKnown help stations:")
                     for station in all_stations:
@@ -384,6 +477,7 @@ def main():
                     print("No help stations registered.")
 
             elif action == 'mental':
+                mental_health_ai = load_mental_health_ai()
                 if mental_health_ai is None:
                     print("Mental health support is unavailable: missing module or dependencies.")
                     print("Run the setup script or install requirements to enable it.")
@@ -418,6 +512,8 @@ def main():
                             if not openai_present:
                                 print("OpenAI package not detected. Attempting to install 'openai' now (this may take a minute)...")
                                 try:
+                                    import importlib
+                                    import subprocess
                                     subprocess.check_call([sys.executable, "-m", "pip", "install", "openai"]) 
                                     # Reload the mental_health_ai module so it picks up the newly installed package
                                     importlib.reload(mental_health_ai)
@@ -441,6 +537,9 @@ def main():
                         print("Ensure the 'openai' package is installed and your API key is valid.")
                         continue
 
+                # Each requester has their own companion memory, kept between visits
+                session = mental_health_ai.get_session(user_name)
+
                 # Present mental health submenu
                 while True:
                     print("\nMental Health Support")
@@ -452,18 +551,26 @@ def main():
                         user_msg = input("Enter a short message (blank to cancel): ").strip()
                         if not user_msg:
                             continue
+                        print("\nSupport: ", end="", flush=True)
+                        streamed = []
+
+                        def show(text):
+                            streamed.append(text)
+                            print(text, end="", flush=True)
+
                         try:
-                            reply = mental_health_ai.update_memory_with_gpt(user_msg)
+                            reply = mental_health_ai.update_memory_with_gpt(user_msg, session, on_text=show, cache=True)
+                            mental_health_ai.sessions.save(session)
                         except Exception:
                             reply = "Mental health support is temporarily unavailable."
-                        print(f"\nSupport: {reply}\n")
+                        print("\n" if streamed else f"{reply}\n")
                         try:
                             storage.add_report(user_name, 'mental_support', f"user: {user_msg} | response: {reply}")
                         except Exception:
                             pass
                     elif mh_choice == '2':
                         try:
-                            mental_health_ai.main()
+                            mental_health_ai.main(session)
                         except Exception as e:
                             print("Mental health companion failed:", e)
                     elif mh_choice == '3':
@@ -477,5 +584,47 @@ def main():
                 print("Invalid action. Please try again.")
     
 
+def _parse_args(argv=None):
+    import argparse
+    import os
+    import sys
+    if 'src' not in sys.path:
+        sys.path.append('src')  # Add src directory to Python path
+    from profiling import DEFAULT_REPORT, report_path_from_env
+
+    parser = argparse.ArgumentParser(description="Aid Dispatch System")
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_REPORT, default=None, metavar='REPORT',
+                        help="record cProfile/tracemalloc data for this session and write it to REPORT "
+                             f"(default {DEFAULT_REPORT}); can also be enabled with AID_PROFILE")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="run the operations in a JSONL or CSV file without prompting, then print a summary")
+    parser.add_argument('--storage', default='data/storage.json', metavar='PATH',
+                        help="storage file used by --batch (default data/storage.json)")
+    parser.add_argument('--stations', default='data/stations.json', metavar='PATH',
+                        help="aid centre file used by --batch (default data/stations.json)")
+    args = parser.parse_args(argv)
+    if args.profile is None:
+        args.profile = report_path_from_env(os.environ.get('AID_PROFILE'))
+    return args
+
+
+def run_batch(path: str, storage_file: str, stations_file: str):
+    """Replay a file of operations against the engine and print the throughput summary."""
+    from batch import run_batch_file, format_summary
+    summary = run_batch_file(path, storage_file, stations_file)
+    print(format_summary(summary))
+    return summary
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = _parse_args()
+    if args.batch:
+        session = lambda: run_batch(args.batch, args.storage, args.stations)
+    else:
+        session = main
+    if args.profile:
+        from profiling import profile_session
+        profile_session(session, args.profile)
+        print(f"\nProfile report written to {args.profile}")
+    else:
+        session()
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""Non-interactive batch mode: replay operator sessions from a JSONL or CSV file.
+
+Each record names an operation in its ``op`` field plus that operation's fields:
+
+    add_supplies    item, quantity, [actor, expiry]
+    file_report     name, disaster_type, details
+    add_requester   name
+    request_aid     name, item, quantity
+    return_truck    truck
+    add_station     name, [lat, lon]
+    delete_station  name
+    stock_depot     depot, item, quantity, [actor, expiry]
+    depot_request   name, item, quantity, lat, lon
+    queue_request   name, item, quantity, [disaster_type, lat, lon, household]
+    dispatch_queue  (sends free trucks to the most urgent queued requests, capped at
+                    each request's fair share when stock cannot cover them all)
+
+JSONL files hold one JSON object per line; CSV files need a header row using the
+field names above (unused columns may be left blank). A line that is not a JSON object,
+or has a non-text value in a text field such as item, fails that record only; the rest
+of the file is still replayed.
+"""
+import csv
+import json
+import os
+import time
+from typing import Dict, Iterable, Iterator, Union
+
+
+def read_operations(path: str) -> Iterator[Union[Dict, str]]:
+    """Yield operation records from a .csv file or a JSON Lines file, one at a time.
+
+    CSV rows are yielded as dicts; JSONL lines are yielded unparsed and decoded per record
+    by parse_record, so one malformed line cannot end the replay.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                # Blank CSV cells mean "not provided"
+                yield {k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip() != ''}
+        else:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+
+
+# Fields the handlers treat as text; anything else there fails the record
+TEXT_FIELDS = ('op', 'item', 'name', 'depot', 'truck', 'actor', 'disaster_type', 'details', 'expiry')
+
+
+def parse_record(record: Union[Dict, str]) -> Dict:
+    """Decode a JSONL line into an operation record.
+
+    Null fields count as not provided. Raises ValueError unless the record is a JSON
+    object whose text fields are strings.
+    """
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError(f"Record must be a JSON object, not {type(record).__name__}")
+    record = {k: v for k, v in record.items() if v is not None}
+    for field in TEXT_FIELDS:
+        if field in record and not isinstance(record[field], str):
+            raise ValueError(f"Field '{field}' must be text, not {type(record[field]).__name__}")
+    return record
+
+
+class BatchRunner:
+    def __init__(self, storage, trucks, help_stations, depots=None):
+        """Execute operation records directly against Storage, Truck, HelpStation and DepotNetwork."""
+        self.storage = storage
+        self.trucks = trucks
+        self.help_stations = help_stations
+        self.depots = depots
+        self._triage = None
+        self._handlers = {
+            'add_supplies': self._add_supplies,
+            'file_report': self._file_report,
+            'add_requester': self._add_requester,
+            'request_aid': self._request_aid,
+            'return_truck': self._return_truck,
+            'add_station': self._add_station,
+            'delete_station': self._delete_station,
+            'stock_depot': self._stock_depot,
+            'depot_request': self._depot_request,
+            'queue_request': self._queue_request,
+            'dispatch_queue': self._dispatch_queue,
+        }
+
+    # Operation handlers raise ValueError to mark a record as failed
+    def _add_supplies(self, op: Dict):
+        quantity = int(op['quantity'])
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        self.storage.add_supplies(op['item'].lower(), quantity, actor=op.get('actor') or 'batch',
+                                  expiry=op.get('expiry'))
+
+    def _file_report(self, op: Dict):
+        self.storage.add_report(op.get('name') or 'Requester', op.get('disaster_type', ''), op.get('details', ''))
+
+    def _add_requester(self, op: Dict):
+        self.storage.add_requester(op['name'])
+
+    def _request_aid(self, op: Dict):
+        item = op['item'].lower()
+        quantity = int(op.get('quantity', 1))
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        if self.storage.check_inventory(item) < quantity:
+            raise ValueError(f"Not enough '{item}' in storage to remove {quantity}")
+        truck = next((name for name, available in self.trucks.trucks.items() if available), None)
+        if truck is None:
+            raise ValueError("No trucks available to dispatch")
+        self.storage.add_requester(op.get('name') or 'Requester')
+        self.storage.remove_supplies(item, quantity, actor=op.get('name') or 'Requester', truck=truck)
+        self.trucks.dispatch_truck(truck)
+
+    def _return_truck(self, op: Dict):
+        self.trucks.return_truck(op['truck'])
+
+    def _add_station(self, op: Dict):
+        location = None
+        if 'lat' in op and 'lon' in op:
+            location = (float(op['lat']), float(op['lon']))
+        if not self.help_stations.add_station(op['name'], location):
+            raise ValueError(f"Station '{op['name']}' is empty or already exists")
+
+    def _delete_station(self, op: Dict):
+        if not self.help_stations.delete_station(op['name']):
+            raise ValueError(f"Station '{op['name']}' not found")
+
+    def _require_depots(self):
+        if self.depots is None:
+            raise ValueError("No depot network configured")
+        return self.depots
+
+    def _stock_depot(self, op: Dict):
+        self._require_depots().add_stock(op['depot'], op['item'], int(op['quantity']),
+                                         actor=op.get('actor') or 'batch', expiry=op.get('expiry'))
+
+    def _depot_request(self, op: Dict):
+        depots = self._require_depots()
+        item = op['item'].lower()
+        quantity = int(op.get('quantity', 1))
+        if depots.total(item) < quantity:
+            raise ValueError(f"Not enough '{item}' across depots to supply {quantity}")
+        truck = next((name for name, available in self.trucks.trucks.items() if available), None)
+        if truck is None:
+            raise ValueError("No trucks available to dispatch")
+        name = op.get('name') or 'Requester'
+        depots.fulfil(item, quantity, (float(op['lat']), float(op['lon'])), actor=name, truck=truck)
+        self.storage.add_requester(name)
+        self.trucks.dispatch_truck(truck)
+
+    @property
+    def triage(self):
+        if self._triage is None:
+            try:
+                from .triage import TriageQueue
+                from .rationing import Rationer
+            except ImportError:
+                from triage import TriageQueue
+                from rationing import Rationer
+            self._triage = TriageQueue(self.help_stations, rationer=Rationer(self.storage))
+        return self._triage
+
+    def _queue_request(self, op: Dict):
+        location = None
+        if 'lat' in op and 'lon' in op:
+            location = (float(op['lat']), float(op['lon']))
+        name = op.get('name') or 'Requester'
+        self.triage.submit(name, op['item'], int(op.get('quantity', 1)), op.get('disaster_type', ''), location,
+                           household=int(op.get('household', 1)))
+        self.storage.add_requester(name)
+
+    def _dispatch_queue(self, op: Dict):
+        if not self.triage.dispatch(self.storage, self.trucks) and len(self.triage):
+            raise ValueError(f"{len(self.triage)} queued requests could not be dispatched")
+
+    def run(self, operations: Iterable[Union[Dict, str]], max_errors: int = 20) -> Dict:
+        """Apply every operation and return a summary with per-op counts and throughput.
+
+        Storage writes are batched, so the persistence file is rewritten once at the end.
+        """
+        summary = {'total': 0, 'ok': 0, 'failed': 0, 'by_op': {}, 'errors': []}
+        start = time.perf_counter()
+        with self.storage.bulk_update():
+            for lineno, record in enumerate(operations, start=1):
+                summary['total'] += 1
+                name = ''
+                counts = None
+                try:
+                    op = parse_record(record)
+                    name = str(op.get('op', '')).strip().lower()
+                    counts = summary['by_op'].setdefault(name or '<missing>', {'ok': 0, 'failed': 0})
+                    handler = self._handlers.get(name)
+                    if handler is None:
+                        raise ValueError(f"Unknown operation '{name}'")
+                    handler(op)
+                except (ValueError, KeyError, TypeError) as e:
+                    if counts is None:
+                        counts = summary['by_op'].setdefault('<invalid>', {'ok': 0, 'failed': 0})
+                    counts['failed'] += 1
+                    summary['failed'] += 1
+                    if len(summary['errors']) < max_errors:
+                        detail = f"missing field {e}" if isinstance(e, KeyError) else str(e)
+                        summary['errors'].append(f"record {lineno} ({name or '?'}): {detail}")
+                    continue
+                counts['ok'] += 1
+                summary['ok'] += 1
+        elapsed = time.perf_counter() - start
+        summary['elapsed'] = elapsed
+        summary['ops_per_sec'] = summary['total'] / elapsed if elapsed > 0 else float(summary['total'])
+        return summary
+
+
+def format_summary(summary: Dict) -> str:
+    lines = [
+        f"Processed {summary['total']} operations in {summary['elapsed']:.3f} s "
+        f"({summary['ops_per_sec']:.0f} ops/s): {summary['ok']} ok, {summary['failed']} failed",
+    ]
+    for name, counts in sorted(summary['by_op'].items()):
+        lines.append(f" - {name}: {counts['ok']} ok, {counts['failed']} failed")
+    if summary['errors']:
+        lines.append("Errors:")
+        lines.extend(f" - {e}" for e in summary['errors'])
+    return "\n".join(lines)
+
+
+def run_batch_file(path: str, storage_file: str = 'data/storage.json',
+                   stations_file: str = 'data/stations.json', trucks: int = 5) -> Dict:
+    """Build the engine the same way main() does and replay the operations in path."""
+    from storage import Storage
+    from trucks import Truck
+    from help_stations import HelpStation
+    from depots import DepotNetwork
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    truck_pool = Truck()
+    for i in range(1, trucks + 1):
+        truck_pool.add_truck(f"Truck {i}")
+    help_stations = HelpStation(stations_file)
+    storage = Storage(storage_file)
+    runner = BatchRunner(storage, truck_pool, help_stations, DepotNetwork(help_stations, storage))
+    return runner.run(read_operations(path))
@@ -0,0 +1,128 @@
+"""Serving many companion conversations at once from an asyncio event loop."""
+import asyncio
+
+try:
+    from . import companion_client
+    from .companion_client import (MAX_TOKENS, MODEL, CircuitOpenError, _call_api_async, _chat_messages,
+                                  get_chat_completion)
+    from .companion_reply import FALLBACK_REPLY, parse_model_output
+    from .companion_sessions import Session, SessionStore, sessions
+    from .companion_turns import _finish_turn, _prepare_turn, _report_error
+except ImportError:
+    import companion_client
+    from companion_client import (MAX_TOKENS, MODEL, CircuitOpenError, _call_api_async, _chat_messages,
+                                 get_chat_completion)
+    from companion_reply import FALLBACK_REPLY, parse_model_output
+    from companion_sessions import Session, SessionStore, sessions
+    from companion_turns import _finish_turn, _prepare_turn, _report_error
+
+# Completions in flight toward the provider at once
+MAX_CONCURRENT_COMPLETIONS = 32
+
+
+class AsyncCompanion:
+    def __init__(self, store: SessionStore = None, max_concurrency: int = MAX_CONCURRENT_COMPLETIONS, client=None):
+        """asyncio front end to the companion for many simultaneous conversations.
+
+        Turns in one session run one at a time and other sessions are never blocked: the
+        event loop never waits on a session's thread lock, which a blocking
+        update_memory_with_gpt turn may hold across a network call. At most
+        max_concurrency completions are in flight. client is an AsyncOpenAI-style
+        client (defaults to companion_client.async_client); without one, the blocking client
+        runs in a thread pool of max_concurrency threads.
+        """
+        self.store = store if store is not None else sessions
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # SessionStore.key(name) -> [asyncio.Lock, turns waiting or running]
+        self._locks = {}
+        self._executor = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def reply(self, name: str, user_input: str) -> str:
+        """Reply to user_input in name's session and update its memory."""
+        name = self.store.key(name)
+        entry = self._locks.setdefault(name, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                session = self.store.cached(name)
+                if session is None:
+                    # Reading the session file (and saving evicted ones) must not block the loop
+                    session = await asyncio.get_running_loop().run_in_executor(None, self.store.get, name)
+                session.active += 1
+                try:
+                    return await self._turn(session, user_input)
+                finally:
+                    session.active -= 1
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[name]
+
+    @staticmethod
+    async def _with_session_lock(session: Session, fn):
+        """fn() run holding session.lock, waiting for the lock in a worker thread if it is busy."""
+        if session.lock.acquire(blocking=False):
+            try:
+                return fn()
+            finally:
+                session.lock.release()
+
+        def locked():
+            with session.lock:
+                return fn()
+
+        return await asyncio.get_running_loop().run_in_executor(None, locked)
+
+    async def _turn(self, session: Session, user_input: str) -> str:
+        def prepare():
+            session.dirty = True
+            return _prepare_turn(user_input, session.memory, session.manager)
+
+        local_reply, prompt = await self._with_session_lock(session, prepare)
+        if local_reply is not None:
+            return local_reply
+        system_prompt, _ = prompt
+        try:
+            reply_text, updated_memory = parse_model_output(await self._complete(system_prompt, user_input))
+        except CircuitOpenError:
+            return FALLBACK_REPLY
+        except Exception as e:
+            _report_error(e)
+            return FALLBACK_REPLY
+        def finish():
+            # Applied under the session lock, so no other turn sees half an update
+            _finish_turn(session.manager, user_input, reply_text, updated_memory)
+            session.dirty = True
+
+        await self._with_session_lock(session, finish)
+        return reply_text
+
+    async def _complete(self, system_prompt: str, user_input: str) -> str:
+        async with self._semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                aclient = self.client or companion_client.async_client
+                if aclient is not None:
+                    resp = await _call_api_async(lambda: aclient.chat.completions.create(
+                        model=MODEL, messages=_chat_messages(system_prompt, user_input),
+                        max_tokens=MAX_TOKENS, temperature=0.7))
+                    return resp.choices[0].message.content.strip()
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="companion")
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, get_chat_completion, system_prompt, user_input)
+            finally:
+                self.in_flight -= 1
+
+    def close(self):
+        """Stop the thread pool (if one was started) and save changed sessions."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.store.save_all()
@@ -0,0 +1,139 @@
+"""Response cache for one-off companion messages.
+
+One-off messages (main.py's quick message) are answered from cache when the same
+normalized message arrives with the same prompt facts, from any requester. Their prompt
+leaves out the requester's name and conversation, so a reply never depends on who
+asked and can be shared across sessions. Crisis messages never get here: the router
+answers them first.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .companion_memory import _compact_json
+except ImportError:
+    from companion_memory import _compact_json
+
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL_SECONDS = 600
+# Context keys left out of cacheable prompts
+_PER_SESSION_KEYS = ("user_name", "recent_turns", "conversation_summary")
+
+
+def normalize_message(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+def shared_context(context: dict) -> dict:
+    """A prompt context without the facts that identify one requester's session."""
+    return {k: v for k, v in context.items() if k not in _PER_SESSION_KEYS}
+
+
+def memory_fingerprint(context: dict) -> str:
+    """Hash of everything in a prompt context, so equal hashes mean equal prompts."""
+    return hashlib.sha1(_compact_json(context).encode("utf-8")).hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 clock=time.monotonic):
+        """LRU cache with a TTL; concurrent misses for one key share a single computation."""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return (value, shared): shared is True when value came from the cache or another caller.
+
+        With cacheable, a computed value is only stored if cacheable(value) is true; callers
+        waiting on that computation still share it.
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self.hits += 1
+                return value, True
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+        try:
+            flight.value = compute()
+            if cacheable is None or cacheable(flight.value):
+                self.put(key, flight.value)
+            return flight.value, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,398 @@
+"""OpenAI API client for the companion.
+
+One client is created per API key (new SDK or the legacy `openai` module) and reused
+for every request. Requests go through a circuit breaker and transient failures are
+retried with backoff; LocalClient and AsyncLocalClient stand in for the API offline.
+"""
+import asyncio
+import importlib
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+try:
+    from .companion_reply import MEMORY_MARKER
+except ImportError:
+    from companion_reply import MEMORY_MARKER
+
+# Load optional .env for local keys (python-dotenv optional)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+# Import optional dependencies
+try:
+    from openai import OpenAI
+except Exception:
+    OpenAI = None
+
+try:
+    from openai import AsyncOpenAI
+except Exception:
+    AsyncOpenAI = None
+
+# Try to import the legacy `openai` module (older SDKs)
+try:
+    import openai as _legacy_openai
+except Exception:
+    _legacy_openai = None
+
+# Read API key from environment if present
+api_key = os.environ.get("OPENAI_API_KEY")
+
+# OpenAI client placeholder; one client is created per key and reused for every request
+client = None
+# asyncio counterpart used by AsyncCompanion (new SDK only)
+async_client = None
+
+# Seconds before a request to the API is abandoned
+REQUEST_TIMEOUT_SECONDS = 20.0
+
+def set_api_key(key: str, persist_env: bool = False, write_dotenv: bool = False) -> bool:
+    """Set the API key at runtime and (optionally) persist it.
+
+    - key: API key string
+    - persist_env: if True, set os.environ['OPENAI_API_KEY'] for current user session
+    - write_dotenv: if True, write a local .env file with OPENAI_API_KEY (will be gitignored)
+
+    Returns True if the client was successfully initialized.
+    """
+    global api_key, client
+    if not key:
+        return False
+    api_key = key
+    if persist_env:
+        os.environ['OPENAI_API_KEY'] = key
+    if write_dotenv:
+        try:
+            with open('.env', 'w', encoding='utf-8') as f:
+                f.write(f'OPENAI_API_KEY={key}\n')
+        except Exception:
+            pass
+    return _init_client_from_key(key)
+
+def is_configured() -> bool:
+    return client is not None
+
+# Determine which SDK is available: NEW_SDK uses `from openai import OpenAI`,
+# legacy SDK uses the `openai` module where api_key is set on the module.
+NEW_SDK = OpenAI is not None
+LEGACY_OPENAI = _legacy_openai is not None
+
+def _detect_sdk():
+    """Look for the OpenAI SDK again, e.g. after main.py installed it at runtime."""
+    global OpenAI, AsyncOpenAI, _legacy_openai, NEW_SDK, LEGACY_OPENAI
+    importlib.invalidate_caches()
+    try:
+        import openai as _legacy_openai
+    except Exception:
+        return
+    OpenAI = getattr(_legacy_openai, "OpenAI", None)
+    AsyncOpenAI = getattr(_legacy_openai, "AsyncOpenAI", None)
+    NEW_SDK = OpenAI is not None
+    LEGACY_OPENAI = True
+
+def _init_client_from_key(key: str):
+    """Initialize a client for either the new OpenAI SDK or the legacy module.
+
+    Returns True on success, False otherwise.
+    """
+    global client, async_client
+    if not NEW_SDK and not LEGACY_OPENAI:
+        _detect_sdk()
+    # New SDK (OpenAI class); retries are done by _call_api so they can respect the breaker
+    if NEW_SDK:
+        try:
+            client = OpenAI(api_key=key, timeout=REQUEST_TIMEOUT_SECONDS, max_retries=0)
+            if AsyncOpenAI is not None:
+                async_client = AsyncOpenAI(api_key=key, timeout=REQUEST_TIMEOUT_SECONDS, max_retries=0)
+            return True
+        except Exception:
+            client = None
+            return False
+
+    # Legacy SDK (openai module)
+    if LEGACY_OPENAI:
+        try:
+            # set api key on module and treat module as client placeholder
+            _legacy_openai.api_key = key
+            client = _legacy_openai
+            return True
+        except Exception:
+            client = None
+            return False
+
+    # No supported SDK present
+    client = None
+    return False
+
+# --- VERSION-AGNOSTIC OPENAI CALL ---
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 400
+# Transient failures are retried with full-jitter exponential backoff
+MAX_RETRIES = 2
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 4.0
+# After this many failed requests in a row the API is not called for BREAKER_RESET_SECONDS
+BREAKER_FAILURES = 5
+BREAKER_RESET_SECONDS = 30.0
+# SDK exception names (new and legacy) that mean the API is unhealthy rather than the request wrong
+TRANSIENT_ERRORS = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "Timeout", "APIError", "ServiceUnavailableError", "TryAgain",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """The API is not being called because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        """Closed until failure_threshold failures in a row, then open for reset_seconds.
+
+        After that one trial request is let through (half open): success closes the
+        breaker, failure opens it again.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = self.clock()
+
+
+breaker = CircuitBreaker()
+api_stats = {"requests": 0, "failures": 0, "retries": 0, "fast_failures": 0, "latency_ms_total": 0.0}
+# Replaced in tests so retries don't wait
+_sleep = time.sleep
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "http_status", None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    return type(error).__name__ in TRANSIENT_ERRORS
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class _ApiCall:
+    def __init__(self):
+        """Breaker, retry and counter bookkeeping for one request, shared by _call_api and _call_api_async.
+
+        Raises CircuitOpenError when the breaker is open.
+        """
+        if not breaker.allow():
+            api_stats["fast_failures"] += 1
+            raise CircuitOpenError("the AI service is unavailable; try again shortly")
+        self.attempt = 0
+        self._start = 0.0
+
+    def begin(self):
+        api_stats["requests"] += 1
+        self._start = time.perf_counter()
+
+    def _ended(self):
+        api_stats["latency_ms_total"] += (time.perf_counter() - self._start) * 1000
+
+    def succeeded(self):
+        self._ended()
+        breaker.record_success()
+
+    def failed(self, error: Exception):
+        """Seconds to wait before retrying after error, or None if it should be raised."""
+        self._ended()
+        api_stats["failures"] += 1
+        if not _is_transient(error):
+            # The API answered; the request itself was rejected
+            breaker.record_success()
+            return None
+        if self.attempt >= MAX_RETRIES:
+            breaker.record_failure()
+            return None
+        delay = _backoff(self.attempt)
+        self.attempt += 1
+        api_stats["retries"] += 1
+        return delay
+
+
+def _call_api(request):
+    """Run request() through the circuit breaker, retrying transient failures."""
+    call = _ApiCall()
+    while True:
+        call.begin()
+        try:
+            result = request()
+        except Exception as e:
+            delay = call.failed(e)
+            if delay is None:
+                raise
+            _sleep(delay)
+            continue
+        call.succeeded()
+        return result
+
+
+async def _call_api_async(request):
+    """_call_api for awaitable requests: same breaker, retries and counters."""
+    call = _ApiCall()
+    while True:
+        call.begin()
+        try:
+            result = await request()
+        except Exception as e:
+            delay = call.failed(e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        call.succeeded()
+        return result
+
+
+def client_metrics() -> dict:
+    """Request counters and circuit breaker state for the API client."""
+    stats = dict(api_stats)
+    stats["breaker_state"] = breaker.state
+    stats["breaker_opened"] = breaker.opened
+    stats["consecutive_failures"] = breaker.failures
+    stats["mean_latency_ms"] = stats.pop("latency_ms_total") / stats["requests"] if stats["requests"] else 0.0
+    return stats
+
+
+def _chat_messages(system_prompt: str, user_input: str) -> list:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input}
+    ]
+
+
+def _chat_request(system_prompt: str, user_input: str, stream: bool = False):
+    messages = _chat_messages(system_prompt, user_input)
+    if client is None:
+        raise RuntimeError("the AI client is not configured")
+    if hasattr(client, "chat"):
+        return _call_api(lambda: client.chat.completions.create(
+            model=MODEL, messages=messages, max_tokens=MAX_TOKENS, temperature=0.7, stream=stream))
+    # Legacy SDK: the client is the openai module
+    return _call_api(lambda: client.ChatCompletion.create(
+        model=MODEL, messages=messages, max_tokens=MAX_TOKENS, temperature=0.7, stream=stream,
+        request_timeout=REQUEST_TIMEOUT_SECONDS))
+
+
+def get_chat_completion(system_prompt: str, user_input: str):
+    resp = _chat_request(system_prompt, user_input)
+    return resp.choices[0].message.content.strip()
+
+
+def _delta_text(chunk) -> str:
+    # New SDK chunks are objects; legacy ones are dict-like
+    choice = chunk["choices"][0] if isinstance(chunk, dict) else chunk.choices[0]
+    delta = choice["delta"] if isinstance(choice, dict) else choice.delta
+    text = delta.get("content") if isinstance(delta, dict) else getattr(delta, "content", None)
+    return text or ""
+
+
+def stream_chat_completion(system_prompt: str, user_input: str):
+    """Yield the completion's text as it arrives."""
+    chunks = _chat_request(system_prompt, user_input, stream=True)
+    try:
+        for chunk in chunks:
+            text = _delta_text(chunk)
+            if text:
+                yield text
+    except Exception as e:
+        if _is_transient(e):
+            # Failed mid-stream; not retried since part of the reply may have been shown
+            breaker.record_failure()
+        raise
+
+# --- LOCAL CLIENT ---
+class LocalClient:
+    def __init__(self, reply=None, delay: float = 0.0):
+        """Offline stand-in for the OpenAI client (new SDK interface, streaming included).
+
+        reply(system_prompt, user_input) returns the model output text; the default is a
+        short supportive reply with an empty memory patch. delay is slept per request.
+        """
+        self.reply = reply or self._default_reply
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    @staticmethod
+    def _default_reply(system_prompt: str, user_input: str) -> str:
+        return ("Thank you for telling me. I'm here with you, and we can take this one step at a time.\n"
+                f"{MEMORY_MARKER}\n[]")
+
+    def _create(self, model=None, messages=(), stream=False, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+        return self._respond(messages, stream)
+
+    def _respond(self, messages, stream: bool):
+        with self._lock:
+            self.requests += 1
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_input = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        text = self.reply(system_prompt, user_input)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+        return (SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+                for piece in re.findall(r"\S+\s*|\s+", text))
+
+
+class AsyncLocalClient(LocalClient):
+    """LocalClient with the AsyncOpenAI interface: create() is awaited and its delay doesn't block."""
+
+    def __init__(self, reply=None, delay: float = 0.0):
+        super().__init__(reply, delay)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._acreate))
+
+    async def _acreate(self, model=None, messages=(), stream=False, **kwargs):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._respond(messages, False)
+
+
+def use_client(new_client) -> None:
+    """Route completions through new_client (e.g. a LocalClient)."""
+    global client
+    client = new_client
@@ -0,0 +1,181 @@
+"""JSON extraction from model output.
+
+Model output may wrap its JSON in chatter or code fences, put braces inside strings, or
+stop mid-structure (max_tokens). JSONExtractor tracks strings and nesting as text is
+fed in, so the first complete object or array is found in one pass and parsed once,
+and a truncated one can still be recovered up to its last complete element.
+"""
+import json
+import re
+
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+_VALUE_START_RE = re.compile(r"[{\[]")
+_DECODER = json.JSONDecoder()
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+_STRUCTURE_RE = re.compile(r'["{}\[\],]')
+_PARTIAL_ESCAPE_RE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+
+
+class JSONExtractor:
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        # (offset, stack) after each complete element inside a container, for partial()
+        self._boundaries = []
+        self._value = None
+        self.complete = False
+
+    def feed(self, text: str):
+        self._buf += text
+        if not self.complete:
+            self._scan()
+
+    def _restart(self, at: int):
+        # The candidate starting before `at` is not valid JSON; look for the next one
+        self._start = None
+        self._stack = []
+        self._in_string = self._escape = False
+        self._boundaries = []
+        self._pos = at
+
+    def _scan(self):
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            if self._start is None:
+                match = _VALUE_START_RE.search(buf, i)
+                if match is None:
+                    i = n
+                    break
+                i = match.start()
+                self._start = i
+                self._stack = ["}" if buf[i] == "{" else "]"]
+                self._boundaries = [(i + 1, tuple(self._stack))]
+                i += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                # Jump to the next quote or backslash
+                match = _STRING_SPECIAL_RE.search(buf, i)
+                if match is None:
+                    i = n
+                    break
+                i = match.start()
+                if buf[i] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                i += 1
+                continue
+            # Jump to the next character that matters outside strings
+            match = _STRUCTURE_RE.search(buf, i)
+            if match is None:
+                i = n
+                break
+            i = match.start()
+            ch = buf[i]
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._stack.append("}" if ch == "{" else "]")
+                self._boundaries.append((i + 1, tuple(self._stack)))
+            elif ch in "}]":
+                if ch != self._stack[-1]:
+                    self._restart(self._start + 1)
+                    i = self._pos
+                    continue
+                self._stack.pop()
+                if not self._stack:
+                    if self._finish(i + 1):
+                        self._pos = i + 1
+                        return
+                    self._restart(self._start + 1)
+                    i = self._pos
+                    continue
+                self._boundaries.append((i + 1, tuple(self._stack)))
+            else:
+                self._boundaries.append((i, tuple(self._stack)))
+            i += 1
+        self._pos = i
+
+    def _finish(self, end: int) -> bool:
+        text = self._buf[self._start:end]
+        for candidate in (text, _TRAILING_COMMA_RE.sub(r"\1", text)):
+            try:
+                self._value = json.loads(candidate)
+            except ValueError:
+                continue
+            self.complete = True
+            return True
+        return False
+
+    def value(self):
+        """The first complete JSON object or array; ValueError if there is none (yet)."""
+        if not self.complete:
+            raise ValueError("no complete JSON value")
+        return self._value
+
+    @property
+    def rest(self) -> str:
+        """Text after the complete value."""
+        return self._buf[self._pos:] if self.complete else ""
+
+    def partial(self, whole_items: bool = False):
+        """Best-effort value from what has arrived, None if no value has started.
+
+        An unfinished value is closed where it stops (an open string included), or else
+        after its last complete element. With whole_items, it is instead cut back to the
+        outermost container's complete items, so no truncated item is ever returned.
+        """
+        if self.complete:
+            return self._value
+        if self._start is None:
+            return None
+        attempts = []
+        if not whole_items:
+            text = self._buf[self._start:]
+            if self._in_string:
+                text = _PARTIAL_ESCAPE_RE.sub("", text) + '"'
+            attempts.append(text.rstrip().rstrip(",") + "".join(reversed(self._stack)))
+        attempts += [self._buf[self._start:offset].rstrip().rstrip(",") + "".join(reversed(stack))
+                     for offset, stack in reversed(self._boundaries)
+                     if not whole_items or len(stack) == 1]
+        for attempt in attempts:
+            try:
+                return json.loads(attempt)
+            except ValueError:
+                continue
+        return None
+
+
+def extract_json(text: str, partial: bool = False):
+    """First JSON object or array in text.
+
+    With partial=True a truncated one is cut back to its complete items. Raises
+    ValueError when there is nothing to return.
+    """
+    # Well-formed JSON (chatter around it is fine) is decoded directly
+    match = _VALUE_START_RE.search(text)
+    if match is None:
+        raise ValueError("no JSON object or array found")
+    try:
+        return _DECODER.raw_decode(text, match.start())[0]
+    except ValueError:
+        pass
+    extractor = JSONExtractor()
+    extractor.feed(text[match.start():])
+    if extractor.complete:
+        return extractor.value()
+    if partial:
+        value = extractor.partial(whole_items=True)
+        if value is not None:
+            return value
+    raise ValueError("no JSON object or array found")
@@ -0,0 +1,201 @@
+"""Companion memory: what is remembered about a requester, and how much of it is sent.
+
+Only part of memory is sent with each prompt: the most relevant facts, the latest turns
+and a compact summary of older turns, within a fixed token budget.
+"""
+import json
+import re
+
+try:
+    from .companion_patch import apply_memory_patch
+except ImportError:
+    from companion_patch import apply_memory_patch
+
+
+def new_memory() -> dict:
+    """Empty memory for a new conversation."""
+    return {
+        "user_name": None,
+        "pronouns": None,
+        "age": None,
+        "location": None,
+        "parents": {},
+        "siblings": {},
+        "friends": {},
+        "pets": {},
+        "significant_others": {},
+        "losses": [],
+        "major_events": [],
+        "recent_emotions": [],
+        "coping_strategies": [],
+        "conversation_history": [],
+        "preferences": {"tone": None, "topics_to_avoid": [], "favorites": []},
+        "crisis_info": {},
+        "disasters": [],
+        "conversation_summary": ""
+    }
+
+
+# Memory of the default (unnamed) session
+memory = new_memory()
+
+MEMORY_TOKEN_BUDGET = 1200
+RECENT_TURNS = 6
+SUMMARY_TOKEN_LIMIT = 200
+# Managed by MemoryManager rather than by the model
+_MANAGED_KEYS = ("conversation_history", "conversation_summary")
+# Always worth sending when set
+_CORE_KEYS = ("user_name", "pronouns", "age", "location", "preferences", "crisis_info")
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def _words(text: str) -> set:
+    return {w for w in _WORD_RE.findall(text.lower()) if len(w) > 2}
+
+
+def _compact_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class MemoryManager:
+    def __init__(self, memory_dict: dict, token_budget: int = MEMORY_TOKEN_BUDGET,
+                 recent_turns: int = RECENT_TURNS, summary_limit: int = SUMMARY_TOKEN_LIMIT):
+        """Budgeted view of a memory dict; memory_dict is updated in place."""
+        self.memory = memory_dict
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_limit = summary_limit
+        # One entry per prompt built: {"prompt_tokens", "memory_tokens", "facts_sent", "facts_total"}
+        self.turn_stats = []
+        self.patch_stats = {"applied": 0, "rejected": 0}
+        self._pending_stats = {}
+
+    def record_turn(self, user_input: str, reply: str):
+        """Add a turn to history; turns beyond the recent window are folded into the summary."""
+        history = self.memory.setdefault("conversation_history", [])
+        history.append({"user": user_input, "bot": reply})
+        while len(history) > self.recent_turns:
+            self._fold_into_summary(history.pop(0))
+
+    def _fold_into_summary(self, turn):
+        # Keep the first sentence of what the user said; drop the oldest notes past the limit
+        text = turn.get("user", "") if isinstance(turn, dict) else str(turn)
+        note = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0][:160]
+        if not note:
+            return
+        parts = [p for p in (self.memory.get("conversation_summary") or "").split(" | ") if p]
+        parts.append(note)
+        while len(parts) > 1 and estimate_tokens(" | ".join(parts)) > self.summary_limit:
+            parts.pop(0)
+        self.memory["conversation_summary"] = " | ".join(parts)
+
+    def _facts(self):
+        """Yield (key, subkey_or_index, value) for every stored fact outside the managed keys."""
+        for key, value in self.memory.items():
+            if key in _MANAGED_KEYS or value in (None, "", [], {}):
+                continue
+            if isinstance(value, dict) and key not in _CORE_KEYS:
+                for subkey, subvalue in value.items():
+                    yield key, subkey, subvalue
+            elif isinstance(value, list):
+                for index, item in enumerate(value):
+                    yield key, index, item
+            else:
+                yield key, None, value
+
+    def _rank(self, user_input: str):
+        words = _words(user_input)
+        ranked = []
+        for key, sub, value in self._facts():
+            text = _compact_json(value)
+            overlap = len(words & _words(f"{key} {sub if sub is not None else ''} {text}"))
+            score = 2.0 * overlap
+            if key in _CORE_KEYS:
+                score += 3.0
+            if isinstance(sub, int):
+                # Later list entries are more recent
+                score += 0.5 * (sub + 1) / len(self.memory[key])
+            ranked.append((score, key, sub, value, estimate_tokens(text) + 2))
+        ranked.sort(key=lambda r: r[0], reverse=True)
+        return ranked
+
+    def build_context(self, user_input: str) -> dict:
+        """Subset of memory to send with user_input, fitted to the token budget."""
+        budget = self.token_budget
+        context = {}
+        history = self.memory.get("conversation_history", [])
+        # Up to half the budget for the latest turns, newest first
+        recent = []
+        used = 0
+        for turn in reversed(history[-self.recent_turns:]):
+            cost = estimate_tokens(_compact_json(turn))
+            if used + cost > budget // 2:
+                break
+            recent.insert(0, turn)
+            used += cost
+        if recent:
+            context["recent_turns"] = recent
+            budget -= used
+        summary = self.memory.get("conversation_summary")
+        if summary:
+            context["conversation_summary"] = summary
+            budget -= estimate_tokens(summary)
+        ranked = self._rank(user_input)
+        lists = {}
+        sent = 0
+        for score, key, sub, value, cost in ranked:
+            if cost > budget:
+                continue
+            budget -= cost
+            sent += 1
+            if sub is None:
+                context[key] = value
+            elif isinstance(sub, int):
+                lists.setdefault(key, []).append((sub, value))
+            else:
+                context.setdefault(key, {})[sub] = value
+        for key, items in lists.items():
+            context[key] = [value for _, value in sorted(items, key=lambda i: i[0])]
+        self._pending_stats = {"facts_sent": sent, "facts_total": len(ranked)}
+        return context
+
+    def note_prompt(self, system_prompt: str, user_input: str, memory_json: str):
+        stats = dict(self._pending_stats)
+        stats["memory_tokens"] = estimate_tokens(memory_json)
+        stats["prompt_tokens"] = estimate_tokens(system_prompt) + estimate_tokens(user_input)
+        self.turn_stats.append(stats)
+        del self.turn_stats[:-100]
+
+    def merge_update(self, updated: dict):
+        """Apply memory returned by the model without losing facts it was not shown.
+
+        Lists are merged (new entries appended), dicts updated key by key, and scalars
+        replaced; keys managed locally are ignored.
+        """
+        if not isinstance(updated, dict):
+            return
+        for key, value in updated.items():
+            if key in _MANAGED_KEYS or key == "recent_turns":
+                continue
+            current = self.memory.get(key)
+            if isinstance(current, list) and isinstance(value, list):
+                current.extend(item for item in value if item not in current)
+            elif isinstance(current, dict) and isinstance(value, dict):
+                current.update(value)
+            else:
+                self.memory[key] = value
+
+    def apply_patch(self, ops: list) -> int:
+        """Apply memory patch operations from the model; returns how many were applied."""
+        applied = apply_memory_patch(self.memory, ops)
+        self.patch_stats["applied"] += applied
+        self.patch_stats["rejected"] += len(ops) - applied if isinstance(ops, list) else 1
+        return applied
+
+
+memory_manager = MemoryManager(memory)
@@ -0,0 +1,161 @@
+"""Memory patches: the model returns only what changed in a requester's memory.
+
+Changes are JSON Patch style operations ({"op": "add" | "replace" | "remove",
+"path": "/field/...", "value": ...}). Each operation is validated against
+PATCH_OP_SCHEMA and applied in place, so an update costs O(size of the change) and a
+malformed operation cannot damage the rest of memory.
+"""
+import re
+
+try:
+    import jsonschema
+except Exception:
+    # Operations are checked with the minimal validator below instead
+    jsonschema = None
+
+MEMORY_FIELD_TYPES = {
+    "user_name": ["string", "null"],
+    "pronouns": ["string", "null"],
+    "age": ["integer", "string", "null"],
+    "location": ["string", "null"],
+    "parents": "object",
+    "siblings": "object",
+    "friends": "object",
+    "pets": "object",
+    "significant_others": "object",
+    "losses": "array",
+    "major_events": "array",
+    "recent_emotions": "array",
+    "coping_strategies": "array",
+    "preferences": "object",
+    "crisis_info": "object",
+    "disasters": "array",
+}
+MAX_PATCH_OPS = 50
+PATCH_OP_SCHEMA = {
+    "type": "object",
+    "required": ["op", "path"],
+    "additionalProperties": False,
+    "properties": {
+        "op": {"enum": ["add", "replace", "remove"]},
+        "path": {"type": "string", "pattern": "^/(" + "|".join(MEMORY_FIELD_TYPES) + ")(/[^/]+)*$"},
+        "value": {},
+    },
+    "allOf": [
+        {"if": {"properties": {"op": {"enum": ["add", "replace"]}}}, "then": {"required": ["value"]}},
+    ] + [
+        # Replacing a whole field must keep its type
+        {"if": {"properties": {"path": {"const": f"/{field}"}}}, "then": {"properties": {"value": {"type": kind}}}}
+        for field, kind in MEMORY_FIELD_TYPES.items()
+    ],
+}
+
+# Empty value of each container field (also used when an older saved memory lacks it)
+_FIELD_DEFAULTS = {field: dict if kind == "object" else list for field, kind in MEMORY_FIELD_TYPES.items()
+                   if kind in ("object", "array")}
+_JSON_TYPES = {
+    "object": dict, "array": list, "string": str, "null": type(None),
+    "integer": int, "number": (int, float), "boolean": bool,
+}
+
+
+def _schema_errors(value, schema: dict) -> list:
+    """Minimal JSON Schema check covering the keywords PATCH_OP_SCHEMA uses (when jsonschema is missing)."""
+    errors = []
+    kinds = schema.get("type")
+    if kinds is not None:
+        kinds = [kinds] if isinstance(kinds, str) else kinds
+        matches = any(isinstance(value, _JSON_TYPES[k]) and not (k in ("integer", "number") and isinstance(value, bool))
+                      for k in kinds)
+        if not matches:
+            return [f"{value!r} is not of type {kinds}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{value!r} is not one of {schema['enum']}")
+    if "const" in schema and value != schema["const"]:
+        errors.append(f"{value!r} != {schema['const']!r}")
+    if "pattern" in schema and isinstance(value, str) and not re.search(schema["pattern"], value):
+        errors.append(f"{value!r} does not match {schema['pattern']!r}")
+    if isinstance(value, dict):
+        missing = [k for k in schema.get("required", ()) if k not in value]
+        if missing:
+            errors.append(f"missing {missing}")
+        properties = schema.get("properties", {})
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(_schema_errors(item, properties[key]))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"unexpected property {key!r}")
+    for sub in schema.get("allOf", ()):
+        if "if" in sub:
+            if not _schema_errors(value, sub["if"]):
+                errors.extend(_schema_errors(value, sub.get("then", {})))
+        else:
+            errors.extend(_schema_errors(value, sub))
+    return errors
+
+
+_patch_validator = None
+
+
+def patch_op_errors(op) -> list:
+    """Schema violations of one patch operation (empty when valid)."""
+    global _patch_validator
+    if jsonschema is None:
+        return _schema_errors(op, PATCH_OP_SCHEMA)
+    if _patch_validator is None:
+        _patch_validator = jsonschema.Draft7Validator(PATCH_OP_SCHEMA)
+    return [error.message for error in _patch_validator.iter_errors(op)]
+
+
+def _apply_op(mem: dict, op: dict):
+    tokens = [t.replace("~1", "/").replace("~0", "~") for t in op["path"].split("/")[1:]]
+    field = tokens[0]
+    if field not in mem or (len(tokens) == 1 and op["op"] == "remove"):
+        # Fields are never deleted, only emptied
+        mem[field] = _FIELD_DEFAULTS[field]() if field in _FIELD_DEFAULTS else None
+        if len(tokens) == 1 and op["op"] == "remove":
+            return
+    parent, key = mem, field
+    for token in tokens[1:]:
+        parent = parent[key] if isinstance(parent, dict) else parent[int(key)]
+        key = token
+    kind = op["op"]
+    if isinstance(parent, list):
+        if key == "-":
+            if kind != "add":
+                raise ValueError("'-' only names a new list item")
+            if op["value"] not in parent:
+                parent.append(op["value"])
+            return
+        index = int(key)
+        if kind == "add":
+            parent.insert(index, op["value"])
+        elif kind == "replace":
+            parent[index] = op["value"]
+        else:
+            del parent[index]
+    elif isinstance(parent, dict):
+        if kind == "remove":
+            del parent[key]
+        elif kind == "replace" and key not in parent:
+            raise KeyError(key)
+        else:
+            parent[key] = op["value"]
+    else:
+        raise TypeError(f"{op['path']} does not point into an object or list")
+
+
+def apply_memory_patch(mem: dict, ops) -> int:
+    """Apply valid operations from ops to mem in order; invalid ones are skipped. Returns the number applied."""
+    if not isinstance(ops, list):
+        return 0
+    applied = 0
+    for op in ops[:MAX_PATCH_OPS]:
+        if patch_op_errors(op):
+            continue
+        try:
+            _apply_op(mem, op)
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        applied += 1
+    return applied
@@ -0,0 +1,193 @@
+"""Splitting model output into the reply and the memory update.
+
+The model writes its reply first and the memory update after MEMORY_MARKER, so the
+reply can be shown while it streams; the older single JSON envelope is still accepted.
+"""
+try:
+    from .companion_json import _DECODER, _VALUE_START_RE, JSONExtractor, extract_json
+except ImportError:
+    from companion_json import _DECODER, _VALUE_START_RE, JSONExtractor, extract_json
+
+MEMORY_MARKER = "<<<MEMORY>>>"
+FALLBACK_REPLY = "I'm here to listen. Can you tell me more about what's going on?"
+
+
+class ReplyStream:
+    def __init__(self, on_text=None):
+        """Split streamed model output into reply text (passed to on_text as it arrives) and memory JSON."""
+        self.on_text = on_text
+        self._parts = []
+        self._pending = ""
+        self._memory = None
+        # Output in the JSON envelope format ({"response": ..., "memory": ...}, possibly fenced
+        # or after a few words) has its "response" string passed on as it grows
+        self.envelope = None
+        self._json = None
+        self._response_shown = ""
+        # Text from a "{" in plain output, held back until it is known not to be the envelope
+        self._held = None
+        self._held_text = ""
+
+    def feed(self, text: str):
+        if self._memory is not None:
+            self._memory.feed(text)
+            return
+        if self.envelope is None:
+            stripped = (self._pending + text).lstrip()
+            if len(stripped) < 3 and "```".startswith(stripped):
+                self._pending += text
+                return
+            self.envelope = stripped.startswith("```")
+            if self.envelope:
+                self._json = JSONExtractor()
+                text, self._pending = self._pending + text, ""
+        if self.envelope:
+            self._json.feed(text)
+            self._emit_response(self._json.partial())
+        elif self._held is not None:
+            self._held_text += text
+            self._held.feed(text)
+            self._check_held()
+        else:
+            self._feed_plain(text)
+
+    def _feed_plain(self, text: str, hold: bool = True):
+        buffered = self._pending + text
+        marker = buffered.find(MEMORY_MARKER)
+        if marker != -1:
+            self._emit(buffered[:marker])
+            self._pending = ""
+            self._memory = JSONExtractor()
+            self._memory.feed(buffered[marker + len(MEMORY_MARKER):])
+            return
+        brace = buffered.find("{") if hold else -1
+        if brace != -1:
+            self._emit(buffered[:brace])
+            self._pending = ""
+            self._held = JSONExtractor()
+            self._held_text = buffered[brace:]
+            self._held.feed(self._held_text)
+            self._check_held()
+            return
+        # Hold back anything that could be the start of a marker split across chunks
+        keep = next((n for n in range(min(len(MEMORY_MARKER) - 1, len(buffered)), 0, -1)
+                     if MEMORY_MARKER.startswith(buffered[-n:])), 0)
+        self._emit(buffered[:len(buffered) - keep])
+        self._pending = buffered[len(buffered) - keep:]
+
+    def _check_held(self):
+        parsed = self._held.partial()
+        if isinstance(parsed, dict) and "response" in parsed:
+            self.envelope = True
+            self._json, self._held = self._held, None
+            self._emit_response(parsed)
+        elif self._held.complete or parsed is None:
+            # Not the envelope: it was part of the reply
+            text, self._held = self._held_text, None
+            self._feed_plain(text, hold=False)
+
+    def _emit_response(self, parsed):
+        response = parsed.get("response") if isinstance(parsed, dict) else None
+        if not isinstance(response, str):
+            return
+        shown = self._response_shown
+        # Only ever extend what was shown; a string cut mid-escape may not be a prefix
+        if response.startswith(shown) and len(response) > len(shown):
+            self._response_shown = response
+            self._emit(response[len(shown):])
+
+    def _emit(self, text: str):
+        if not text:
+            return
+        if not self._parts:
+            text = text.lstrip()
+            if not text:
+                return
+        self._parts.append(text)
+        if self.on_text is not None:
+            self.on_text(text)
+
+    @property
+    def text(self) -> str:
+        """Reply text passed on so far."""
+        return "".join(self._parts).strip()
+
+    @property
+    def streamed(self) -> bool:
+        """Whether any reply text has been passed to on_text."""
+        return bool(self._parts) and self.on_text is not None
+
+    def close(self):
+        """Return (reply, memory update) once the stream has ended."""
+        if self.envelope:
+            reply, update = _parse_envelope(self._json)
+            self._emit_response({"response": reply})
+            return reply, update
+        if self._held is not None:
+            text, self._held = self._held_text, None
+            self._feed_plain(text, hold=False)
+        self._emit(self._pending)
+        self._pending = ""
+        reply = "".join(self._parts).strip()
+        if self._memory is None:
+            return reply or FALLBACK_REPLY, {}
+        return reply or FALLBACK_REPLY, _memory_update(self._memory)
+
+
+def _memory_value(parsed):
+    """Patch operations (a list) or, in the older format, changed fields (a dict)."""
+    if isinstance(parsed, dict) and isinstance(parsed.get("memory"), dict):
+        return parsed["memory"]
+    return parsed if isinstance(parsed, (dict, list)) else {}
+
+
+def _memory_update(extractor: JSONExtractor):
+    return _memory_value(extractor.value() if extractor.complete else extractor.partial(whole_items=True))
+
+
+def _parse_memory(text: str):
+    try:
+        return _memory_value(extract_json(text, partial=True))
+    except ValueError:
+        return {}
+
+
+def _envelope_reply(parsed, complete: bool = True):
+    """(reply, memory update) from a {"response": ..., "memory": ...} envelope.
+
+    If the envelope was cut off, what there is of the reply is kept but not a possibly
+    truncated memory update.
+    """
+    update = parsed.get("memory", {}) if complete and isinstance(parsed, dict) else {}
+    response = parsed.get("response") if isinstance(parsed, dict) else None
+    if not isinstance(response, str) or not response.strip():
+        return FALLBACK_REPLY, update
+    return response, update
+
+
+def _parse_envelope(extractor: JSONExtractor):
+    if extractor.complete:
+        return _envelope_reply(extractor.value())
+    return _envelope_reply(extractor.partial(), complete=False)
+
+
+def parse_model_output(text: str):
+    """(reply, memory update) from complete model output in either format."""
+    if MEMORY_MARKER in text:
+        reply, _, memory_text = text.partition(MEMORY_MARKER)
+        return reply.strip() or FALLBACK_REPLY, _parse_memory(memory_text)
+    match = _VALUE_START_RE.search(text)
+    if match is not None:
+        # Fast path for a well-formed envelope
+        try:
+            parsed = _DECODER.raw_decode(text, match.start())[0]
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return _envelope_reply(parsed)
+    extractor = JSONExtractor()
+    extractor.feed(text)
+    if not isinstance(extractor.partial(), dict):
+        # Plain text without a memory update
+        return text.strip() or FALLBACK_REPLY, {}
+    return _parse_envelope(extractor)
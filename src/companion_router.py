@@ -0,0 +1,274 @@
+"""Local detectors and intent routing for the companion.
+
+Messages the companion can answer from its own data (crisis lines, canned disaster
+safety advice, recorded times of losses) are answered locally without an API call.
+Canned safety advice is only for explicit preparedness questions ("what should I do
+during an earthquake?"); a message that also mentions a loss, a relative or feelings
+("my mom died in the earthquake and I don't know what to do") goes to the model.
+"""
+import re
+import time
+from datetime import datetime, timezone
+
+try:
+    from dateutil import parser as date_parser
+except Exception:
+    # minimal fallback for date parsing
+    date_parser = None
+
+try:
+    from .companion_memory import memory
+    from .companion_scanner import KeywordScanner, trie_pattern
+except ImportError:
+    from companion_memory import memory
+    from companion_scanner import KeywordScanner, trie_pattern
+
+# --- CRISIS MESSAGE ---
+CRISIS_RESPONSE = (
+    "I'm really sorry that you're feeling like this. You're not alone, and help is available right now.\n"
+    "If you’re in Canada or the U.S., you can call or text **988** to reach the Suicide and Crisis Lifeline.\n"
+    "If you're outside those areas, please reach out to your local emergency number or someone you trust."
+)
+
+# --- DISASTER ADVICE ---
+# Canonical disaster keywords; src/disaster_types.py normalizes report types onto this set
+DISASTER_ADVICE = {
+    "earthquake": "Drop, cover, and hold on. Stay away from windows and heavy objects.",
+    "fire": "Stay low to avoid smoke, exit immediately if safe, and call emergency services.",
+    "tornado": "Go to a safe room or basement. Avoid windows and stay sheltered.",
+    "flood": "Move to higher ground immediately and avoid walking or driving in floodwaters.",
+    "hurricane": "Follow evacuation orders and stay indoors away from windows.",
+    "storm": "Stay indoors and away from tall objects, trees, and metal structures.",
+    "tsunami": "Move to higher ground and follow evacuation routes."
+}
+
+# --- KEYWORDS ---
+# Every keyword the detectors care about, found in one left-to-right sweep per message.
+CRISIS_KEYWORDS = ["kill myself", "suicide", "end my life", "want to die", "hurt myself"]
+RELATIONS = ["dad", "mom", "father", "mother", "brother", "sister", "friend", "pet"]
+LOSS_VERBS = ["died", "passed", "lost", "killed", "gone"]
+TIME_QUESTION_WORDS = ["what time", "when"]
+# Signs the message is about how the user feels rather than how to stay safe
+EMOTION_WORDS = [
+    "sad", "scared", "afraid", "terrified", "anxious", "panic", "grief", "grieving", "mourning", "miss",
+    "hopeless", "helpless", "alone", "lonely", "crying", "numb", "overwhelmed", "depressed", "heartbroken",
+    "devastated", "struggling", "can't cope", "cant cope", "keep going", "don't know what to do",
+    "dont know what to do",
+]
+# A message without one of these has no date or time for extract_time_from_text to find
+TEMPORAL_WORDS = [
+    "today", "tonight", "yesterday", "tomorrow", "ago", "morning", "afternoon", "evening", "night",
+    "noon", "midnight", "am", "pm", "a.m.", "p.m.", "o'clock", "week", "month", "year", "last",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "jan", "january", "feb", "february", "mar", "march", "apr", "april", "may", "jun", "june",
+    "jul", "july", "aug", "august", "sep", "sept", "september", "oct", "october",
+    "nov", "november", "dec", "december",
+]
+
+
+scanner = KeywordScanner(
+    {
+        "crisis": CRISIS_KEYWORDS,
+        "disaster": list(DISASTER_ADVICE),
+        "relation": RELATIONS,
+        "loss": LOSS_VERBS,
+        "time_question": TIME_QUESTION_WORDS,
+        "temporal": TEMPORAL_WORDS,
+        "emotion": EMOTION_WORDS,
+        "digit": list("0123456789"),
+    },
+    # "fired" or "my mind is flooded" is not a disaster
+    whole_words=("disaster", "relation", "temporal", "emotion"),
+)
+
+
+def scan_message(user_input: str, scan: dict = None) -> dict:
+    return scanner.scan(user_input) if scan is None else scan
+
+# --- HELPERS ---
+def extract_time_from_text(text: str):
+    try:
+        dt = date_parser.parse(text, fuzzy=True)
+        return dt.isoformat()
+    except Exception:
+        return None
+
+def update_disasters(user_input: str, mem: dict = None, scan: dict = None):
+    mem = memory if mem is None else mem
+    for disaster in scan_message(user_input, scan).get("disaster", ()):
+        if not any(d.get("type") == disaster for d in mem["disasters"]):
+            mem["disasters"].append({
+                "type": disaster,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "advice": DISASTER_ADVICE[disaster]
+            })
+
+_LOSS_RE = re.compile(r"(my|our)\s+(dad|mom|father|mother|brother|sister|friend|pet)\s*(\w*)\s*(died|passed|lost|killed|gone)")
+_CAUSE_RE = re.compile(r"(?:due to|in a|from a|because of|in a)\s+([\w\s]+)")
+
+
+def update_losses_with_time(user_input: str, mem: dict = None, scan: dict = None):
+    mem = memory if mem is None else mem
+    scan = scan_message(user_input, scan)
+    if "relation" not in scan or "loss" not in scan:
+        return
+    text = user_input.lower()
+    matches = _LOSS_RE.findall(text)
+    if not matches:
+        return
+    cause_match = _CAUSE_RE.search(text)
+    cause = cause_match.group(1) if cause_match else "unknown cause"
+    mentioned = None
+    if "temporal" in scan or "digit" in scan:
+        mentioned = extract_time_from_text(user_input)
+    for match in matches:
+        person_type = match[1]
+        person_name = match[2].capitalize() if match[2] else person_type.capitalize()
+        timestamp = mentioned or datetime.now(timezone.utc).isoformat()
+        exists = any(l.get("person") == person_name and l.get("timestamp") == timestamp for l in mem["losses"])
+        if not exists:
+            mem["losses"].append({
+                "person": person_name,
+                "cause": cause,
+                "timestamp": timestamp
+            })
+
+_TIME_QUESTION_RE = re.compile(r"^\s*(?:what time|when)\b|\b(?:what time|when)\b[^.!]*\?")
+
+
+def _format_event_time(timestamp: str) -> str:
+    try:
+        return datetime.fromisoformat(timestamp).strftime("%I:%M %p on %A, %B %d, %Y")
+    except Exception:
+        return timestamp
+
+
+def recorded_event(user_input: str, mem: dict = None, scan: dict = None):
+    """("loss", loss) or ("disaster", disaster) for the latest recorded one the message names, else None."""
+    mem = memory if mem is None else mem
+    text = user_input.lower()
+    for loss in reversed(mem["losses"]):
+        person = loss.get("person")
+        if person and re.search(r"\b" + re.escape(person.lower()) + r"\b", text):
+            return "loss", loss
+    named = scan_message(user_input, scan).get("disaster", ())
+    for disaster in reversed(mem["disasters"]):
+        if disaster.get("type") in named:
+            return "disaster", disaster
+    return None
+
+
+def check_for_time_question(user_input: str, mem: dict = None, scan: dict = None):
+    """Answer a time question about a recorded loss or disaster; None for anything else."""
+    scan = scan_message(user_input, scan)
+    if "time_question" not in scan or not _TIME_QUESTION_RE.search(user_input.lower()):
+        return None
+    event = recorded_event(user_input, mem, scan)
+    if event is None:
+        # "When will I feel better?" is not about a recorded event; the model answers it
+        return None
+    kind, record = event
+    when = _format_event_time(record.get("timestamp", "an unknown time"))
+    if kind == "loss":
+        return f"Your loved one {record['person']} died at {when} due to {record.get('cause', 'unknown cause')}."
+    return f"The {record.get('type', 'disaster')} happened at {when}. Advice: {record.get('advice', '')}"
+
+# --- LOCAL INTENT ROUTER ---
+GREETINGS = ["hi", "hello", "hey", "good morning", "good evening"]
+THANKS = ["thanks", "thank you", "thx"]
+GREETING_RESPONSE = "Hi, I'm here with you. How are you feeling right now?"
+THANKS_RESPONSE = "You're welcome. I'm here whenever you want to talk."
+# Routing slower than this counts as over budget in the router metrics
+ROUTER_LATENCY_BUDGET_MS = 2.0
+# Longer messages always go to the model
+ROUTER_MAX_CHARS = 2000
+
+
+_PREPAREDNESS_RE = re.compile(
+    r"\b(?:what (?:should|do|can) (?:i|we) do|what to do|how (?:do|can|should) (?:i|we) (?:stay safe|prepare)"
+    r"|how to (?:stay safe|prepare))\s+(?:during|in|before|for|if there(?:'s| is)|when there(?:'s| is))\b"
+    r"|\bsafety (?:tips|advice)\b")
+# Scanner groups that mean the message is personal, not a preparedness question
+_PERSONAL_GROUPS = ("loss", "relation", "emotion")
+_SMALL_TALK_RE = re.compile(r"^\s*(?:(" + trie_pattern(GREETINGS) + r")|(" + trie_pattern(THANKS) + r"))\b[\s!.,]*"
+                            r"(?:there|so much|a lot)?[\s!.,]*$")
+
+
+class IntentRouter:
+    def __init__(self, latency_budget_ms: float = ROUTER_LATENCY_BUDGET_MS):
+        self.latency_budget_ms = latency_budget_ms
+        self.counts = {}
+        self.total = 0
+        self.escalated = 0
+        self.over_budget = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def classify(self, user_input: str, scan: dict = None, mem: dict = None) -> str:
+        """Intent name: 'crisis', 'disaster_advice', 'time_question', 'greeting', 'thanks' or 'model'.
+
+        Time questions are only local when they name a loss or disaster recorded in mem.
+        """
+        mem = memory if mem is None else mem
+        scan = scan_message(user_input, scan)
+        if "crisis" in scan:
+            # Checked first and at any length so a crisis message is never missed
+            return "crisis"
+        if len(user_input) > ROUTER_MAX_CHARS:
+            return "model"
+        text = user_input.lower()
+        if ("time_question" in scan and _TIME_QUESTION_RE.search(text)
+                and recorded_event(user_input, mem, scan) is not None):
+            return "time_question"
+        if ("disaster" in scan and _PREPAREDNESS_RE.search(text)
+                and not any(group in scan for group in _PERSONAL_GROUPS)):
+            return "disaster_advice"
+        small_talk = _SMALL_TALK_RE.match(text)
+        if small_talk:
+            return "greeting" if small_talk.group(1) else "thanks"
+        return "model"
+
+    def route(self, user_input: str, mem: dict = None, scan: dict = None):
+        """Return (intent, local reply), with reply None when the model should answer."""
+        mem = memory if mem is None else mem
+        start = time.perf_counter()
+        scan = scan_message(user_input, scan)
+        intent = self.classify(user_input, scan, mem)
+        reply = None
+        if intent == "crisis":
+            reply = CRISIS_RESPONSE
+        elif intent == "time_question":
+            reply = check_for_time_question(user_input, mem, scan)
+        elif intent == "disaster_advice":
+            reply = " ".join(f"{d.capitalize()} safety: {DISASTER_ADVICE[d]}" for d in scan["disaster"])
+            reply += " If you are in immediate danger, call your local emergency number."
+        elif intent == "greeting":
+            reply = GREETING_RESPONSE
+        elif intent == "thanks":
+            reply = THANKS_RESPONSE
+        if reply is None:
+            intent = "model"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.total += 1
+        self.counts[intent] = self.counts.get(intent, 0) + 1
+        self.escalated += intent == "model"
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.over_budget += elapsed_ms > self.latency_budget_ms
+        return intent, reply
+
+    def metrics(self) -> dict:
+        local = self.total - self.escalated
+        return {
+            "total": self.total,
+            "local": local,
+            "escalated": self.escalated,
+            "hit_rate": local / self.total if self.total else 0.0,
+            "by_intent": dict(self.counts),
+            "mean_ms": self.total_ms / self.total if self.total else 0.0,
+            "max_ms": self.max_ms,
+            "over_budget": self.over_budget,
+        }
+
+
+router = IntentRouter()
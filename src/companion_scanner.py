@@ -0,0 +1,71 @@
+"""Keyword scanning for companion messages.
+
+Every keyword the detectors care about is found in one left-to-right sweep per message,
+however many keywords there are.
+"""
+import re
+
+
+def trie_pattern(words) -> str:
+    """Regex alternation for words, factored into a trie so matching never backtracks across words."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        ends = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            body = "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class KeywordScanner:
+    def __init__(self, groups: dict, whole_words=()):
+        """Multi-keyword matcher for {group: [keywords]}.
+
+        All keywords go into one trie, compiled to a single regex. scan() sweeps the text
+        left to right with it: each search() skips in C to the next offset where some
+        keyword starts, and the next search resumes one character later, so overlapping
+        keywords are all seen. Keywords match as substrings (like `keyword in text`) except
+        in groups listed in whole_words, which must not touch a letter or digit on either side.
+        """
+        self.whole_words = set(whole_words)
+        self._groups = {}
+        for group, words in groups.items():
+            for word in words:
+                self._groups.setdefault(word.lower(), []).append(group)
+        # Groups a keyword still counts for when it touches a letter or digit
+        self._substring_groups = {word: [g for g in groups if g not in self.whole_words]
+                                  for word, groups in self._groups.items()}
+        # The regex reports the longest keyword at each offset; shorter ones starting there too
+        self._prefixes = {word: [w for w in sorted(self._groups, key=len) if word.startswith(w)]
+                          for word in self._groups}
+        self._pattern = re.compile(trie_pattern(self._groups))
+
+    def scan(self, text: str) -> dict:
+        """{group: [keywords in order of first match]} found in text (case-insensitive)."""
+        text = text.lower()
+        n = len(text)
+        found = {}
+        search = self._pattern.search
+        match = search(text)
+        while match is not None:
+            start = match.start()
+            for word in self._prefixes[match.group()]:
+                end = start + len(word)
+                bounded = not ((start and text[start - 1].isalnum()) or (end < n and text[end].isalnum()))
+                for group in self._groups[word] if bounded else self._substring_groups[word]:
+                    words = found.setdefault(group, [])
+                    if word not in words:
+                        words.append(word)
+            match = search(text, start + 1)
+        return found
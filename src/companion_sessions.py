@@ -0,0 +1,148 @@
+"""Per-requester companion sessions.
+
+Each requester gets their own memory. Sessions live in a sharded LRU cache (each shard
+has its own lock, so lookups for different users rarely contend) and are saved as
+gzip-compressed compact JSON when evicted or saved explicitly.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    from .companion_memory import MemoryManager, _compact_json, new_memory
+except ImportError:
+    from companion_memory import MemoryManager, _compact_json, new_memory
+
+SESSION_DIR = os.path.join("data", "mental_health_sessions")
+MAX_SESSIONS_IN_MEMORY = 256
+SESSION_SHARDS = 16
+
+
+class Session:
+    def __init__(self, name: str, memory_dict: dict = None):
+        self.name = name
+        self.memory = memory_dict if memory_dict is not None else new_memory()
+        if not self.memory.get("user_name"):
+            self.memory["user_name"] = name
+        self.manager = MemoryManager(self.memory)
+        # Held while a turn reads and updates this session's memory
+        self.lock = threading.RLock()
+        self.dirty = False
+        # Turns in progress; an active session is not evicted
+        self.active = 0
+
+
+class SessionStore:
+    def __init__(self, directory: str = SESSION_DIR, max_in_memory: int = MAX_SESSIONS_IN_MEMORY,
+                 shards: int = SESSION_SHARDS):
+        """Sessions keyed by requester name; directory=None keeps them in memory only."""
+        self.directory = directory
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(max(shards, 1))]
+        self._per_shard = max(1, max_in_memory // len(self._shards))
+
+    def _shard(self, name: str):
+        return self._shards[zlib.crc32(name.encode("utf-8")) % len(self._shards)]
+
+    def path_for(self, name: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_-]+", "_", name)[:40]
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.directory, f"{safe}-{digest}.json.gz")
+
+    def _load(self, name: str) -> Session:
+        if self.directory:
+            try:
+                with gzip.open(self.path_for(name), "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    base = new_memory()
+                    base.update(data)
+                    return Session(name, base)
+            except (OSError, ValueError):
+                pass
+        return Session(name)
+
+    @staticmethod
+    def key(name: str) -> str:
+        """The name a session is stored under; spellings that differ only in outer spaces share it."""
+        return (name or "").strip() or "anonymous"
+
+    def cached(self, name: str):
+        """Session for name if it is in memory, else None; never touches the disk."""
+        name = self.key(name)
+        lock, sessions = self._shard(name)
+        with lock:
+            session = sessions.get(name)
+            if session is not None:
+                sessions.move_to_end(name)
+            return session
+
+    def get(self, name: str) -> Session:
+        """Session for name, loaded from disk or created on first use.
+
+        The shard lock only covers the in-memory lookup; reading the session file and
+        saving evicted sessions happen outside it.
+        """
+        session = self.cached(name)
+        if session is not None:
+            return session
+        name = self.key(name)
+        loaded = self._load(name)
+        lock, sessions = self._shard(name)
+        with lock:
+            session = sessions.get(name)
+            if session is not None:
+                # Loaded by another thread meanwhile; keep the one already in use
+                sessions.move_to_end(name)
+                return session
+            session = loaded
+            sessions[name] = session
+            evicted = []
+            excess = len(sessions) - self._per_shard
+            for old_name, old in list(sessions.items()):
+                if excess <= 0:
+                    break
+                # Evicting a session mid-turn would lose the turn's update
+                if old is not session and not old.active:
+                    del sessions[old_name]
+                    evicted.append(old)
+                    excess -= 1
+        for old in evicted:
+            self.save(old)
+        return session
+
+    def save(self, session: Session):
+        """Write a session to disk if it changed since it was last saved."""
+        if not self.directory or not session.dirty:
+            return
+        with session.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                path = self.path_for(session.name)
+                with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+                    f.write(_compact_json(session.memory))
+                os.replace(path + ".tmp", path)
+                session.dirty = False
+            except OSError:
+                pass
+
+    def save_all(self):
+        for lock, sessions in self._shards:
+            with lock:
+                current = list(sessions.values())
+            for session in current:
+                self.save(session)
+
+    def __len__(self) -> int:
+        return sum(len(sessions) for _, sessions in self._shards)
+
+
+sessions = SessionStore()
+
+
+def get_session(name: str) -> Session:
+    return sessions.get(name)
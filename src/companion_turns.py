@@ -0,0 +1,142 @@
+"""One companion turn: local detectors and the intent router first, the model if needed.
+
+update_memory_with_gpt runs a whole turn for the default memory or a session;
+AsyncCompanion reuses the prepare and finish steps around its own model call.
+"""
+import json
+
+try:
+    from .companion_cache import memory_fingerprint, normalize_message, response_cache, shared_context
+    from .companion_client import CircuitOpenError, get_chat_completion, stream_chat_completion
+    from .companion_memory import MemoryManager, _compact_json, memory, memory_manager
+    from .companion_reply import FALLBACK_REPLY, MEMORY_MARKER, ReplyStream, parse_model_output
+    from .companion_router import router, scanner, update_disasters, update_losses_with_time
+    from .companion_sessions import Session
+except ImportError:
+    from companion_cache import memory_fingerprint, normalize_message, response_cache, shared_context
+    from companion_client import CircuitOpenError, get_chat_completion, stream_chat_completion
+    from companion_memory import MemoryManager, _compact_json, memory, memory_manager
+    from companion_reply import FALLBACK_REPLY, MEMORY_MARKER, ReplyStream, parse_model_output
+    from companion_router import router, scanner, update_disasters, update_losses_with_time
+    from companion_sessions import Session
+
+
+def update_memory_with_gpt(user_input: str, session: Session = None, on_text=None, cache: bool = False) -> str:
+    """Reply to user_input and update memory; uses the default memory unless a session is given.
+
+    With on_text, the model's reply is streamed and each piece is passed to on_text as it
+    arrives (local replies are only returned). cache=True is for one-off messages: the prompt
+    leaves out the requester's name and conversation, and the reply may come from
+    response_cache or be shared with an identical request from any session.
+    """
+    if session is None:
+        return _update_memory(user_input, memory, memory_manager, on_text, cache)
+    # One turn at a time per session; other sessions are not blocked
+    with session.lock:
+        session.active += 1
+        try:
+            reply = _update_memory(user_input, session.memory, session.manager, on_text, cache)
+        finally:
+            session.active -= 1
+        session.dirty = True
+    return reply
+
+
+def _prepare_turn(user_input: str, mem: dict, manager: MemoryManager, shared: bool = False):
+    """Run the local detectors and router.
+
+    Returns (local reply, None) when no model call is needed, else (None, (system_prompt, context)).
+    With shared, the context is shared_context() of the usual one, for replies that are cached.
+    """
+    scan = scanner.scan(user_input)
+    update_disasters(user_input, mem, scan)
+    update_losses_with_time(user_input, mem, scan)
+
+    # Crisis lines, canned advice and recorded times are answered without the model
+    intent, local_reply = router.route(user_input, mem, scan)
+    if local_reply is not None:
+        if intent != "crisis":
+            manager.record_turn(user_input, local_reply)
+        return local_reply, None
+
+    context = manager.build_context(user_input)
+    if shared:
+        context = shared_context(context)
+    memory_json = _compact_json(context)
+    system_prompt = (
+        "You are a compassionate emotional support companion. You help users process grief, trauma, and emotions. "
+        "You are not a therapist. If the user mentions self-harm, always return the CRISIS_RESPONSE message.\n\n"
+        f"Relevant memory (JSON format, a subset of what is stored): {memory_json}\n"
+        "Instructions for GPT:\n"
+        "1. Work out what the user's input changes in memory.\n"
+        "2. If the user asks about a loved one's name or details, look it up in memory.\n"
+        "3. Generate a compassionate, empathetic reply.\n"
+        "4. Suggest coping strategies if appropriate.\n"
+        "5. Write the reply to the user first, as plain text.\n"
+        f"6. Then write {MEMORY_MARKER} on its own line, followed by only the changes as a JSON array of "
+        "patch operations using double quotes, e.g. "
+        '[{"op":"add","path":"/recent_emotions/-","value":"sad"},{"op":"replace","path":"/location","value":"Halifax"},'
+        '{"op":"add","path":"/pets/Rex","value":{"type":"dog"}},{"op":"remove","path":"/friends/Sam"}]. '
+        "Write [] if nothing changed.\n"
+        f"Do NOT write anything after the JSON array, and never mention {MEMORY_MARKER} in the reply."
+    )
+
+    manager.note_prompt(system_prompt, user_input, memory_json)
+    return None, (system_prompt, context)
+
+
+def _finish_turn(manager: MemoryManager, user_input: str, reply_text: str, updated_memory):
+    if isinstance(updated_memory, list):
+        manager.apply_patch(updated_memory)
+    else:
+        # Older reply format: changed fields as one object
+        manager.merge_update(updated_memory if isinstance(updated_memory, dict) else {})
+    manager.record_turn(user_input, reply_text)
+
+
+def _report_error(error: Exception):
+    # Provide a more actionable error message for debugging while keeping a gentle fallback for users.
+    print(f"⚠️ Mental health AI error ({type(error).__name__}): {error}")
+    print("Hint: verify the 'openai' package is installed and that OPENAI_API_KEY is correctly set.")
+
+
+def _update_memory(user_input: str, mem: dict, manager: MemoryManager, on_text=None, cache: bool = False) -> str:
+    local_reply, prompt = _prepare_turn(user_input, mem, manager, shared=cache)
+    if local_reply is not None:
+        return local_reply
+    system_prompt, context = prompt
+
+    stream = ReplyStream(on_text)
+
+    def ask():
+        if on_text is None:
+            answer = parse_model_output(get_chat_completion(system_prompt, user_input))
+        else:
+            for text in stream_chat_completion(system_prompt, user_input):
+                stream.feed(text)
+            answer = stream.close()
+        return answer
+
+    try:
+        if cache:
+            key = (normalize_message(user_input), memory_fingerprint(context))
+            # A fallback reply is not worth reusing; the next identical message asks the model again
+            (reply_text, updated_memory), shared = response_cache.get_or_compute(
+                key, ask, cacheable=lambda answer: answer[0] != FALLBACK_REPLY)
+            # The cached update is shared; merge a copy
+            updated_memory = json.loads(_compact_json(updated_memory))
+            if shared and on_text is not None:
+                on_text(reply_text)
+        else:
+            reply_text, updated_memory = ask()
+        _finish_turn(manager, user_input, reply_text, updated_memory)
+        return reply_text
+    except CircuitOpenError:
+        # The API is known to be down; answer locally without waiting on it
+        return FALLBACK_REPLY
+    except Exception as e:
+        _report_error(e)
+        if stream.streamed:
+            # The user has already seen part of a reply; don't follow it with a different one
+            return stream.text
+        return FALLBACK_REPLY
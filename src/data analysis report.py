@@ -2,6 +2,7 @@ import json
 import re
 import urllib.parse
 import urllib.request
+from datetime import datetime, timezone
 from typing import Optional, Tuple, List, Dict
 
 # Geocoder setup (OpenStreetMap Nominatim). Replace contact@example.com with a real contact per policy.
@@ -66,6 +67,54 @@ def _extract_description_from_details(details: str) -> str:
     return details.strip()
 
 
+def _export_reports(storage) -> None:
+    """Prompt for filters and stream matching reports to a JSON Lines file."""
+    dest = input("Export file (default data/reports_export.jsonl): ").strip() or "data/reports_export.jsonl"
+    dtype = input("Disaster type to export (blank for all): ").strip() or None
+    since = input("From date, YYYY-MM-DD (blank for no limit): ").strip() or None
+    until = input("Until date, YYYY-MM-DD, exclusive (blank for no limit): ").strip() or None
+    try:
+        count = storage.export_reports(dest, since=since, until=until, disaster_type=dtype)
+    except OSError as e:
+        print(f"Export failed: {e}")
+        return
+    print(f"Exported {count} report(s) to {dest}")
+
+
+def _print_analysis(storage, help_stations) -> None:
+    """Summarise saved reports: totals by type, daily counts, recent rate and station catchments."""
+    try:
+        from report_analytics import ReportAnalytics
+    except ImportError:
+        print("Report analysis needs numpy: python -m pip install -r requirements.txt")
+        return
+    analytics = ReportAnalytics.from_storage(storage)
+    if not len(analytics):
+        print("No reports to analyse.")
+        return
+
+    print(f"\nReports analysed: {len(analytics)}")
+    print("\nReports by disaster type:")
+    for dtype, count in sorted(analytics.counts_by_type().items(), key=lambda kv: kv[1], reverse=True):
+        print(f" - {dtype or 'unspecified'}: {count}")
+
+    starts, counts = analytics.counts_by_bucket(86400)
+    print("\nReports per day:")
+    for start, total in zip(starts, counts.sum(axis=0)):
+        if total:
+            day = datetime.fromtimestamp(int(start), tz=timezone.utc).strftime("%Y-%m-%d")
+            print(f" - {day}: {int(total)}")
+
+    _, rates = analytics.rolling_rate(window_seconds=86400, step_seconds=3600)
+    print(f"\nReports per hour over the last 24h of activity: {rates[-1]:.2f}")
+
+    locations = help_stations.get_locations()
+    if locations:
+        print("\nLocated reports nearest to each aid centre:")
+        for station, count in analytics.station_catchment_totals(locations).items():
+            print(f" - {station}: {count}")
+
+
 def main():
     from storage import Storage
     from trucks import Truck
@@ -109,7 +158,7 @@ def main():
     if pwd == GOV_PASSWORD:
         while True:
             action = input(
-                "Enter 'add' to add supplies, 'check' inventory, 'reports' to manage reports, 'stations' to manage aid centres, or 'exit': "
+                "Enter 'add' to add supplies, 'check' inventory, 'reports' to manage reports, 'analysis' to analyse reports, 'stations' to manage aid centres, or 'exit': "
             ).strip().lower()
 
             if action == "stations":
@@ -177,8 +226,9 @@ def main():
                     print("\nDisaster Reports Management")
                     print("1. View reports (full report + address & coordinates)")
                     print("2. Delete report")
-                    print("3. Back to main menu")
-                    choice = input("Enter choice (1-3): ").strip()
+                    print("3. Export reports (JSON Lines)")
+                    print("4. Back to main menu")
+                    choice = input("Enter choice (1-4): ").strip()
                     if choice == "1":
                         reports = storage.get_reports()
                         if not reports:
@@ -219,11 +269,17 @@ def main():
                         except ValueError:
                             print("Invalid input.")
                     elif choice == "3":
+                        _export_reports(storage)
+                    elif choice == "4":
                         break
                     else:
                         print("Invalid choice.")
                 continue
 
+            if action == "analysis":
+                _print_analysis(storage, help_stations)
+                continue
+
             if action == "check":
                 supplies = storage.get_supplies()
                 if not supplies:
@@ -462,7 +518,7 @@ def main():
     if pwd == GOV_PASSWORD:
         while True:
             action = input(
-                "Enter 'add' to add supplies, 'check' inventory, 'reports' to manage reports, 'stations' to manage aid centres, or 'exit': "
+                "Enter 'add' to add supplies, 'check' inventory, 'reports' to manage reports, 'analysis' to analyse reports, 'stations' to manage aid centres, or 'exit': "
             ).strip().lower()
 
             if action == "stations":
@@ -530,8 +586,9 @@ def main():
                     print("\nDisaster Reports Management")
                     print("1. View reports (full report + address & coordinates)")
                     print("2. Delete report")
-                    print("3. Back to main menu")
-                    choice = input("Enter choice (1-3): ").strip()
+                    print("3. Export reports (JSON Lines)")
+                    print("4. Back to main menu")
+                    choice = input("Enter choice (1-4): ").strip()
                     if choice == "1":
                         reports = storage.get_reports()
                         if not reports:
@@ -572,11 +629,17 @@ def main():
                         except ValueError:
                             print("Invalid input.")
                     elif choice == "3":
+                        _export_reports(storage)
+                    elif choice == "4":
                         break
                     else:
                         print("Invalid choice.")
                 continue
 
+            if action == "analysis":
+                _print_analysis(storage, help_stations)
+                continue
+
             if action == "check":
                 supplies = storage.get_supplies()
                 if not supplies:
@@ -0,0 +1,166 @@
+"""Near-duplicate detection for incoming disaster reports.
+
+Report details are shingled into character 4-grams and summarised with a MinHash
+signature. Signatures are split into LSH bands, so each lookup only compares against
+reports that share a band (sub-linear in the number of indexed reports). Candidates
+must also have the same disaster type and be close in time and in space. Reports with
+too little text or no resolved location are never treated as duplicates. Only reports
+inside the time window are kept in the index.
+"""
+import math
+import re
+import zlib
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .report_store import parse_timestamp
+    from .report_utils import parse_location
+except ImportError:
+    from report_store import parse_timestamp
+    from report_utils import parse_location
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_SPACE_RE = re.compile(r"[^a-z0-9]+")
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
+
+
+def description_of(details: str) -> str:
+    """The free-text part of report details, without the appended geocoding result."""
+    return (details or '').split("location_resolved:", 1)[0].rstrip(" |")
+
+
+def shingles(text: str, k: int = 4) -> set:
+    """Character k-grams of text after lowercasing and collapsing punctuation/repeats."""
+    text = _SPACE_RE.sub(' ', (text or '').lower()).strip()
+    # "SOOOO MUCH" and "SOO MUCH" should look alike
+    text = _REPEAT_RE.sub(r"\1\1", text)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371.0 * math.asin(min(1.0, math.sqrt(a)))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        """MinHash with num_perm universal hash functions over crc32 shingle hashes."""
+        self.num_perm = num_perm
+        # Deterministic coefficients so signatures are stable across runs
+        state = seed
+        self._coeffs: List[Tuple[int, int]] = []
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            a = (state >> 3) % _PRIME or 1
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            b = (state >> 3) % _PRIME
+            self._coeffs.append((a, b))
+
+    def signature(self, items: set) -> Tuple[int, ...]:
+        if not items:
+            return tuple([_MASK] * self.num_perm)
+        hashes = [zlib.crc32(item.encode('utf-8')) for item in items]
+        return tuple(min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in self._coeffs)
+
+
+def estimate_jaccard(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class DuplicateIndex:
+    def __init__(self, threshold: float = 0.5, window_seconds: int = 6 * 3600, radius_km: float = 1.0,
+                 num_perm: int = 32, bands: int = 16, min_shingles: int = 8):
+        """LSH index of recent reports; bands * rows must equal num_perm.
+
+        Reports whose details give fewer than min_shingles shingles are too short to compare.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.min_shingles = min_shingles
+        self.window_seconds = window_seconds
+        self.radius_km = radius_km
+        self.bands = bands
+        self._rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        # report id -> (signature, epoch seconds, lat, lon, type code)
+        self._entries: Dict[str, Tuple] = {}
+        # (band number, band values) -> report ids
+        self._buckets: Dict[Tuple, set] = {}
+        # (epoch seconds, report id) in arrival order, for expiry
+        self._order = deque()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self._rows:(band + 1) * self._rows]
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._order and self._order[0][0] < cutoff:
+            _, report_id = self._order.popleft()
+            entry = self._entries.pop(report_id, None)
+            if entry is None:
+                continue
+            for key in self._band_keys(entry[0]):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(report_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _features(self, report: Dict) -> Optional[Tuple]:
+        """Signature, time, place and type of a report, or None if it cannot be compared."""
+        ts = parse_timestamp(report.get('timestamp'))
+        if ts is None or report.get('type_code') is None:
+            return None
+        _, lat, lon = parse_location(report.get('details', '') or '')
+        if lat is None or lon is None:
+            return None
+        items = shingles(description_of(report.get('details', '')))
+        if len(items) < self.min_shingles:
+            return None
+        return self._hasher.signature(items), ts.timestamp(), lat, lon, report['type_code']
+
+    def find_duplicate(self, report: Dict) -> Optional[str]:
+        """Return the id of an indexed report that this report duplicates, if any."""
+        features = self._features(report)
+        if features is None:
+            return None
+        signature, ts, lat, lon, code = features
+        self._expire(ts)
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_score = None, self.threshold
+        for report_id in candidates:
+            other_sig, other_ts, other_lat, other_lon, other_code = self._entries[report_id]
+            if abs(ts - other_ts) > self.window_seconds:
+                continue
+            if code != other_code or haversine_km(lat, lon, other_lat, other_lon) > self.radius_km:
+                continue
+            score = estimate_jaccard(signature, other_sig)
+            if score >= best_score:
+                best, best_score = report_id, score
+        return best
+
+    def add(self, report: Dict) -> bool:
+        """Index a report under report['id']; returns False if it cannot be indexed."""
+        report_id = report.get('id')
+        features = self._features(report) if report_id else None
+        if features is None:
+            return False
+        self._expire(features[1])
+        self._entries[report_id] = features
+        for key in self._band_keys(features[0]):
+            self._buckets.setdefault(key, set()).add(report_id)
+        self._order.append((features[1], report_id))
+        return True
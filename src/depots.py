@@ -0,0 +1,91 @@
+"""Per-depot inventory with nearest-stock allocation.
+
+Each HelpStation can hold its own stock. Depot stock lives in Storage as lots tagged
+with the depot (see lots.py), so it is part of the item totals, expires and is
+allocated first-expiring-first-out like central stock, and every change is a ledger
+entry. A request at a point is filled from the nearest depot that has the item; if
+that depot is short, the rest comes from the next nearest, and so on (split
+fulfilment). Only depots holding unexpired stock of the item are considered.
+"""
+from typing import Dict, List, Optional, Tuple
+
+
+class DepotNetwork:
+    def __init__(self, help_stations, storage):
+        """Inventory per HelpStation station, kept as depot lots in storage."""
+        self.help_stations = help_stations
+        self.storage = storage
+
+    def bulk_update(self):
+        """Defer persistence until the outermost bulk_update() exits (see Storage.bulk_update)."""
+        return self.storage.bulk_update()
+
+    # Stock API
+    def add_stock(self, depot: str, item: str, quantity: int, actor: Optional[str] = None, expiry=None):
+        if self.help_stations.get_station(depot) is None:
+            raise ValueError(f"Depot '{depot}' is not a registered station")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        self.storage.add_supplies(item.strip().lower(), quantity, actor=actor, expiry=expiry, depot=depot)
+
+    def remove_stock(self, depot: str, item: str, quantity: int, actor: Optional[str] = None,
+                     truck: Optional[str] = None):
+        if self.stock(depot, item) < quantity:
+            raise ValueError(f"Not enough '{item}' at {depot} to remove {quantity}")
+        self.storage.remove_supplies(item, quantity, actor=actor, truck=truck, depot=depot)
+
+    def stock(self, depot: str, item: str) -> int:
+        return self.storage.check_inventory(item, depot=depot)
+
+    def total(self, item: str) -> int:
+        """Unexpired stock of item across all depots (central storage excluded)."""
+        return sum(self.storage.depot_stock(item).values())
+
+    @property
+    def inventory(self) -> Dict[str, Dict[str, int]]:
+        """{depot: {item: quantity}} of unexpired depot stock."""
+        inventory: Dict[str, Dict[str, int]] = {}
+        for item in self.storage.get_supplies():
+            for depot, quantity in self.storage.depot_stock(item).items():
+                inventory.setdefault(depot, {})[item] = quantity
+        return inventory
+
+    # Allocation
+    def allocate(self, item: str, quantity: int, point) -> List[Tuple[str, int]]:
+        """Plan [(depot, quantity)] filling the request from the nearest depots first.
+
+        Raises ValueError if the depots together do not hold enough (nothing is removed).
+        """
+        item = item.strip().lower()
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        holdings = self.storage.depot_stock(item)
+        if sum(holdings.values()) < quantity:
+            raise ValueError(f"Not enough '{item}' across depots to supply {quantity}")
+        locations = self.help_stations.get_locations()
+        if 4 * len(holdings) < len(locations):
+            # Few depots stock this item: ranking just those is cheaper than walking the index
+            px, py = float(point[0]), float(point[1])
+            located = [h for h in holdings if h in locations]
+            ranked = sorted(located, key=lambda h: ((locations[h][0] - px) ** 2 + (locations[h][1] - py) ** 2, h))
+        else:
+            ranked = (name for _, name in self.help_stations.nearest(point) if name in holdings)
+        plan = []
+        needed = quantity
+        for depot in ranked:
+            take = min(needed, holdings[depot])
+            plan.append((depot, take))
+            needed -= take
+            if not needed:
+                return plan
+        # Remaining stock sits at depots without coordinates
+        raise ValueError(f"Not enough '{item}' at located depots to supply {quantity}")
+
+    def fulfil(self, item: str, quantity: int, point, actor: Optional[str] = None,
+               truck: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Allocate and remove the stock; returns the plan that was applied."""
+        plan = self.allocate(item, quantity, point)
+        with self.storage.bulk_update():
+            for depot, take in plan:
+                self.storage.remove_supplies(item, take, actor=actor, truck=truck, depot=depot)
+        return plan
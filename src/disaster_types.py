@@ -0,0 +1,113 @@
+"""Normalization of free-text disaster types to canonical types and integer codes.
+
+Reports carry whatever the requester typed ("Flood", "huricane", "flash flooding").
+normalize_disaster_type() maps that text onto the keyword set the mental health
+companion already gives advice for, using aliases and a bounded edit distance, and
+caches the result so repeated spellings cost a dictionary lookup.
+"""
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Keep in sync with DISASTER_ADVICE in src/companion_router.py
+CANONICAL_TYPES = ['earthquake', 'fire', 'tornado', 'flood', 'hurricane', 'storm', 'tsunami']
+OTHER = 'other'
+# main.py files mental health conversations as reports of this type
+MENTAL_SUPPORT = 'mental_support'
+
+# Code 0 is reserved for unrecognised types
+TYPE_NAMES = [OTHER] + CANONICAL_TYPES + [MENTAL_SUPPORT]
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+ALIASES = {
+    'quake': 'earthquake',
+    'tremor': 'earthquake',
+    'aftershock': 'earthquake',
+    'wildfire': 'fire',
+    'bushfire': 'fire',
+    'forestfire': 'fire',
+    'blaze': 'fire',
+    'twister': 'tornado',
+    'flooding': 'flood',
+    'floods': 'flood',
+    'flooded': 'flood',
+    'cyclone': 'hurricane',
+    'typhoon': 'hurricane',
+    'thunderstorm': 'storm',
+    'blizzard': 'storm',
+    'hail': 'storm',
+    'snowstorm': 'storm',
+    'windstorm': 'storm',
+    'tidal': 'tsunami',
+}
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance between a and b, or max_distance + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def _match_word(word: str) -> Optional[str]:
+    if word in TYPE_CODES and word != OTHER:
+        return word
+    if word in ALIASES:
+        return ALIASES[word]
+    # Allow one typo in short words and two in longer ones
+    max_distance = 1 if len(word) <= 5 else 2
+    best, best_distance = None, max_distance + 1
+    for candidate in list(CANONICAL_TYPES) + list(ALIASES):
+        distance = edit_distance(word, candidate, max_distance)
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+    if best is None:
+        return None
+    return ALIASES.get(best, best)
+
+
+@lru_cache(maxsize=1024)
+def normalize_disaster_type(text: str) -> str:
+    """Map free text to a canonical type name ('other' if nothing matches)."""
+    cleaned = (text or '').strip().lower()
+    if not cleaned:
+        return OTHER
+    if cleaned.replace(' ', '_') == MENTAL_SUPPORT:
+        return MENTAL_SUPPORT
+    words = _WORD_RE.findall(cleaned)
+    joined = ''.join(words)
+    # Whole phrase first ("wild fire" -> "wildfire"), then each word
+    for candidate in [joined] + words:
+        if len(candidate) < 3:
+            continue
+        match = _match_word(candidate)
+        if match:
+            return match
+    return OTHER
+
+
+def type_code(text: str) -> int:
+    """Integer code of the canonical type for text."""
+    return TYPE_CODES[normalize_disaster_type(text)]
+
+
+def type_name(code: int) -> str:
+    return TYPE_NAMES[code] if 0 <= code < len(TYPE_NAMES) else OTHER
+
+
+def report_type_code(report: dict) -> int:
+    """Code stored on a report at intake, computed for reports saved before codes existed."""
+    code = report.get('type_code')
+    if isinstance(code, int) and 0 <= code < len(TYPE_NAMES):
+        return code
+    return type_code(str(report.get('disaster_type', '')))
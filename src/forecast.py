@@ -0,0 +1,90 @@
+"""Demand forecasting for supply categories.
+
+Every remove_supplies() call is recorded as demand for that item. Demand is summed into
+fixed time buckets (a day by default) and each closed bucket updates an exponentially
+smoothed demand rate, so recording an event is O(1) and only a few numbers are kept per
+item. Days of stock remaining is the current stock divided by that rate.
+"""
+import time
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+DAY_SECONDS = 86400
+
+When = Union[datetime, float, None]
+
+
+def _epoch(when: When) -> float:
+    if when is None:
+        return time.time()
+    if isinstance(when, datetime):
+        return when.timestamp()
+    return float(when)
+
+
+class DemandForecaster:
+    def __init__(self, state: Optional[Dict[str, Dict]] = None, alpha: float = 0.3,
+                 bucket_seconds: int = DAY_SECONDS):
+        """Exponential smoothing of per-bucket demand; alpha weights the most recent bucket.
+
+        state is the persisted mapping item -> {"bucket": int, "pending": float, "level": float|None}
+        and is updated in place, so the caller can save it as is.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+        self.state = state if state is not None else {}
+        self.alpha = alpha
+        self.bucket_seconds = int(bucket_seconds)
+
+    def _key(self, item: str) -> str:
+        return item.strip().lower()
+
+    def _level_at(self, entry: Dict, bucket: int) -> Optional[float]:
+        """Smoothed demand per bucket once every bucket before `bucket` is closed."""
+        level = entry['level']
+        if bucket <= entry['bucket']:
+            return level
+        # Close the open bucket, then decay through the empty buckets in between
+        if level is None:
+            level = entry['pending']
+        else:
+            level = self.alpha * entry['pending'] + (1 - self.alpha) * level
+        return level * (1 - self.alpha) ** (bucket - entry['bucket'] - 1)
+
+    def record(self, item: str, quantity: float, when: When = None):
+        """Record that quantity of item was taken out of storage at `when` (default now)."""
+        if quantity <= 0:
+            return
+        bucket = int(_epoch(when) // self.bucket_seconds)
+        key = self._key(item)
+        entry = self.state.get(key)
+        if entry is None:
+            self.state[key] = {'bucket': bucket, 'pending': float(quantity), 'level': None}
+        elif bucket > entry['bucket']:
+            entry['level'] = self._level_at(entry, bucket)
+            entry['bucket'] = bucket
+            entry['pending'] = float(quantity)
+        else:
+            # Late events count towards the open bucket
+            entry['pending'] += quantity
+
+    def daily_rate(self, item: str, when: When = None) -> float:
+        """Forecast demand per day for item (0.0 if it has never been drawn down)."""
+        entry = self.state.get(self._key(item))
+        if entry is None:
+            return 0.0
+        bucket = int(_epoch(when) // self.bucket_seconds)
+        level = self._level_at(entry, bucket)
+        if level is None or bucket == entry['bucket']:
+            # The open bucket is still filling; don't let a partial bucket lower the rate
+            level = max(level or 0.0, entry['pending'])
+        return level * DAY_SECONDS / self.bucket_seconds
+
+    def days_remaining(self, item: str, stock: float, when: When = None) -> Optional[float]:
+        """Days until stock runs out at the forecast rate, or None if there is no demand."""
+        rate = self.daily_rate(item, when)
+        if rate <= 0:
+            return None
+        return max(stock, 0) / rate
@@ -1,14 +1,19 @@
+import heapq
 import json
+import math
 import os
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 
 class HelpStation:
     def __init__(self, persistence_file: str = 'data/stations.json'):
         """Manage help stations with JSON persistence."""
         self.stations: List[str] = []
-        # optional mapping of station name -> (x, y) coordinates
+        # optional mapping of station name -> (lat, lon), the coordinates geocoded requests use
         self._locations = {}
+        # Grid index over station locations, rebuilt lazily after any change
+        self._grid: Optional[Dict[Tuple[int, int], List[str]]] = None
+        self._cell_size = 1.0
         self._persistence_file = persistence_file
         # Ensure directory exists
         dirpath = os.path.dirname(self._persistence_file)
@@ -34,6 +39,7 @@ class HelpStation:
             self._locations = {}
 
     def _save(self):
+        self._grid = None
         try:
             payload = {'stations': self.stations, 'locations': {k: list(v) for k, v in self._locations.items()}}
             with open(self._persistence_file, 'w', encoding='utf-8') as f:
@@ -93,6 +99,65 @@ class HelpStation:
             raise ValueError("Invalid point")
         return ((sx - px) ** 2 + (sy - py) ** 2) ** 0.5
 
+    def get_locations(self) -> Dict[str, Tuple[float, float]]:
+        """Get a mapping of station name -> coordinates for stations that have them."""
+        return {name: self._locations[name] for name in self.stations if name in self._locations}
+
+    def _build_grid(self):
+        locations = self.get_locations()
+        self._grid = {}
+        if not locations:
+            return
+        xs = [x for x, _ in locations.values()]
+        ys = [y for _, y in locations.values()]
+        extent = max(max(xs) - min(xs), max(ys) - min(ys))
+        # About one station per cell on average
+        self._cell_size = extent / math.sqrt(len(locations)) if extent > 0 else 1.0
+        for name, (x, y) in locations.items():
+            self._grid.setdefault(self._cell_of(x, y), []).append(name)
+
+    def _cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self._cell_size)), int(math.floor(y / self._cell_size))
+
+    def nearest(self, point) -> Iterator[Tuple[float, str]]:
+        """Yield (distance, station name) for located stations, nearest first.
+
+        Uses the grid index: rings of cells around the point are searched outward, so
+        callers that stop early only look at the stations near the point.
+        """
+        try:
+            px, py = float(point[0]), float(point[1])
+        except Exception:
+            raise ValueError("Invalid point")
+        if self._grid is None:
+            self._build_grid()
+        if not self._grid:
+            return
+        remaining = sum(len(names) for names in self._grid.values())
+        cx, cy = self._cell_of(px, py)
+        heap: List[Tuple[float, str]] = []
+        ring = 0
+        while remaining or heap:
+            if remaining:
+                if 8 * ring > len(self._grid):
+                    # Far from every station: visiting the remaining cells directly is cheaper
+                    cells = [cell for cell in self._grid if max(abs(cell[0] - cx), abs(cell[1] - cy)) >= ring]
+                else:
+                    cells = [(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)
+                             if max(abs(dx), abs(dy)) == ring]
+                for cell in cells:
+                    for name in self._grid.get(cell, ()):
+                        sx, sy = self._locations[name]
+                        heapq.heappush(heap, (((sx - px) ** 2 + (sy - py) ** 2) ** 0.5, name))
+                        remaining -= 1
+                # Stations outside the searched rings are at least this far away
+                bound = ring * self._cell_size if remaining else math.inf
+                ring += 1
+            else:
+                bound = math.inf
+            while heap and heap[0][0] <= bound:
+                yield heapq.heappop(heap)
+
     def list_stations(self) -> List[str]:
         """Get a list of all station names."""
         return list(self.stations)
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""Spatial hotspot clustering of geocoded reports.
+
+Reports are binned into a grid of eps_km-sized cells (the spatial index). A cell holding
+at least min_reports reports is dense; adjacent dense cells are joined into one cluster
+with a union-find, and sparse occupied cells next to a dense cell are attached to it as
+its border, in the style of DBSCAN. Adding a report only touches its cell and the
+8 neighbours, so clusters can be kept current while reports stream in.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .report_utils import parse_location
+    from .disaster_types import report_type_code, type_name
+except ImportError:
+    from report_utils import parse_location
+    from disaster_types import report_type_code, type_name
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON_EQUATOR = 111.320
+
+Cell = Tuple[int, int]
+_NEIGHBOURS = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if di or dj]
+
+
+class HotspotIndex:
+    def __init__(self, eps_km: float = 2.0, min_reports: int = 3):
+        """Grid-based density clustering; eps_km is the cell size, min_reports the density threshold."""
+        if eps_km <= 0:
+            raise ValueError("eps_km must be positive")
+        self.eps_km = float(eps_km)
+        self.min_reports = max(int(min_reports), 1)
+        # cell -> [count, sum of lat, sum of lon, {disaster type: count}]
+        self._cells: Dict[Cell, List] = {}
+        # union-find parent links between dense cells
+        self._parent: Dict[Cell, Cell] = {}
+        self._clusters: Optional[List[Dict]] = None
+        self.located = 0
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        y = lat * KM_PER_DEG_LAT
+        x = lon * KM_PER_DEG_LON_EQUATOR * math.cos(math.radians(lat))
+        return int(math.floor(x / self.eps_km)), int(math.floor(y / self.eps_km))
+
+    def _find(self, cell: Cell) -> Cell:
+        root = cell
+        while self._parent[root] != root:
+            root = self._parent[root]
+        # Path compression
+        while self._parent[cell] != root:
+            self._parent[cell], cell = root, self._parent[cell]
+        return root
+
+    def _union(self, a: Cell, b: Cell):
+        ra, rb = self._find(a), self._find(b)
+        if ra != rb:
+            self._parent[rb] = ra
+
+    def add(self, lat: float, lon: float, disaster_type: str = '') -> None:
+        cell = self._cell(lat, lon)
+        entry = self._cells.get(cell)
+        if entry is None:
+            entry = self._cells[cell] = [0, 0.0, 0.0, {}]
+        entry[0] += 1
+        entry[1] += lat
+        entry[2] += lon
+        dtype = (disaster_type or '').strip().lower() or 'unspecified'
+        entry[3][dtype] = entry[3].get(dtype, 0) + 1
+        self.located += 1
+        if entry[0] == self.min_reports:
+            # The cell just became dense: link it with dense neighbours
+            self._parent[cell] = cell
+            for di, dj in _NEIGHBOURS:
+                neighbour = (cell[0] + di, cell[1] + dj)
+                if neighbour in self._parent:
+                    self._union(cell, neighbour)
+        self._clusters = None
+
+    def add_report(self, report: Dict) -> bool:
+        """Add a report if its details carry coordinates; returns whether it was located."""
+        _, lat, lon = parse_location(report.get('details', '') or '')
+        if lat is None or lon is None:
+            return False
+        self.add(lat, lon, type_name(report_type_code(report)))
+        return True
+
+    def extend(self, reports: Iterable[Dict]) -> int:
+        return sum(1 for report in reports if self.add_report(report))
+
+    def clusters(self) -> List[Dict]:
+        """Return clusters largest first, each with centroid, size and dominant disaster type."""
+        if self._clusters is not None:
+            return self._clusters
+        groups: Dict[Cell, List] = {}
+
+        def accumulate(root: Cell, entry: List):
+            group = groups.get(root)
+            if group is None:
+                group = groups[root] = [0, 0.0, 0.0, {}, 0]
+            group[0] += entry[0]
+            group[1] += entry[1]
+            group[2] += entry[2]
+            for dtype, count in entry[3].items():
+                group[3][dtype] = group[3].get(dtype, 0) + count
+            group[4] += 1
+
+        for cell, entry in self._cells.items():
+            if cell in self._parent:
+                accumulate(self._find(cell), entry)
+                continue
+            # Border cell: join the densest adjacent dense cell, otherwise it is noise
+            best = None
+            for di, dj in _NEIGHBOURS:
+                neighbour = (cell[0] + di, cell[1] + dj)
+                if neighbour in self._parent and (best is None or self._cells[neighbour][0] > self._cells[best][0]):
+                    best = neighbour
+            if best is not None:
+                accumulate(self._find(best), entry)
+
+        clusters = []
+        for size, sum_lat, sum_lon, types, cells in groups.values():
+            dominant = max(types.items(), key=lambda kv: (kv[1], kv[0]))[0]
+            clusters.append({
+                'lat': sum_lat / size,
+                'lon': sum_lon / size,
+                'size': size,
+                'dominant_type': dominant,
+                'type_counts': types,
+                'cells': cells,
+            })
+        clusters.sort(key=lambda c: c['size'], reverse=True)
+        self._clusters = clusters
+        return clusters
+
+
+def hotspots_from_storage(storage, eps_km: float = 2.0, min_reports: int = 3, **filters) -> HotspotIndex:
+    """Build a HotspotIndex over every geolocated report in storage (streamed)."""
+    index = HotspotIndex(eps_km=eps_km, min_reports=min_reports)
+    index.extend(storage.iter_reports(**filters))
+    return index
@@ -0,0 +1,217 @@
+"""Append-only inventory ledger with point-in-time reconstruction.
+
+Every change to storage is one JSON Lines entry (timestamp, item, delta, actor, truck,
+plus depot for stock held at a depot).
+Every `checkpoint_every` entries the running stock and cumulative dispatch totals are
+written to a checkpoint file together with the byte offset reached in the ledger, so
+the state at any time T is one checkpoint (found by bisection) plus a replay of fewer
+than `checkpoint_every` entries.
+"""
+import bisect
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .report_store import parse_timestamp, TimeBound
+except ImportError:
+    from report_store import parse_timestamp, TimeBound
+
+# Actor recorded for balances that were in storage before the ledger saw them
+OPENING = 'opening'
+# Actor recorded when expired lots are discarded
+EXPIRED = 'expired'
+# Removals by these actors are not dispatches
+NON_DISPATCH_ACTORS = (OPENING, EXPIRED)
+
+
+class InventoryLedger:
+    def __init__(self, path: Optional[str] = None, checkpoint_every: int = 100):
+        """Ledger kept in path (JSON Lines) plus '<path minus .jsonl>.checkpoints.jsonl'.
+
+        Without a path the ledger is kept in memory (used by tests).
+        Entries are buffered until flush(); queries flush first.
+        """
+        if checkpoint_every <= 0:
+            raise ValueError("checkpoint_every must be positive")
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        # Checkpoints in time order: {"ts", "offset", "count", "stock", "dispatched"}
+        self._checkpoints: List[Dict] = []
+        self._checkpoint_times: List[float] = []
+        # Running state after every recorded entry
+        self.stock: Dict[str, int] = {}
+        self.dispatched: Dict[str, int] = {}
+        self.count = 0
+        self._pending: List[Dict] = []
+        # In-memory ledger lines; offsets index this list instead of the file
+        self._lines: List[bytes] = []
+        self._size = 0
+        if path:
+            self._load()
+
+    @property
+    def checkpoint_path(self) -> str:
+        base = self.path[:-len('.jsonl')] if self.path.endswith('.jsonl') else self.path
+        return base + '.checkpoints.jsonl'
+
+    def _load(self):
+        try:
+            with open(self.checkpoint_path, 'rb') as f:
+                for line in f:
+                    try:
+                        self._add_checkpoint(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        try:
+            self._size = os.path.getsize(self.path)
+        except OSError:
+            self._size = 0
+        stock, dispatched, count, _ = self._replay(self._checkpoints[-1] if self._checkpoints else None)
+        self.stock, self.dispatched, self.count = stock, dispatched, count
+
+    def _add_checkpoint(self, checkpoint: Dict):
+        self._checkpoints.append(checkpoint)
+        self._checkpoint_times.append(checkpoint['ts'])
+
+    # Writing
+    def record(self, item: str, delta: int, actor: Optional[str] = None, truck: Optional[str] = None,
+               when: TimeBound = None, depot: Optional[str] = None):
+        """Append a change of delta units of item (negative for removals), at depot if given."""
+        when = parse_timestamp(when) if when is not None else None
+        entry = {
+            'timestamp': (when or datetime.utcnow()).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'item': item,
+            'delta': int(delta),
+            'actor': actor,
+            'truck': truck,
+        }
+        if depot is not None:
+            entry['depot'] = depot
+        self._apply(self.stock, self.dispatched, entry)
+        self.count += 1
+        self._pending.append(entry)
+        if self.count % self.checkpoint_every == 0:
+            # Written once the entries before it are flushed, so the offset is known
+            self._pending.append({'_checkpoint': True})
+
+    def reconcile(self, supplies: Dict[str, int], actor: str = OPENING):
+        """Record entries that bring the ledger's stock in line with supplies (e.g. opening balances)."""
+        for item in sorted(set(supplies) | set(self.stock)):
+            delta = int(supplies.get(item, 0)) - self.stock.get(item, 0)
+            if delta:
+                self.record(item, delta, actor=actor)
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        checkpoints = []
+        lines = []
+        offset = self._size
+        for entry in pending:
+            if '_checkpoint' in entry:
+                checkpoints.append(offset)
+                continue
+            line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            lines.append(line)
+            offset += len(line) if self.path else 1
+        if self.path:
+            with open(self.path, 'ab') as f:
+                f.writelines(lines)
+        else:
+            self._lines.extend(lines)
+        self._size = offset
+        for checkpoint_offset in checkpoints:
+            self._write_checkpoint(checkpoint_offset)
+
+    def _write_checkpoint(self, offset: int):
+        previous = self._checkpoints[-1] if self._checkpoints else None
+        stock, dispatched, count, last_ts = self._replay(previous, stop_offset=offset)
+        checkpoint = {'ts': last_ts, 'offset': offset, 'count': count,
+                      'stock': stock, 'dispatched': dispatched}
+        self._add_checkpoint(checkpoint)
+        if self.path:
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(checkpoint, separators=(',', ':')) + '\n')
+
+    # Reading
+    @staticmethod
+    def _apply(stock: Dict[str, int], dispatched: Dict[str, int], entry: Dict):
+        item, delta = entry['item'], entry['delta']
+        stock[item] = stock.get(item, 0) + delta
+        if delta < 0 and entry.get('actor') not in NON_DISPATCH_ACTORS:
+            dispatched[item] = dispatched.get(item, 0) - delta
+
+    def _iter_from(self, offset: int, stop_offset: Optional[int] = None) -> Iterator[Dict]:
+        stop = self._size if stop_offset is None else stop_offset
+        if not self.path:
+            for line in self._lines[offset:stop]:
+                yield json.loads(line)
+            return
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while f.tell() < stop:
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Torn write; skip it
+                    continue
+
+    def _replay(self, checkpoint: Optional[Dict], until: Optional[float] = None,
+                stop_offset: Optional[int] = None) -> Tuple[Dict[str, int], Dict[str, int], int, float]:
+        """State after the entries following checkpoint, up to time until / stop_offset."""
+        if checkpoint is None:
+            stock, dispatched, count, last_ts, offset = {}, {}, 0, 0.0, 0
+        else:
+            stock, dispatched = dict(checkpoint['stock']), dict(checkpoint['dispatched'])
+            count, last_ts, offset = checkpoint['count'], checkpoint['ts'], checkpoint['offset']
+        for entry in self._iter_from(offset, stop_offset):
+            ts = parse_timestamp(entry.get('timestamp'))
+            ts = ts.timestamp() if ts else last_ts
+            if until is not None and ts > until:
+                break
+            self._apply(stock, dispatched, entry)
+            count += 1
+            last_ts = ts
+        return stock, dispatched, count, last_ts
+
+    def _state_at(self, when: TimeBound) -> Tuple[Dict[str, int], Dict[str, int]]:
+        self.flush()
+        moment = parse_timestamp(when)
+        if moment is None:
+            raise ValueError(f"Invalid timestamp: {when!r}")
+        until = moment.timestamp()
+        index = bisect.bisect_right(self._checkpoint_times, until)
+        checkpoint = self._checkpoints[index - 1] if index else None
+        stock, dispatched, _, _ = self._replay(checkpoint, until=until)
+        return stock, dispatched
+
+    def stock_at(self, when: TimeBound) -> Dict[str, int]:
+        """Stock of every item as of `when` (entries at exactly `when` included)."""
+        stock, _ = self._state_at(when)
+        return {item: qty for item, qty in stock.items() if qty}
+
+    def dispatch_totals(self, start: TimeBound = None, end: TimeBound = None) -> Dict[str, int]:
+        """Units removed per item with start < timestamp <= end (opening balances and expiries excluded)."""
+        before = self._state_at(start)[1] if start is not None else {}
+        after = self._state_at(end)[1] if end is not None else self._current_dispatched()
+        totals = {item: qty - before.get(item, 0) for item, qty in after.items()}
+        return {item: qty for item, qty in totals.items() if qty}
+
+    def _current_dispatched(self) -> Dict[str, int]:
+        self.flush()
+        return dict(self.dispatched)
+
+    def entries(self) -> Iterator[Dict]:
+        """Stream every ledger entry in order."""
+        self.flush()
+        return self._iter_from(0)
@@ -0,0 +1,121 @@
+"""Per-item supply lots ordered by expiry.
+
+Each item's lots are a min-heap of [expiry, seq, quantity] lists, or [expiry, seq,
+quantity, depot] for stock held at a depot (help station), so the first-expiring
+lot is always at the front: removals take from it first (FEFO) in O(log n) per lot
+touched, and expired lots are found without scanning the rest. Expired lots sit at the
+front too, so allocation steps past them rather than handing them out. Expiry is an ISO date
+string; lots that never expire use NO_EXPIRY so they sort last. Heaps are plain lists
+and can be saved as JSON directly.
+"""
+import heapq
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+NO_EXPIRY = '9999-12-31'
+
+Lot = List  # [expiry, seq, quantity] or [expiry, seq, quantity, depot]
+DateLike = Union[date, str, None]
+# take_fefo(depot=ANY_DEPOT) takes from central and depot lots alike
+ANY_DEPOT = object()
+
+
+def normalize_expiry(value: DateLike) -> str:
+    """ISO date string for value; None or blank means the lot does not expire."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return NO_EXPIRY
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        return date.fromisoformat(str(value).strip()[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid expiry date: {value!r} (use YYYY-MM-DD)")
+
+
+def push_lot(heap: List[Lot], expiry: DateLike, seq: int, quantity: int, depot: Optional[str] = None):
+    lot = [normalize_expiry(expiry), seq, quantity]
+    if depot is not None:
+        lot.append(depot)
+    heapq.heappush(heap, lot)
+
+
+def lot_depot(lot: Lot) -> Optional[str]:
+    """Depot holding a lot, or None for central storage."""
+    return lot[3] if len(lot) > 3 else None
+
+
+def take_fefo(heap: List[Lot], quantity: int, as_of: DateLike = None,
+              depot=ANY_DEPOT) -> List[Tuple[str, int]]:
+    """Remove quantity from the first-expiring lots; returns [(expiry, quantity taken)].
+
+    With as_of, lots that expired before it are left in place and never taken. With a
+    depot (None for central storage), only that location's lots are taken.
+    The caller checks the available total first; if the heap runs out, less is taken.
+    """
+    held = []
+    if as_of is not None:
+        cutoff = normalize_expiry(as_of)
+        while heap and heap[0][0] < cutoff:
+            held.append(heapq.heappop(heap))
+    taken = []
+    while quantity > 0 and heap:
+        lot = heap[0]
+        if depot is not ANY_DEPOT and lot_depot(lot) != depot:
+            held.append(heapq.heappop(heap))
+            continue
+        take = min(quantity, lot[2])
+        taken.append((lot[0], take))
+        quantity -= take
+        if take == lot[2]:
+            heapq.heappop(heap)
+        else:
+            # Only the quantity changes, so the heap order still holds
+            lot[2] -= take
+    for lot in held:
+        heapq.heappush(heap, lot)
+    return taken
+
+
+def expired_lots(heap: List[Lot], as_of: DateLike = None) -> List[Lot]:
+    """Lots with expiry before as_of (default today), first-expiring first, without removing them."""
+    cutoff = normalize_expiry(as_of or date.today())
+    found = []
+    # Walk the heap from the root, descending only into expired subtrees
+    stack = [0] if heap else []
+    while stack:
+        i = stack.pop()
+        if heap[i][0] < cutoff:
+            found.append(heap[i])
+            stack.extend(j for j in (2 * i + 1, 2 * i + 2) if j < len(heap))
+    return sorted(found)
+
+
+def expired_quantity(heap: List[Lot], as_of: DateLike = None, depot=ANY_DEPOT) -> int:
+    """Units in lots that expired before as_of (default today), optionally at one depot only."""
+    return sum(lot[2] for lot in expired_lots(heap, as_of) if depot is ANY_DEPOT or lot_depot(lot) == depot)
+
+
+def depot_quantities(heap: List[Lot], as_of: DateLike = None) -> Dict[str, int]:
+    """Units per depot in lots that have not expired before as_of (default today)."""
+    cutoff = normalize_expiry(as_of or date.today())
+    quantities: Dict[str, int] = {}
+    for lot in heap:
+        depot = lot_depot(lot)
+        if depot is not None and lot[0] >= cutoff:
+            quantities[depot] = quantities.get(depot, 0) + lot[2]
+    return quantities
+
+
+def pop_expired(heap: List[Lot], as_of: DateLike = None) -> List[Lot]:
+    """Remove and return lots with expiry before as_of (default today)."""
+    cutoff = normalize_expiry(as_of or date.today())
+    removed = []
+    while heap and heap[0][0] < cutoff:
+        removed.append(heapq.heappop(heap))
+    return removed
+
+
+def next_seq(heaps) -> int:
+    return 1 + max((lot[1] for heap in heaps for lot in heap), default=0)
@@ -0,0 +1,188 @@
+"""Opt-in session profiling for main.py.
+
+Run ``python main.py --profile [REPORT]`` (or set ``AID_PROFILE=REPORT``) to record
+cProfile timings and tracemalloc peaks for a whole session, including sessions
+scripted from stdin (``python main.py --profile < session.txt``).
+"""
+import cProfile
+import functools
+import importlib
+import inspect
+import os
+import pstats
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_REPORT = 'profile_report.txt'
+
+# (module name, attributes to instrument). Classes have all their methods wrapped.
+TARGETS: List[Tuple[str, List[str]]] = [
+    ('storage', ['Storage']),
+    ('help_stations', ['HelpStation']),
+    ('report_utils', ['geocode']),
+    ('mental_health_ai', ['update_memory_with_gpt', 'main']),
+    ('src.companion_turns', ['get_chat_completion', 'update_disasters', 'update_losses_with_time']),
+    ('src.companion_router', ['check_for_time_question', 'extract_time_from_text']),
+]
+
+
+def report_path_from_env(value: Optional[str]) -> Optional[str]:
+    """Translate an AID_PROFILE value into a report path (None when profiling is off)."""
+    if not value or value.strip().lower() in ('0', 'false', 'no', 'off'):
+        return None
+    if value.strip().lower() in ('1', 'true', 'yes', 'on'):
+        return DEFAULT_REPORT
+    return value.strip()
+
+
+class SessionProfiler:
+    def __init__(self, report_path: str = DEFAULT_REPORT, targets: Optional[List[Tuple[str, List[str]]]] = None):
+        """Collect cumulative time and peak allocations for the targeted call sites.
+
+        Targets are resolved by importing the named modules; modules that fail to import
+        (e.g. missing optional dependencies) are skipped.
+        """
+        self.report_path = report_path
+        self.targets = TARGETS if targets is None else targets
+        self._profile = cProfile.Profile()
+        # label -> [calls, seconds, peak bytes]
+        self._stats: Dict[str, List] = {}
+        # one [baseline, peak] frame per active instrumented call
+        self._stack: List[List[int]] = []
+        self._patches: List[Tuple[object, str, object]] = []
+        self._files: List[str] = []
+        self._session_peak = 0
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._owns_tracemalloc = False
+
+    # Instrumentation
+    def _wrap(self, label: str, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            current, peak = tracemalloc.get_traced_memory()
+            self._session_peak = max(self._session_peak, peak)
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            frame = [current, current]
+            self._stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._stack.pop()
+                call_peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+                self._session_peak = max(self._session_peak, call_peak)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], call_peak)
+                entry = self._stats.setdefault(label, [0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], call_peak - frame[0])
+        return wrapper
+
+    def _patch(self, owner, attr: str, label: str):
+        original = getattr(owner, attr)
+        self._patches.append((owner, attr, original))
+        setattr(owner, attr, self._wrap(label, original))
+
+    def instrument(self, module_name: str, attrs: List[str]):
+        try:
+            module = importlib.import_module(module_name)
+        except Exception:
+            return
+        module_file = getattr(module, '__file__', None)
+        if module_file:
+            self._files.append(os.path.abspath(module_file))
+        for attr in attrs:
+            obj = getattr(module, attr, None)
+            if obj is None:
+                continue
+            if isinstance(obj, type):
+                for name, member in list(vars(obj).items()):
+                    if inspect.isfunction(member) and (not name.startswith('__') or name == '__init__'):
+                        self._patch(obj, name, f"{obj.__name__}.{name}")
+            elif callable(obj):
+                self._patch(module, attr, f"{module_name}.{attr}")
+
+    # Lifecycle
+    def start(self):
+        for module_name, attrs in self.targets:
+            self.instrument(module_name, attrs)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._started = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        self._elapsed = time.perf_counter() - self._started
+        self._session_peak = max(self._session_peak, tracemalloc.get_traced_memory()[1])
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        # Restore in reverse order so repeated patches unwind correctly
+        for owner, attr, original in reversed(self._patches):
+            setattr(owner, attr, original)
+        self._patches = []
+
+    # Reporting
+    def _function_rows(self) -> List[Tuple[int, float, float, str]]:
+        stats = pstats.Stats(self._profile)
+        rows = []
+        for (filename, lineno, funcname), (_cc, ncalls, tottime, cumtime, _callers) in stats.stats.items():
+            if os.path.abspath(filename) not in self._files:
+                continue
+            label = f"{os.path.basename(filename)}:{lineno}({funcname})"
+            rows.append((ncalls, tottime, cumtime, label))
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows
+
+    def format_report(self) -> str:
+        lines = [
+            "Aid Dispatch session profile",
+            f"Session wall time     : {self._elapsed:.3f} s",
+            f"Session peak memory   : {self._session_peak / 1024:.1f} KiB (tracemalloc)",
+            "",
+            "Cumulative time by function",
+            f"{'calls':>8} {'tottime':>10} {'cumtime':>10}  function",
+        ]
+        for ncalls, tottime, cumtime, label in self._function_rows():
+            lines.append(f"{ncalls:>8} {tottime:>10.4f} {cumtime:>10.4f}  {label}")
+        lines += [
+            "",
+            "Peak allocations by call site",
+            f"{'calls':>8} {'cumtime':>10} {'peak KiB':>10}  call site",
+        ]
+        for label, (calls, seconds, peak) in sorted(self._stats.items(), key=lambda kv: kv[1][2], reverse=True):
+            lines.append(f"{calls:>8} {seconds:>10.4f} {peak / 1024:>10.1f}  {label}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self) -> str:
+        dirpath = os.path.dirname(self.report_path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            f.write(self.format_report())
+        return self.report_path
+
+
+def profile_session(func: Callable, report_path: str = DEFAULT_REPORT):
+    """Run func() under a SessionProfiler and write the report, even if the session fails.
+
+    Running out of stdin ends a scripted session normally rather than as an error.
+    """
+    profiler = SessionProfiler(report_path)
+    profiler.start()
+    try:
+        func()
+    except EOFError:
+        pass
+    finally:
+        profiler.stop()
+        profiler.write_report()
+    return profiler
@@ -0,0 +1,119 @@
+"""Fair-share rationing of scarce supplies across pending requests.
+
+Allocations follow weighted max-min fairness ("water filling"): with stock S and
+requests of demand d_i and weight w_i (e.g. household size), each request gets
+min(d_i, level * w_i), where level is the largest value whose allocations fit in S.
+Requests that ask for less than their share are filled completely and the rest is
+split among the others. When stock covers all demand, everyone is filled.
+
+Pending requests per category are kept sorted by d_i / w_i as they change, so the
+level is found in one pass. Allocations are recomputed lazily: only when a category's
+demand or stock has changed since the last query.
+"""
+import bisect
+import itertools
+import math
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+def water_fill(requests: List[Tuple[Hashable, int, float]], stock: int) -> Tuple[Dict[Hashable, int], float]:
+    """Integer max-min fair allocations for [(id, demand, weight)] sorted by demand / weight.
+
+    Returns (allocations, level); level is math.inf when stock covers all demand.
+    """
+    if sum(demand for _, demand, _ in requests) <= stock:
+        return {request_id: demand for request_id, demand, _ in requests}, math.inf
+    remaining = float(max(stock, 0))
+    weight_left = sum(weight for _, _, weight in requests)
+    allocations: Dict[Hashable, int] = {}
+    level = 0.0
+    for index, (request_id, demand, weight) in enumerate(requests):
+        level = remaining / weight_left
+        if demand > level * weight:
+            break
+        allocations[request_id] = demand
+        remaining -= demand
+        weight_left -= weight
+    else:
+        return allocations, math.inf
+    # Everyone from here on gets level * weight; hand out whole units, largest remainder first
+    shares = []
+    for request_id, demand, weight in requests[index:]:
+        share = level * weight
+        allocations[request_id] = int(share)
+        shares.append((share - int(share), request_id))
+    leftover = int(stock) - sum(allocations.values())
+    for _, request_id in sorted(shares, key=lambda s: -s[0])[:max(leftover, 0)]:
+        allocations[request_id] += 1
+    return allocations, level
+
+
+class Rationer:
+    def __init__(self, storage=None):
+        """Fair shares of each category's stock in storage (or of stock passed explicitly)."""
+        self.storage = storage
+        # category -> requester -> (demand, weight, sort entry)
+        self._demand: Dict[str, Dict[Hashable, Tuple[int, float, Tuple]]] = {}
+        # category -> [(demand / weight, seq, requester)] kept sorted
+        self._order: Dict[str, List[Tuple]] = {}
+        self._version: Dict[str, int] = {}
+        # category -> (version, stock, allocations, level)
+        self._cache: Dict[str, Tuple] = {}
+        self._seq = itertools.count()
+
+    def _category(self, category: str) -> str:
+        return category.strip().lower()
+
+    def set_demand(self, category: str, requester: Hashable, quantity: int, weight: float = 1.0):
+        """Add or update a pending request; a quantity of 0 withdraws it."""
+        category = self._category(category)
+        self.remove(category, requester)
+        if quantity <= 0:
+            return
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        entry = (quantity / weight, next(self._seq), requester)
+        self._demand.setdefault(category, {})[requester] = (int(quantity), float(weight), entry)
+        bisect.insort(self._order.setdefault(category, []), entry)
+        self._version[category] = self._version.get(category, 0) + 1
+
+    def remove(self, category: str, requester: Hashable) -> bool:
+        category = self._category(category)
+        current = self._demand.get(category, {}).pop(requester, None)
+        if current is None:
+            return False
+        order = self._order[category]
+        del order[bisect.bisect_left(order, current[2])]
+        self._version[category] = self._version.get(category, 0) + 1
+        return True
+
+    def pending(self, category: str) -> int:
+        """Total quantity requested in category."""
+        return sum(demand for demand, _, _ in self._demand.get(self._category(category), {}).values())
+
+    def _solve(self, category: str, stock: Optional[int]) -> Tuple:
+        category = self._category(category)
+        if stock is None:
+            stock = self.storage.check_inventory(category) if self.storage is not None else 0
+        version = self._version.get(category, 0)
+        cached = self._cache.get(category)
+        if cached is not None and cached[0] == version and cached[1] == stock:
+            return cached
+        demand = self._demand.get(category, {})
+        requests = [(requester, demand[requester][0], demand[requester][1])
+                    for _, _, requester in self._order.get(category, [])]
+        allocations, level = water_fill(requests, stock)
+        cached = (version, stock, allocations, level)
+        self._cache[category] = cached
+        return cached
+
+    def allocations(self, category: str, stock: Optional[int] = None) -> Dict[Hashable, int]:
+        """Fair allocation per pending requester; stock defaults to the category's stock in storage."""
+        return dict(self._solve(category, stock)[2])
+
+    def allocation(self, category: str, requester: Hashable, stock: Optional[int] = None) -> int:
+        return self._solve(category, stock)[2].get(requester, 0)
+
+    def level(self, category: str, stock: Optional[int] = None) -> float:
+        """Units per unit of weight given to requests that are not filled completely."""
+        return self._solve(category, stock)[3]
@@ -0,0 +1,200 @@
+"""Vectorized aggregation over disaster reports.
+
+Reports are held in columnar NumPy arrays (timestamp, type code, lat, lon, reporter id)
+that grow as reports arrive. Aggregates are cached together with the number of rows
+they cover, so a query after new reports only processes the new rows.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .report_store import parse_timestamp
+    from .report_utils import parse_location
+    from .disaster_types import TYPE_NAMES, TYPE_CODES, normalize_disaster_type, report_type_code
+except ImportError:
+    from report_store import parse_timestamp
+    from report_utils import parse_location
+    from disaster_types import TYPE_NAMES, TYPE_CODES, normalize_disaster_type, report_type_code
+
+EARTH_RADIUS_KM = 6371.0
+# Rows are assigned to stations in chunks to bound the size of the distance matrix
+_CHUNK_ROWS = 65536
+
+
+class ReportAnalytics:
+    def __init__(self, capacity: int = 1024):
+        """Columnar report store; use add()/extend() or from_storage() to fill it."""
+        capacity = max(int(capacity), 16)
+        self._n = 0
+        self._ts = np.zeros(capacity, dtype=np.int64)
+        self._type = np.zeros(capacity, dtype=np.int32)
+        self._lat = np.full(capacity, np.nan)
+        self._lon = np.full(capacity, np.nan)
+        self._reporter = np.zeros(capacity, dtype=np.int32)
+        # Type codes are the canonical codes from disaster_types
+        self.type_names: List[str] = list(TYPE_NAMES)
+        self.reporter_names: List[str] = []
+        self._reporter_index: Dict[str, int] = {}
+        # Running totals maintained on every add
+        self._type_counts = np.zeros(len(self.type_names), dtype=np.int64)
+        # bucket_seconds -> {'first': first bucket number, 'counts': types x buckets, 'rows': rows covered}
+        self._bucket_cache: Dict[int, Dict] = {}
+        # station signature -> {'counts': per-station totals, 'rows': rows covered}
+        self._catchment_cache: Dict[Tuple, Dict] = {}
+
+    @classmethod
+    def from_storage(cls, storage, **filters) -> 'ReportAnalytics':
+        """Build from Storage.iter_reports(**filters), streaming the report archive."""
+        analytics = cls()
+        analytics.extend(storage.iter_reports(**filters))
+        return analytics
+
+    def __len__(self) -> int:
+        return self._n
+
+    # Columns (read-only views of the filled rows)
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._ts[:self._n]
+
+    @property
+    def type_codes(self) -> np.ndarray:
+        return self._type[:self._n]
+
+    @property
+    def lats(self) -> np.ndarray:
+        return self._lat[:self._n]
+
+    @property
+    def lons(self) -> np.ndarray:
+        return self._lon[:self._n]
+
+    @property
+    def reporter_ids(self) -> np.ndarray:
+        return self._reporter[:self._n]
+
+    # Ingest
+    def _grow(self, needed: int):
+        capacity = len(self._ts)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, fill in (('_ts', 0), ('_type', 0), ('_lat', np.nan), ('_lon', np.nan), ('_reporter', 0)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def _code(self, value: str, names: List[str], index: Dict[str, int]) -> int:
+        key = (value or '').strip().lower()
+        code = index.get(key)
+        if code is None:
+            code = len(names)
+            index[key] = code
+            names.append(key)
+        return code
+
+    def add(self, report: Dict) -> bool:
+        """Append one report; returns False (and skips it) if it has no usable timestamp."""
+        ts = parse_timestamp(report.get('timestamp'))
+        if ts is None:
+            return False
+        self._grow(self._n + 1)
+        i = self._n
+        code = report_type_code(report)
+        _, lat, lon = parse_location(report.get('details', '') or '')
+        self._ts[i] = int(ts.timestamp())
+        self._type[i] = code
+        self._lat[i] = np.nan if lat is None else lat
+        self._lon[i] = np.nan if lon is None else lon
+        self._reporter[i] = self._code(report.get('name', ''), self.reporter_names, self._reporter_index)
+        self._type_counts[code] += 1
+        self._n += 1
+        return True
+
+    def extend(self, reports: Iterable[Dict]) -> int:
+        return sum(1 for report in reports if self.add(report))
+
+    # Aggregates
+    def counts_by_type(self) -> Dict[str, int]:
+        return {name: int(self._type_counts[code]) for code, name in enumerate(self.type_names) if self._type_counts[code]}
+
+    def counts_by_bucket(self, bucket_seconds: int = 3600) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (bucket start times, counts[type code, bucket]) for epoch-aligned buckets."""
+        bucket_seconds = int(bucket_seconds)
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+        n_types = len(self.type_names)
+        cache = self._bucket_cache.get(bucket_seconds)
+        if cache is None:
+            cache = {'first': 0, 'counts': np.zeros((n_types, 0), dtype=np.int64), 'rows': 0}
+            self._bucket_cache[bucket_seconds] = cache
+        if cache['rows'] < self._n:
+            buckets = self._ts[cache['rows']:self._n] // bucket_seconds
+            types = self._type[cache['rows']:self._n]
+            counts = cache['counts']
+            first = cache['first'] if counts.shape[1] else int(buckets.min())
+            lo = min(first, int(buckets.min()))
+            hi = max(first + counts.shape[1], int(buckets.max()) + 1)
+            if lo != first or hi != first + counts.shape[1]:
+                grown = np.zeros((n_types, hi - lo), dtype=np.int64)
+                grown[:, first - lo:first - lo + counts.shape[1]] = counts
+                counts, first = grown, lo
+            np.add.at(counts, (types, buckets - first), 1)
+            cache.update(first=first, counts=counts, rows=self._n)
+        counts = cache['counts']
+        starts = (cache['first'] + np.arange(counts.shape[1], dtype=np.int64)) * bucket_seconds
+        return starts, counts
+
+    def rolling_rate(self, window_seconds: int = 86400, step_seconds: int = 3600,
+                     disaster_type: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Reports per hour over a trailing window, evaluated at the end of each step bucket."""
+        if window_seconds % step_seconds:
+            raise ValueError("window_seconds must be a multiple of step_seconds")
+        starts, counts = self.counts_by_bucket(step_seconds)
+        if disaster_type is None:
+            series = counts.sum(axis=0)
+        else:
+            series = counts[TYPE_CODES[normalize_disaster_type(disaster_type)]]
+        cumulative = np.concatenate([[0], np.cumsum(series)])
+        k = window_seconds // step_seconds
+        idx = np.arange(1, len(cumulative))
+        windowed = cumulative[idx] - cumulative[np.maximum(idx - k, 0)]
+        return starts + step_seconds, windowed / (window_seconds / 3600.0)
+
+    def station_catchment_totals(self, stations: Dict[str, Tuple[float, float]],
+                                 max_km: Optional[float] = None) -> Dict[str, int]:
+        """Count located reports whose nearest station (great-circle distance) is each station.
+
+        Reports farther than max_km from every station, or without coordinates, are not counted.
+        """
+        names = sorted(stations)
+        if not names:
+            return {}
+        key = (tuple((name, tuple(stations[name])) for name in names), max_km)
+        cache = self._catchment_cache.get(key)
+        if cache is None:
+            cache = {'counts': np.zeros(len(names), dtype=np.int64), 'rows': 0}
+            self._catchment_cache[key] = cache
+        if cache['rows'] < self._n:
+            s_lat = np.radians(np.array([stations[name][0] for name in names], dtype=float))
+            s_lon = np.radians(np.array([stations[name][1] for name in names], dtype=float))
+            for start in range(cache['rows'], self._n, _CHUNK_ROWS):
+                stop = min(start + _CHUNK_ROWS, self._n)
+                lat, lon = self._lat[start:stop], self._lon[start:stop]
+                located = ~(np.isnan(lat) | np.isnan(lon))
+                if not located.any():
+                    continue
+                r_lat = np.radians(lat[located])[:, None]
+                r_lon = np.radians(lon[located])[:, None]
+                a = (np.sin((s_lat - r_lat) / 2) ** 2
+                     + np.cos(r_lat) * np.cos(s_lat) * np.sin((s_lon - r_lon) / 2) ** 2)
+                dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+                nearest = dist.argmin(axis=1)
+                if max_km is not None:
+                    nearest = nearest[dist[np.arange(len(nearest)), nearest] <= max_km]
+                cache['counts'] += np.bincount(nearest, minlength=len(names))
+            cache['rows'] = self._n
+        return {name: int(count) for name, count in zip(names, cache['counts'])}
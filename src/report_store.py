@@ -0,0 +1,111 @@
+"""JSON Lines persistence and streaming filters for disaster reports.
+
+Reports are stored one JSON object per line so new reports are appended without
+rewriting the file, and readers can stream and filter them in constant memory.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+try:
+    from .disaster_types import OTHER, TYPE_CODES, normalize_disaster_type, report_type_code
+except ImportError:
+    from disaster_types import OTHER, TYPE_CODES, normalize_disaster_type, report_type_code
+
+TimeBound = Union[datetime, str, None]
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """Yield one record per non-blank line of a JSON Lines file; a missing file yields nothing.
+
+    Lines that are not valid JSON objects (e.g. a torn final write) are skipped.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+def append_jsonl(path: str, records: Iterable[Dict]) -> int:
+    """Append records to a JSON Lines file and return how many were written."""
+    count = 0
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(_dumps(record) + '\n')
+            count += 1
+    return count
+
+
+def write_jsonl(path: str, records: Iterable[Dict]) -> int:
+    """Stream records into path (replacing it atomically) and return how many were written."""
+    tmp_path = path + '.tmp'
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(_dumps(record) + '\n')
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def parse_timestamp(value: TimeBound) -> Optional[datetime]:
+    """Parse an ISO timestamp (report format '...Z' included) into an aware UTC datetime."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def filter_reports(reports: Iterable[Dict], since: TimeBound = None, until: TimeBound = None,
+                   disaster_type: Optional[str] = None) -> Iterator[Dict]:
+    """Lazily yield reports with since <= timestamp < until and a matching disaster type.
+
+    disaster_type is compared by canonical type code; text that does not normalize to a
+    known type is compared literally (case-insensitive) instead.
+    Reports without a parseable timestamp are excluded whenever a time bound is given.
+    """
+    since_dt = parse_timestamp(since)
+    until_dt = parse_timestamp(until)
+    wanted_code = wanted_text = None
+    if disaster_type:
+        canonical = normalize_disaster_type(disaster_type)
+        if canonical == OTHER:
+            wanted_text = disaster_type.strip().lower()
+        else:
+            wanted_code = TYPE_CODES[canonical]
+    for report in reports:
+        if wanted_code is not None and report_type_code(report) != wanted_code:
+            continue
+        if wanted_text is not None and str(report.get('disaster_type', '')).strip().lower() != wanted_text:
+            continue
+        if since_dt is not None or until_dt is not None:
+            ts = parse_timestamp(report.get('timestamp'))
+            if ts is None:
+                continue
+            if since_dt is not None and ts < since_dt:
+                continue
+            if until_dt is not None and ts >= until_dt:
+                continue
+        yield report
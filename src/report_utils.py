@@ -1,7 +1,6 @@
 import json
+import re
 import sys
-import urllib.parse
-import urllib.request
 from typing import Optional, Tuple
 
 # Geocoder setup (OpenStreetMap Nominatim). Replace contact@example.com with a real contact per policy.
@@ -10,6 +9,10 @@ NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
 
 
 def _perform_query(q: str) -> Optional[Tuple[float, float, str]]:
+    # urllib.request pulls in http.client/ssl/email; import it only when a lookup is made
+    import urllib.parse
+    import urllib.request
+
     params = {"format": "json", "q": q, "limit": 1, "addressdetails": 0}
     url = NOMINATIM_URL + "?" + urllib.parse.urlencode(params)
     req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
@@ -70,3 +73,34 @@ def geocode(number: Optional[str], street: str, city: str, country: str) -> Opti
     else:
         print("geocode: no address parts provided", file=sys.stderr)
     return None
+
+
+_LAT_RE = re.compile(r"lat:\s*([\-\d\.]+)")
+_LON_RE = re.compile(r"lon:\s*([\-\d\.]+)")
+
+
+def parse_location(details: str) -> Tuple[Optional[str], Optional[float], Optional[float]]:
+    """Return (address, lat, lon) recorded in a report's details by the geocoding step.
+
+    Reports store resolved locations as '<text> | location_resolved: <address> | lat:<lat> lon:<lon>';
+    any part that is missing or malformed comes back as None.
+    """
+    if not details:
+        return None, None, None
+    addr = None
+    if "location_resolved:" in details:
+        addr = details.split("location_resolved:", 1)[1].split("|", 1)[0].strip() or None
+    lat = lon = None
+    mlat = _LAT_RE.search(details)
+    mlon = _LON_RE.search(details)
+    try:
+        if mlat:
+            lat = float(mlat.group(1))
+    except ValueError:
+        lat = None
+    try:
+        if mlon:
+            lon = float(mlon.group(1))
+    except ValueError:
+        lon = None
+    return addr, lat, lon
@@ -1,71 +1,275 @@
+import heapq
 import json
 import os
-from typing import Optional, List, Dict
-from datetime import datetime
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Iterator
+from datetime import date, datetime, timedelta
+
+try:
+    from .report_store import iter_jsonl, append_jsonl, write_jsonl, filter_reports, TimeBound
+    from .disaster_types import type_code, TYPE_CODES, MENTAL_SUPPORT
+    from .lots import (push_lot, take_fefo, expired_lots, expired_quantity, pop_expired, next_seq,
+                       normalize_expiry, lot_depot, depot_quantities, NO_EXPIRY, ANY_DEPOT)
+except ImportError:
+    from report_store import iter_jsonl, append_jsonl, write_jsonl, filter_reports, TimeBound
+    from disaster_types import type_code, TYPE_CODES, MENTAL_SUPPORT
+    from lots import (push_lot, take_fefo, expired_lots, expired_quantity, pop_expired, next_seq,
+                      normalize_expiry, lot_depot, depot_quantities, NO_EXPIRY, ANY_DEPOT)
 
 
 class Storage:
+    SEGMENTS = ('supplies', 'requesters', 'reports', 'incidents', 'demand')
+
     def __init__(self, persistence_file: Optional[str] = None):
         """Storage with optional JSON persistence.
 
-        If persistence_file is provided (e.g. 'data/storage.json'), the storage will
-        load existing supplies/reports from that file (if present) and save after changes.
+        If persistence_file is provided (e.g. 'data/storage.json'), the storage is kept in
+        independent segments that are loaded on first use and saved separately:
+        supplies in persistence_file itself, requesters in 'storage.requesters.json',
+        reports in 'storage.reports.jsonl' (JSON Lines, append-only), duplicate links in
+        'storage.incidents.json' and demand forecasts in 'storage.demand.json' next to it.
+        Inventory operations therefore never read or rewrite report data, and report reads stream.
+        Every inventory change is also appended to 'storage.ledger.jsonl' (see ledger.InventoryLedger).
         If persistence_file is None, storage is in-memory only (used by tests).
         """
-        self.supplies: Dict[str, int] = {}
+        # Item totals; kept equal to the sum of the item's lots so lookups stay O(1)
+        self._supplies: Dict[str, int] = {}
+        # item -> min-heap of [expiry, seq, quantity(, depot)] lots (see lots.py), saved with supplies;
+        # stock held at depots is part of the item totals and the ledger like central stock
+        self._lots: Dict[str, List[List]] = {}
+        self._lot_seq = 1
         # Keep a list of reports submitted by non-government users
-        # Each report is a dict: {"name": str, "disaster_type": str, "details": str, "timestamp": str}
-        self.reports: List[Dict] = []
+        # Each report is a dict: {"name": str, "disaster_type": str, "type_code": int, "details": str, "timestamp": str}
+        # where type_code is the canonical type (see disaster_types) of the free-text disaster_type
+        self._reports: List[Dict] = []
         # Keep a list of known requester names
-        self.requesters: List[str] = []
+        self._requesters: List[str] = []
+        # canonical report id -> {"count": int, "reporters": [...], "reports": [{"name", "timestamp"}]}
+        # for near-duplicate reports linked to it instead of being stored
+        self._incidents: Dict[str, Dict] = {}
+        self._duplicates = None
+        # Smoothed remove_supplies demand per item (see forecast.DemandForecaster)
+        self._demand: Dict[str, Dict] = {}
+        self._forecaster = None
+        self._ledger = None
+        # Reports waiting to be appended to the reports file
+        self._report_buffer: List[Dict] = []
+        self._reports_file_checked = False
 
         self._persistence_file = persistence_file
+        # Segments read from disk so far; in-memory storage has nothing to load
+        self._loaded = set() if self._persistence_file else set(self.SEGMENTS)
+        # While > 0, saves are deferred until the outermost bulk_update() exits
+        self._defer_depth = 0
+        self._dirty = set()
         if self._persistence_file:
             # Ensure directory exists
             dirpath = os.path.dirname(self._persistence_file)
             if dirpath:
                 os.makedirs(dirpath, exist_ok=True)
-            self._load()
 
-    def _load(self):
+    # Each segment is loaded from disk on first access
+    @property
+    def supplies(self) -> Dict[str, int]:
+        self._ensure_loaded('supplies')
+        return self._supplies
+
+    @supplies.setter
+    def supplies(self, value: Dict[str, int]):
+        self._ensure_loaded('supplies')
+        self._supplies = value
+        self._reconcile_lots()
+
+    @property
+    def reports(self) -> List[Dict]:
+        self._ensure_loaded('reports')
+        return self._reports
+
+    @reports.setter
+    def reports(self, value: List[Dict]):
+        self._ensure_loaded('reports')
+        self._reports = value
+
+    @property
+    def requesters(self) -> List[str]:
+        self._ensure_loaded('requesters')
+        return self._requesters
+
+    @requesters.setter
+    def requesters(self, value: List[str]):
+        self._ensure_loaded('requesters')
+        self._requesters = value
+
+    def _segment_path(self, segment: str) -> str:
+        if segment == 'supplies':
+            return self._persistence_file
+        base, ext = os.path.splitext(self._persistence_file)
+        if segment == 'reports':
+            return f"{base}.reports.jsonl"
+        return f"{base}.{segment}{ext or '.json'}"
+
+    def _ensure_loaded(self, segment: str):
+        if segment in self._loaded:
+            return
+        if segment != 'supplies':
+            # Loading supplies first migrates a legacy single-document file into segments
+            self._ensure_loaded('supplies')
+            if segment in self._loaded:
+                return
+        self._loaded.add(segment)
+        if segment == 'supplies':
+            self._load_supplies()
+        elif segment == 'reports':
+            self._flush_reports()
+            self._reports = list(iter_jsonl(self._reports_file()))
+        else:
+            self._load_json_segment(segment)
+
+    def _load_supplies(self):
         try:
             if os.path.exists(self._persistence_file):
                 with open(self._persistence_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     if isinstance(data, dict):
-                        # Two possible formats supported for backward compatibility:
+                        # Three possible formats supported for backward compatibility:
                         # 1) flat mapping of item -> int (older format)
-                        # 2) structured mapping: {"supplies": {...}, "reports": [...], "requesters": [...]}
+                        # 2) single document: {"supplies": {...}, "reports": [...], "requesters": [...]}
+                        # 3) supplies segment: {"supplies": {...}, "lots": {item: [[expiry, seq, qty(, depot)], ...]}}
                         if 'supplies' in data:
-                            self.supplies = {k: int(v) for k, v in data.get('supplies', {}).items()}
-                            self.reports = data.get('reports', []) or []
-                            self.requesters = data.get('requesters', []) or []
+                            self._supplies = {k: int(v) for k, v in data.get('supplies', {}).items()}
+                            lots = data.get('lots')
+                            if isinstance(lots, dict):
+                                self._lots = {k: [list(lot) for lot in v] for k, v in lots.items() if isinstance(v, list)}
+                            if 'reports' in data or 'requesters' in data:
+                                self._migrate_legacy(data)
                         else:
                             # assume flat mapping
-                            self.supplies = {k: int(v) for k, v in data.items()}
+                            self._supplies = {k: int(v) for k, v in data.items()}
         except Exception:
             # If loading fails, keep defaults but don't raise in app runtime
-            self.supplies = {}
-            self.reports = []
-            self.requesters = []
+            self._supplies = {}
+            self._lots = {}
+        self._reconcile_lots()
+
+    def _reconcile_lots(self):
+        """Make each item's lots add up to its total; stock without lots never expires."""
+        for item in [k for k in self._lots if k not in self._supplies]:
+            del self._lots[item]
+        self._lot_seq = next_seq(self._lots.values())
+        for item, total in self._supplies.items():
+            heap = self._lots.setdefault(item, [])
+            heapq.heapify(heap)
+            tracked = sum(lot[2] for lot in heap)
+            if total > tracked:
+                push_lot(heap, NO_EXPIRY, self._lot_seq, total - tracked)
+                self._lot_seq += 1
+            elif total < tracked:
+                take_fefo(heap, tracked - total)
+
+    def _load_json_segment(self, segment: str):
+        # Defaults set in __init__ give the expected JSON type
+        expected = type(getattr(self, f"_{segment}"))
+        value = expected()
+        try:
+            path = self._segment_path(segment)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if isinstance(data, expected):
+                        value = data
+        except Exception:
+            value = expected()
+        setattr(self, f"_{segment}", value)
+
+    def _migrate_legacy(self, data: Dict):
+        """Split a single-document storage file into segment files (runs once)."""
+        for segment in ('requesters', 'reports'):
+            if os.path.exists(self._segment_path(segment)):
+                # Segment already written by a newer run; the copy in the old document is stale
+                continue
+            setattr(self, f"_{segment}", data.get(segment, []) or [])
+            self._loaded.add(segment)
+            if segment == 'reports':
+                write_jsonl(self._segment_path('reports'), self._reports)
+            else:
+                self._write_segment(segment)
+        self._write_segment('supplies')
+
+    def _reports_file(self) -> str:
+        """Path of the reports JSON Lines file, converting an older JSON array segment first."""
+        path = self._segment_path('reports')
+        if not self._reports_file_checked:
+            self._ensure_loaded('supplies')
+            self._reports_file_checked = True
+            old_path = os.path.splitext(path)[0] + '.json'
+            if not os.path.exists(path) and os.path.exists(old_path):
+                try:
+                    with open(old_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    write_jsonl(path, data if isinstance(data, list) else [])
+                    os.remove(old_path)
+                except Exception:
+                    pass
+        return path
 
-    def _save(self):
+    def _flush_reports(self):
+        if self._report_buffer:
+            append_jsonl(self._reports_file(), self._report_buffer)
+            self._report_buffer = []
+
+    def _write_segment(self, segment: str):
+        if segment == 'reports':
+            # Reports are append-only on disk; only new reports are written
+            self._flush_reports()
+            return
+        if segment == 'ledger':
+            if self._ledger is not None:
+                self._ledger.flush()
+            return
+        if segment == 'supplies':
+            payload = {'supplies': self._supplies}
+            # Central stock that never expires is rebuilt from the totals on load
+            lots = {item: [lot for lot in heap if lot[0] != NO_EXPIRY or lot_depot(lot) is not None]
+                    for item, heap in self._lots.items()}
+            lots = {item: heap for item, heap in lots.items() if heap}
+            if lots:
+                payload['lots'] = lots
+        else:
+            payload = getattr(self, f"_{segment}")
+        with open(self._segment_path(segment), 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+
+    def _save(self, *segments: str):
+        """Persist the given segments (all loaded segments if none are named)."""
         if not self._persistence_file:
             return
+        segments = segments or tuple(s for s in self.SEGMENTS if s in self._loaded)
+        if self._defer_depth:
+            self._dirty.update(segments)
+            return
+        for segment in segments:
+            self._dirty.discard(segment)
+            try:
+                self._write_segment(segment)
+            except Exception:
+                # On failure to persist, ignore (do not crash the app)
+                pass
+
+    @contextmanager
+    def bulk_update(self):
+        """Defer persistence while applying many changes; each changed segment is written once on exit."""
+        self._defer_depth += 1
         try:
-            payload = {
-                'supplies': self.supplies,
-                'reports': self.reports,
-                'requesters': self.requesters,
-            }
-            with open(self._persistence_file, 'w', encoding='utf-8') as f:
-                json.dump(payload, f, indent=2)
-        except Exception:
-            # On failure to persist, ignore (do not crash the app)
-            pass
+            yield self
+        finally:
+            self._defer_depth -= 1
+            if self._defer_depth == 0 and self._dirty:
+                self._save(*sorted(self._dirty))
 
     def _get_actual_key(self, item: str) -> str:
         """Find the actual key in storage matching the item name case-insensitively."""
+        if item in self.supplies:
+            return item
         item_lower = item.lower()
         for key in self.supplies.keys():
             if key.lower() == item_lower:
@@ -73,32 +277,144 @@ class Storage:
         return item  # Return original if no match found
 
     # Supplies API
-    def add_supplies(self, item: str, quantity: int):
+    def add_supplies(self, item: str, quantity: int, actor: Optional[str] = None, truck: Optional[str] = None,
+                     expiry=None, depot: Optional[str] = None):
+        """Add a lot of quantity units; expiry is a date or 'YYYY-MM-DD' (None if it does not expire).
+
+        depot names the help station holding the lot (None for central storage).
+        """
+        expiry = normalize_expiry(expiry)
+        ledger = self.ledger
         actual_key = self._get_actual_key(item)
         if actual_key in self.supplies:
             self.supplies[actual_key] += quantity
         else:
             self.supplies[actual_key] = quantity
-        self._save()
+        push_lot(self._lots.setdefault(actual_key, []), expiry, self._lot_seq, quantity, depot)
+        self._lot_seq += 1
+        ledger.record(actual_key, quantity, actor=actor, truck=truck, depot=depot)
+        self._save('supplies', 'ledger')
 
-    def check_inventory(self, item: str) -> int:
-        # Return quantity for a specific item; 0 if not present
+    def check_inventory(self, item: str, depot=ANY_DEPOT) -> int:
+        # Return the quantity available for dispatch; expired lots do not count.
+        # With a depot (None for central storage), only stock held there is counted.
         actual_key = self._get_actual_key(item)
-        return int(self.supplies.get(actual_key, 0))
+        total = int(self.supplies.get(actual_key, 0))
+        if not total:
+            return 0
+        heap = self._lots.get(actual_key, [])
+        if depot is ANY_DEPOT:
+            return total - expired_quantity(heap)
+        return sum(lot[2] for lot in heap if lot_depot(lot) == depot) - expired_quantity(heap, depot=depot)
+
+    def depot_stock(self, item: str) -> Dict[str, int]:
+        """Unexpired quantity of item held at each depot."""
+        return depot_quantities(self._lots.get(self._get_actual_key(item), []))
 
-    def remove_supplies(self, item: str, quantity: int) -> bool:
-        # Remove quantity and raise ValueError if attempting to remove more than available
+    def remove_supplies(self, item: str, quantity: int, actor: Optional[str] = None, truck: Optional[str] = None,
+                        depot=ANY_DEPOT) -> bool:
+        # Remove quantity and raise ValueError if attempting to remove more than available.
+        # With a depot (None for central storage), only stock held there is taken.
+        ledger = self.ledger
         actual_key = self._get_actual_key(item)
         if actual_key not in self.supplies:
             raise ValueError(f"Item '{item}' not found in storage")
-        if self.supplies[actual_key] < quantity:
-            raise ValueError(f"Not enough '{item}' in storage to remove {quantity}")
+        if self.check_inventory(actual_key, depot) < quantity:
+            where = '' if depot is ANY_DEPOT else f" at {depot or 'central storage'}"
+            raise ValueError(f"Not enough '{item}'{where} to remove {quantity}")
         self.supplies[actual_key] -= quantity
+        # First expiring, first out; expired lots stay until sweep_expired discards them
+        take_fefo(self._lots[actual_key], quantity, as_of=date.today(), depot=depot)
         if self.supplies[actual_key] == 0:
             del self.supplies[actual_key]
-        self._save()
+            del self._lots[actual_key]
+        ledger.record(actual_key, -quantity, actor=actor, truck=truck,
+                      depot=depot if depot is not ANY_DEPOT else None)
+        self.forecaster.record(actual_key, quantity)
+        self._save('supplies', 'demand', 'ledger')
         return True
 
+    @property
+    def ledger(self):
+        """InventoryLedger of every supplies change, created on first use."""
+        if self._ledger is None:
+            try:
+                from .ledger import InventoryLedger
+            except ImportError:
+                from ledger import InventoryLedger
+            path = None
+            if self._persistence_file:
+                path = f"{os.path.splitext(self._persistence_file)[0]}.ledger.jsonl"
+            self._ledger = InventoryLedger(path)
+            # Stock the ledger has not seen (older files, manual edits) becomes opening entries
+            self._ledger.reconcile(self.supplies)
+            self._save('ledger')
+        return self._ledger
+
+    def get_lots(self, item: str) -> List[Dict]:
+        """Lots of an item, first-expiring first: [{"expiry": 'YYYY-MM-DD' or None, "quantity": int}].
+
+        Lots held at a depot also have a "depot" key.
+        """
+        actual_key = self._get_actual_key(item)
+        lots = []
+        for lot in sorted(self._lots.get(actual_key, [])):
+            entry = {'expiry': None if lot[0] == NO_EXPIRY else lot[0], 'quantity': lot[2]}
+            if lot_depot(lot) is not None:
+                entry['depot'] = lot_depot(lot)
+            lots.append(entry)
+        return lots
+
+    def sweep_expired(self, as_of=None, discard: bool = False) -> List[Dict]:
+        """Flag lots that expired before as_of (default today).
+
+        Expired lots are never dispatched or counted by check_inventory, but stay on hand
+        until discarded. Returns [{"item", "expiry", "quantity"}] (plus "depot" for lots held
+        at a depot). With discard=True the
+        expired lots are also taken out of stock and recorded in the ledger under the
+        ledger.EXPIRED actor.
+        """
+        try:
+            from .ledger import EXPIRED
+        except ImportError:
+            from ledger import EXPIRED
+        flagged = []
+        ledger = self.ledger if discard else None
+        for item in list(self.supplies):
+            heap = self._lots.get(item, [])
+            lots = pop_expired(heap, as_of) if discard else expired_lots(heap, as_of)
+            for lot in lots:
+                entry = {'item': item, 'expiry': lot[0], 'quantity': lot[2]}
+                if lot_depot(lot) is not None:
+                    entry['depot'] = lot_depot(lot)
+                flagged.append(entry)
+                if discard:
+                    ledger.record(item, -lot[2], actor=EXPIRED, depot=lot_depot(lot))
+            if discard and lots:
+                self.supplies[item] -= sum(lot[2] for lot in lots)
+                if not self.supplies[item]:
+                    del self.supplies[item]
+                    del self._lots[item]
+        if discard and flagged:
+            self._save('supplies', 'ledger')
+        return flagged
+
+    @property
+    def forecaster(self):
+        """DemandForecaster over the persisted demand segment."""
+        if self._forecaster is None:
+            try:
+                from .forecast import DemandForecaster
+            except ImportError:
+                from forecast import DemandForecaster
+            self._ensure_loaded('demand')
+            self._forecaster = DemandForecaster(self._demand)
+        return self._forecaster
+
+    def days_of_stock(self) -> Dict[str, Optional[float]]:
+        """Projected days until each item's unexpired stock runs out (None if it has no recent demand)."""
+        return {item: self.forecaster.days_remaining(item, self.check_inventory(item)) for item in self.supplies}
+
     # Requester/report API
     def add_requester(self, name: str):
         name = name.strip()
@@ -106,30 +422,129 @@ class Storage:
             return
         if name not in self.requesters:
             self.requesters.append(name)
-            self._save()
+            self._save('requesters')
+
+    def _duplicate_index(self):
+        """Near-duplicate index over recent reports, built on first use."""
+        if self._duplicates is None:
+            try:
+                from .dedup import DuplicateIndex
+            except ImportError:
+                from dedup import DuplicateIndex
+            index = DuplicateIndex()
+            since = datetime.utcnow() - timedelta(seconds=index.window_seconds)
+            for report in self.iter_reports(since=since.isoformat() + 'Z'):
+                index.add(report)
+            self._duplicates = index
+        return self._duplicates
+
+    def _ensure_incidents(self) -> Dict[str, Dict]:
+        self._ensure_loaded('incidents')
+        return self._incidents
+
+    def get_incident(self, report_id: str) -> Optional[Dict]:
+        """Duplicates linked to a report, or None if it has none."""
+        return self._ensure_incidents().get(report_id)
+
+    def add_report(self, name: str, disaster_type: str, details: str, dedupe: bool = True) -> Dict:
+        """Record a report and return it.
 
-    def add_report(self, name: str, disaster_type: str, details: str):
+        If dedupe is set and the report is a near-duplicate of a recent report (same type,
+        similar details, close in time and place), it is linked to that report's incident
+        with its own details instead of being stored; the returned dict then has
+        'duplicate_of' set to that report's id.
+        """
         report = {
+            'id': os.urandom(6).hex(),
             'name': name,
             'disaster_type': disaster_type,
+            'type_code': type_code(disaster_type),
             'details': details,
             'timestamp': datetime.utcnow().isoformat() + 'Z',
         }
-        self.reports.append(report)
+        if dedupe and report['type_code'] != TYPE_CODES[MENTAL_SUPPORT]:
+            duplicates = self._duplicate_index()
+            canonical_id = duplicates.find_duplicate(report)
+            if canonical_id is not None:
+                incident = self._ensure_incidents().setdefault(canonical_id, {'count': 0, 'reporters': [], 'reports': []})
+                incident['count'] += 1
+                if name not in incident['reporters']:
+                    incident['reporters'].append(name)
+                incident['reports'].append({'name': name, 'timestamp': report['timestamp'], 'details': details})
+                self.add_requester(name)
+                self._save('incidents')
+                return dict(report, duplicate_of=canonical_id)
+            duplicates.add(report)
+        if 'reports' in self._loaded:
+            self._reports.append(report)
+        if self._persistence_file:
+            self._report_buffer.append(report)
         # also ensure requester is recorded
         self.add_requester(name)
-        self._save()
+        self._save('reports')
+        return report
+
+    def iter_reports(self, since: TimeBound = None, until: TimeBound = None,
+                     disaster_type: Optional[str] = None) -> Iterator[Dict]:
+        """Stream reports, optionally filtered by timestamp range and disaster type.
+
+        disaster_type is normalized, so 'Flooding' and 'flood' select the same reports.
+
+        Persisted reports are read line by line, so memory use does not grow with the archive.
+        """
+        if 'reports' in self._loaded:
+            source = iter(self._reports)
+        else:
+            self._flush_reports()
+            source = iter_jsonl(self._reports_file())
+        return filter_reports(source, since=since, until=until, disaster_type=disaster_type)
 
     def get_reports(self) -> List[Dict]:
-        return list(self.reports)
+        return list(self.iter_reports())
+
+    def report_count(self) -> int:
+        return sum(1 for _ in self.iter_reports())
+
+    def export_reports(self, dest: str, since: TimeBound = None, until: TimeBound = None,
+                       disaster_type: Optional[str] = None) -> int:
+        """Write matching reports to dest as JSON Lines and return how many were exported."""
+        dirpath = os.path.dirname(dest)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        return write_jsonl(dest, self.iter_reports(since=since, until=until, disaster_type=disaster_type))
 
     def delete_report(self, index: int) -> bool:
         """Delete a report by its index (1-based). Returns True if successful."""
-        if 1 <= index <= len(self.reports):
-            del self.reports[index - 1]
-            self._save()
-            return True
-        return False
+        if index < 1:
+            return False
+        removed = []
+        if not self._persistence_file:
+            if index <= len(self._reports):
+                removed.append(self._reports.pop(index - 1))
+        else:
+            self._flush_reports()
+            path = self._reports_file()
+
+            def kept():
+                for i, report in enumerate(iter_jsonl(path), start=1):
+                    if i == index:
+                        removed.append(report)
+                        continue
+                    yield report
+
+            try:
+                write_jsonl(path, kept())
+            except Exception:
+                return False
+            if removed and 'reports' in self._loaded:
+                del self._reports[index - 1]
+        if not removed:
+            return False
+        # The deleted report can no longer absorb duplicates
+        self._duplicates = None
+        if self._ensure_incidents().pop(removed[0].get('id'), None) is not None:
+            self._save('incidents')
+        return True
 
     def get_supplies(self) -> Dict[str, int]:
         """Get a copy of the current supplies inventory."""
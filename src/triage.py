@@ -0,0 +1,327 @@
+"""Priority triage of pending aid requests.
+
+A request's score is the sum of a disaster-type weight, an item weight (medical first),
+a distance adjustment for the nearest station and an aging bonus that grows linearly
+while it waits, so low-priority requests are not starved. Requests and stations are
+located by (lat, lon) and distances are in km. The distance adjustment is zero for
+requests without a location and at most half of distance_range either way for located
+ones; distance_range is below the smallest step between weights, so distance only orders
+requests of equal need and severity and giving an address never drops a request below
+a less urgent one. Because every request ages at the
+same rate, ranking by score at any time t is the same as ranking by
+base - aging_rate * enqueued_at, which never changes while a request waits. Requests
+are therefore kept in an indexed heap under that static key, and only an explicit
+re-prioritization (e.g. a new location) costs an O(log n) update.
+
+With a persistence file, queued requests survive restarts, so each interactive session
+competes with the requests still waiting from earlier ones.
+"""
+import itertools
+import json
+import os
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from .disaster_types import normalize_disaster_type
+    from .dedup import haversine_km
+except ImportError:
+    from disaster_types import normalize_disaster_type
+    from dedup import haversine_km
+
+DISASTER_WEIGHTS = {
+    'earthquake': 3.0,
+    'tsunami': 3.0,
+    'fire': 2.5,
+    'hurricane': 2.5,
+    'tornado': 2.5,
+    'flood': 2.0,
+    'storm': 1.5,
+    'other': 1.0,
+    'mental_support': 0.0,
+}
+ITEM_WEIGHTS = {
+    'medical': 5.0,
+    'water': 3.0,
+    'food': 2.0,
+    'blankets': 1.0,
+}
+DEFAULT_ITEM_WEIGHT = 1.0
+
+
+class IndexedHeap:
+    def __init__(self):
+        """Min-heap of (key, id) with an id -> position index for O(log n) update and removal."""
+        self._heap: List[List] = []  # [key, seq, id]
+        self._pos: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self._pos
+
+    def key(self, item_id):
+        return self._heap[self._pos[item_id]][0]
+
+    def _swap(self, i: int, j: int):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][2]] = i
+        self._pos[heap[j][2]] = j
+
+    def _less(self, i: int, j: int) -> bool:
+        return self._heap[i][:2] < self._heap[j][:2]
+
+    def _sift_up(self, i: int):
+        while i > 0:
+            parent = (i - 1) // 2
+            if not self._less(i, parent):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        n = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._less(child, smallest):
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def push(self, item_id, key):
+        if item_id in self._pos:
+            raise ValueError(f"{item_id!r} is already queued")
+        self._heap.append([key, next(self._seq), item_id])
+        self._pos[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, item_id, key):
+        """Change the key of a queued item."""
+        i = self._pos[item_id]
+        old = self._heap[i][0]
+        self._heap[i][0] = key
+        if key < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, item_id):
+        i = self._pos.pop(item_id)
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[2]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[2]])
+
+    def peek(self) -> Tuple:
+        if not self._heap:
+            raise IndexError("peek from an empty heap")
+        key, _, item_id = self._heap[0]
+        return item_id, key
+
+    def pop(self) -> Tuple:
+        item_id, key = self.peek()
+        self.remove(item_id)
+        return item_id, key
+
+
+class TriageQueue:
+    def __init__(self, help_stations=None, aging_per_minute: float = 0.1, distance_scale_km: float = 50.0,
+                 distance_range: float = 0.4, clock: Callable[[], float] = time.time, rationer=None,
+                 persistence_file: Optional[str] = None):
+        """Queue of aid requests served highest score first.
+
+        aging_per_minute is the score a request gains per minute of waiting.
+        distance_range is the score gap between a request at a station and one
+        distance_scale_km or more from the nearest station; unlocated requests sit halfway.
+        With a rationing.Rationer, queued requests are its pending demand and each
+        dispatch is capped at the request's fair share of the stock.
+        If persistence_file is given, queued requests are kept there as a JSON list.
+        """
+        self.help_stations = help_stations
+        self.rationer = rationer
+        self.aging_per_minute = aging_per_minute
+        self.distance_scale_km = distance_scale_km
+        self.distance_range = distance_range
+        self.clock = clock
+        self.requests: Dict[int, Dict] = {}
+        self._heap = IndexedHeap()
+        self._ids = itertools.count(1)
+        self._persistence_file = persistence_file
+        if self._persistence_file:
+            dirpath = os.path.dirname(self._persistence_file)
+            if dirpath:
+                os.makedirs(dirpath, exist_ok=True)
+            self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self._persistence_file):
+                with open(self._persistence_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for request in data if isinstance(data, list) else []:
+                    if request.get('location') is not None:
+                        request['location'] = tuple(request['location'])
+                    # Rescored so saved queues follow the current stations and weights
+                    request['base_score'] = self._base_score(request)
+                    self.requests[request['id']] = request
+                    self._heap.push(request['id'], self._key(request))
+                    self._track(request)
+        except Exception:
+            self.requests, self._heap = {}, IndexedHeap()
+        self._ids = itertools.count(max(self.requests, default=0) + 1)
+
+    def _save(self):
+        if not self._persistence_file:
+            return
+        try:
+            with open(self._persistence_file, 'w', encoding='utf-8') as f:
+                json.dump(self.ranked(), f, indent=2)
+        except Exception:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _base_score(self, request: Dict) -> float:
+        score = DISASTER_WEIGHTS.get(normalize_disaster_type(request.get('disaster_type') or ''), 1.0)
+        score += ITEM_WEIGHTS.get(request['item'], DEFAULT_ITEM_WEIGHT)
+        return score + self._distance_adjustment(request.get('location'))
+
+    def _distance_adjustment(self, location: Optional[Tuple[float, float]]) -> float:
+        if location is None or self.help_stations is None:
+            return 0.0
+        nearest = next(self.help_stations.nearest(location), None)
+        if nearest is None:
+            return 0.0
+        lat, lon = self.help_stations.get_locations()[nearest[1]]
+        distance = haversine_km(float(location[0]), float(location[1]), lat, lon)
+        return self.distance_range * (0.5 - min(distance / self.distance_scale_km, 1.0))
+
+    def _key(self, request: Dict) -> float:
+        # Lower key = served first; see the module docstring for why this never changes
+        aging_per_second = self.aging_per_minute / 60.0
+        return -(request['base_score'] - aging_per_second * request['enqueued_at'])
+
+    def submit(self, name: str, item: str, quantity: int = 1, disaster_type: str = '',
+               location: Optional[Tuple[float, float]] = None, household: int = 1) -> int:
+        """Queue a request and return its id; household is its weight when rationing."""
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        request_id = next(self._ids)
+        request = {
+            'id': request_id,
+            'name': name,
+            'item': item.strip().lower(),
+            'quantity': int(quantity),
+            'disaster_type': disaster_type,
+            'location': location,
+            'household': max(int(household), 1),
+            'enqueued_at': self.clock(),
+        }
+        request['base_score'] = self._base_score(request)
+        self.requests[request_id] = request
+        self._heap.push(request_id, self._key(request))
+        self._track(request)
+        self._save()
+        return request_id
+
+    def _track(self, request: Dict):
+        if self.rationer is not None:
+            self.rationer.set_demand(request['item'], request['id'], request['quantity'], request['household'])
+
+    def _untrack(self, request: Dict):
+        if self.rationer is not None:
+            self.rationer.remove(request['item'], request['id'])
+
+    def score(self, request_id: int, now: Optional[float] = None) -> float:
+        """Current score of a queued request, aging included."""
+        request = self.requests[request_id]
+        waited = (self.clock() if now is None else now) - request['enqueued_at']
+        return request['base_score'] + self.aging_per_minute * waited / 60.0
+
+    def reprioritize(self, request_id: int, **changes) -> float:
+        """Update fields of a queued request (e.g. location, item) and re-rank it."""
+        request = self.requests[request_id]
+        self._untrack(request)
+        request.update({k: v for k, v in changes.items()
+                        if k in ('item', 'quantity', 'disaster_type', 'location', 'household')})
+        request['item'] = request['item'].strip().lower()
+        request['base_score'] = self._base_score(request)
+        self._heap.update(request_id, self._key(request))
+        self._track(request)
+        self._save()
+        return request['base_score']
+
+    def cancel(self, request_id: int) -> bool:
+        if request_id not in self._heap:
+            return False
+        self._heap.remove(request_id)
+        self._untrack(self.requests.pop(request_id))
+        self._save()
+        return True
+
+    def pop(self) -> Dict:
+        """Remove and return the most urgent request."""
+        request = self._pop()
+        self._save()
+        return request
+
+    def _pop(self) -> Dict:
+        request_id, _ = self._heap.pop()
+        request = self.requests.pop(request_id)
+        self._untrack(request)
+        return request
+
+    def ranked(self) -> List[Dict]:
+        """Queued requests, most urgent first (does not modify the queue)."""
+        return sorted(self.requests.values(), key=self._key)
+
+    def dispatch(self, storage, trucks) -> List[Tuple[Dict, str]]:
+        """Send available trucks to the most urgent requests that storage can fill.
+
+        Requests whose item is out of stock stay queued (they keep aging) and are skipped.
+        When rationing, a request is sent its fair share if that is less than it asked for;
+        request['sent'] records the quantity dispatched.
+        Returns [(request, truck)] in dispatch order.
+        """
+        dispatched = []
+        skipped = []
+        while self._heap:
+            truck = next((name for name, available in trucks.trucks.items() if available), None)
+            if truck is None:
+                break
+            request = self.requests[self._heap.peek()[0]]
+            quantity = request['quantity']
+            if self.rationer is not None:
+                # Share computed while the request still counts as pending demand
+                quantity = min(quantity, self.rationer.allocation(request['item'], request['id']))
+            self._pop()
+            if quantity <= 0 or storage.check_inventory(request['item']) < quantity:
+                skipped.append(request)
+                continue
+            storage.remove_supplies(request['item'], quantity, actor=request['name'], truck=truck)
+            request['sent'] = quantity
+            trucks.dispatch_truck(truck)
+            dispatched.append((request, truck))
+        for request in skipped:
+            self.requests[request['id']] = request
+            self._heap.push(request['id'], self._key(request))
+            self._track(request)
+        if dispatched:
+            self._save()
+        return dispatched
+
+    def position(self, request_id: int) -> Optional[int]:
+        """1-based place of a queued request in serving order, or None if it is not queued."""
+        if request_id not in self.requests:
+            return None
+        key = self._key(self.requests[request_id])
+        return 1 + sum(1 for other in self.requests.values() if self._key(other) < key)
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import unittest
+from src.batch import BatchRunner, parse_record, read_operations
+from src.storage import Storage
+from src.trucks import Truck
+from src.help_stations import HelpStation
+from src.depots import DepotNetwork
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = Storage(os.path.join(self.tmpdir.name, 'storage.json'))
+        self.trucks = Truck()
+        self.trucks.add_truck("Truck 1")
+        self.stations = HelpStation(os.path.join(self.tmpdir.name, 'stations.json'))
+        self.runner = BatchRunner(self.storage, self.trucks, self.stations)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_run_applies_operations_and_summarises(self):
+        summary = self.runner.run([
+            {'op': 'add_supplies', 'item': 'water', 'quantity': 50},
+            {'op': 'request_aid', 'name': 'Ann', 'item': 'water', 'quantity': 20},
+            {'op': 'request_aid', 'name': 'Bob', 'item': 'water', 'quantity': 5},
+            {'op': 'add_station', 'name': 'Depot', 'lat': 1, 'lon': 2},
+        ])
+        self.assertEqual(self.storage.check_inventory('water'), 30)
+        self.assertEqual(summary['ok'], 3)
+        # Only one truck, so the second request cannot be dispatched
+        self.assertEqual(summary['by_op']['request_aid'], {'ok': 1, 'failed': 1})
+        self.assertIn('Depot', self.stations.list_stations())
+
+    def test_depot_operations(self):
+        self.runner.depots = DepotNetwork(self.stations, self.storage)
+        summary = self.runner.run([
+            {'op': 'add_station', 'name': 'Depot A', 'lat': 0, 'lon': 0},
+            {'op': 'add_station', 'name': 'Depot B', 'lat': 5, 'lon': 5},
+            {'op': 'stock_depot', 'depot': 'Depot A', 'item': 'food', 'quantity': 10},
+            {'op': 'stock_depot', 'depot': 'Depot B', 'item': 'food', 'quantity': 10},
+            {'op': 'depot_request', 'name': 'Ann', 'item': 'food', 'quantity': 15, 'lat': 4, 'lon': 4},
+        ])
+        self.assertEqual(summary['ok'], 5)
+        self.assertEqual(self.runner.depots.stock('Depot A', 'food'), 5)
+        self.assertEqual(self.runner.depots.stock('Depot B', 'food'), 0)
+        self.assertEqual(self.storage.check_inventory('food'), 5)
+
+    def test_queued_requests_are_dispatched_by_priority(self):
+        summary = self.runner.run([
+            {'op': 'add_supplies', 'item': 'food', 'quantity': 10},
+            {'op': 'add_supplies', 'item': 'medical', 'quantity': 1},
+            {'op': 'queue_request', 'name': 'Ann', 'item': 'food', 'quantity': 2},
+            {'op': 'queue_request', 'name': 'Bob', 'item': 'medical', 'disaster_type': 'earthquake'},
+            {'op': 'dispatch_queue'},
+        ])
+        self.assertEqual(summary['failed'], 0)
+        # The single truck goes to the medical request
+        self.assertEqual(self.storage.check_inventory('medical'), 0)
+        self.assertEqual(self.storage.check_inventory('food'), 10)
+
+    def test_run_persists_once_at_end(self):
+        self.runner.run([{'op': 'add_supplies', 'item': 'food', 'quantity': 5}] * 3)
+        reloaded = Storage(os.path.join(self.tmpdir.name, 'storage.json'))
+        self.assertEqual(reloaded.check_inventory('food'), 15)
+
+    def test_unknown_and_incomplete_operations_fail(self):
+        summary = self.runner.run([{'op': 'launch'}, {'op': 'add_supplies'}])
+        self.assertEqual(summary['failed'], 2)
+        self.assertEqual(len(summary['errors']), 2)
+
+    def test_read_operations_csv_and_jsonl(self):
+        csv_path = os.path.join(self.tmpdir.name, 'ops.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write("op,item,quantity,name\nadd_supplies,food,5,\n")
+        self.assertEqual(list(read_operations(csv_path)), [{'op': 'add_supplies', 'item': 'food', 'quantity': '5'}])
+        jsonl_path = os.path.join(self.tmpdir.name, 'ops.jsonl')
+        with open(jsonl_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'op': 'add_requester', 'name': 'Ann'}) + "\n\n")
+        self.assertEqual([parse_record(r) for r in read_operations(jsonl_path)], [{'op': 'add_requester', 'name': 'Ann'}])
+
+    def test_malformed_lines_fail_only_their_record(self):
+        path = os.path.join(self.tmpdir.name, 'ops.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'op': 'add_supplies', 'item': 'food', 'quantity': 5}) + "\n")
+            f.write("{bad json\n[1, 2]\n\"text\"\n")
+            f.write(json.dumps({'op': 'add_supplies', 'item': 'food', 'quantity': 3}) + "\n")
+        summary = self.runner.run(read_operations(path))
+        self.assertEqual((summary['total'], summary['ok'], summary['failed']), (5, 2, 3))
+        self.assertEqual(summary['by_op']['<invalid>'], {'ok': 0, 'failed': 3})
+        self.assertEqual(self.storage.check_inventory('food'), 8)
+
+    def test_wrongly_typed_fields_fail_only_their_record(self):
+        path = os.path.join(self.tmpdir.name, 'ops.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'op': 'add_supplies', 'item': 5, 'quantity': 5}) + "\n")
+            f.write(json.dumps({'op': 'request_aid', 'name': 'Ann', 'item': ['food'], 'quantity': 1}) + "\n")
+            f.write(json.dumps({'op': 'request_aid', 'name': 'Bob', 'item': None}) + "\n")
+            f.write(json.dumps({'op': 'add_supplies', 'item': 'food', 'quantity': 3, 'actor': None}) + "\n")
+        summary = self.runner.run(read_operations(path))
+        self.assertEqual((summary['total'], summary['ok'], summary['failed']), (4, 1, 3))
+        self.assertEqual(summary['by_op']['<invalid>'], {'ok': 0, 'failed': 2})
+        self.assertIn("missing field 'item'", summary['errors'][2])
+        self.assertEqual(self.storage.check_inventory('food'), 3)
+
+if __name__ == '__main__':
+    unittest.main()
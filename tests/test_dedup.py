@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from src.dedup import DuplicateIndex, shingles
+from src.storage import Storage
+
+ELMIRA = ' | location_resolved: Elmira | lat:43.5997 lon:-80.5706'
+OTTAWA = ' | location_resolved: Ottawa | lat:45.4215 lon:-75.6972'
+
+
+def report(report_id, details, timestamp='2025-11-09T10:00:00Z', type_code=4):
+    return {'id': report_id, 'details': details, 'timestamp': timestamp, 'type_code': type_code}
+
+
+class TestDuplicateIndex(unittest.TestCase):
+    def test_shingles_ignore_case_punctuation_and_repeats(self):
+        self.assertEqual(shingles('Water RISING!!'), shingles('water rising'))
+        self.assertEqual(shingles('sooooo high'), shingles('soo high'))
+
+    def test_near_duplicate_is_found(self):
+        index = DuplicateIndex()
+        index.add(report('a', 'River flooding Main Street, water rising fast' + ELMIRA))
+        index.add(report('b', 'Tree fell on car' + ELMIRA))
+        found = index.find_duplicate(report('c', 'river flooding main st - water rising fast!!' + ELMIRA,
+                                            timestamp='2025-11-09T10:20:00Z'))
+        self.assertEqual(found, 'a')
+        self.assertIsNone(index.find_duplicate(report('d', 'Gas leak reported downtown' + ELMIRA)))
+
+    def test_time_place_and_type_must_match(self):
+        index = DuplicateIndex(window_seconds=3600)
+        index.add(report('a', 'River flooding Main Street, water rising fast' + ELMIRA))
+        text = 'River flooding Main Street, water rising fast'
+        self.assertIsNone(index.find_duplicate(report('b', text + OTTAWA)))
+        self.assertIsNone(index.find_duplicate(report('c', text + ELMIRA, type_code=2)))
+        self.assertIsNone(index.find_duplicate(report('d', text + ELMIRA, timestamp='2025-11-09T12:00:00Z')))
+        # Expired entries are dropped from the index
+        self.assertEqual(len(index), 0)
+
+    def test_short_unlocated_and_other_type_reports_are_not_compared(self):
+        index = DuplicateIndex()
+        self.assertFalse(index.add(report('a', '' + ELMIRA)))
+        self.assertFalse(index.add(report('b', 'River flooding Main Street, water rising fast')))
+        index.add(report('c', 'River flooding Main Street, water rising fast' + ELMIRA))
+        text = 'River flooding Main Street, water rising fast'
+        self.assertIsNone(index.find_duplicate(report('d', '' + ELMIRA)))
+        self.assertIsNone(index.find_duplicate(report('e', text)))
+        self.assertIsNone(index.find_duplicate(report('f', text + ELMIRA, type_code=0)))
+
+
+class TestStorageDedup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'storage.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_duplicates_are_linked_not_stored(self):
+        storage = Storage(self.path)
+        first = storage.add_report('Ann', 'flood', 'River flooding Main Street, water rising fast' + ELMIRA)
+        second = storage.add_report('Bob', 'Flooding', 'river flooding main street water rising fast' + ELMIRA)
+        self.assertNotIn('duplicate_of', first)
+        self.assertEqual(second['duplicate_of'], first['id'])
+        self.assertIn('Bob', storage.requesters)
+        # Reloaded storage sees one report and the incident link
+        reloaded = Storage(self.path)
+        self.assertEqual(reloaded.report_count(), 1)
+        incident = reloaded.get_incident(first['id'])
+        self.assertEqual(incident['reporters'], ['Bob'])
+        self.assertTrue(incident['reports'][0]['details'].endswith(ELMIRA))
+        # The index is rebuilt from the report file
+        third = reloaded.add_report('Cy', 'flood', 'River flooding on Main Street, water rising fast' + ELMIRA)
+        self.assertEqual(third['duplicate_of'], first['id'])
+        self.assertEqual(Storage(self.path).get_incident(first['id'])['count'], 2)
+
+    def test_distinct_blank_reports_are_not_linked(self):
+        storage = Storage()
+        storage.add_report('Bob', 'earthquake', '')
+        self.assertNotIn('duplicate_of', storage.add_report('Cat', 'landslide', ''))
+        storage.add_report('Dee', 'fire', 'Smoke coming from the warehouse on King St' + ELMIRA)
+        self.assertNotIn('duplicate_of', storage.add_report('Eve', '', 'Smoke coming from the warehouse on King St' + ELMIRA))
+        self.assertEqual(storage.report_count(), 4)
+
+    def test_mental_support_and_opt_out_are_never_deduplicated(self):
+        storage = Storage()
+        for _ in range(2):
+            storage.add_report('Ann', 'mental_support', 'user: hi | response: hello')
+            storage.add_report('Bob', 'storm', 'hail', dedupe=False)
+        self.assertEqual(storage.report_count(), 4)
+
+    def test_deleting_report_drops_its_incident(self):
+        storage = Storage(self.path)
+        first = storage.add_report('Ann', 'fire', 'Smoke coming from the warehouse on King St' + ELMIRA)
+        storage.add_report('Bob', 'fire', 'smoke coming from warehouse on king street' + ELMIRA)
+        self.assertTrue(storage.delete_report(1))
+        self.assertIsNone(storage.get_incident(first['id']))
+        self.assertNotIn('duplicate_of', storage.add_report('Cy', 'fire', 'Smoke coming from the warehouse on King St' + ELMIRA))
+
+    def test_deleting_in_memory_report_drops_its_incident(self):
+        storage = Storage()
+        first = storage.add_report('Ann', 'fire', 'Smoke coming from the warehouse on King St' + ELMIRA)
+        storage.add_report('Bob', 'fire', 'smoke coming from warehouse on king street' + ELMIRA)
+        self.assertTrue(storage.delete_report(1))
+        self.assertIsNone(storage.get_incident(first['id']))
+        third = storage.add_report('Cy', 'fire', 'Smoke coming from the warehouse on King St' + ELMIRA)
+        self.assertNotIn('duplicate_of', third)
+        self.assertEqual([r['id'] for r in storage.get_reports()], [third['id']])
+        self.assertFalse(storage.delete_report(2))
+
+if __name__ == '__main__':
+    unittest.main()
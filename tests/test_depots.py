@@ -0,0 +1,65 @@
+import os
+import random
+import tempfile
+import unittest
+from src.depots import DepotNetwork
+from src.help_stations import HelpStation
+from src.storage import Storage
+
+
+class TestDepotNetwork(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.stations = HelpStation(os.path.join(self.tmpdir.name, 'stations.json'))
+        for name, location in (('North', (0, 10)), ('Centre', (0, 0)), ('East', (10, 0)), ('Far', (100, 100))):
+            self.stations.add_station(name, location)
+        self.path = os.path.join(self.tmpdir.name, 'storage.json')
+        self.storage = Storage(self.path)
+        self.depots = DepotNetwork(self.stations, self.storage)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_nearest_orders_stations_by_distance(self):
+        rng = random.Random(3)
+        for i in range(200):
+            self.stations.add_station(f"S{i}", (rng.uniform(-50, 50), rng.uniform(-50, 50)))
+        point = (3.5, -2.0)
+        expected = sorted((self.stations.calculate_distance(point, name), name) for name in self.stations.list_stations())
+        self.assertEqual(list(self.stations.nearest(point)), expected)
+        self.assertEqual(next(self.stations.nearest((500, 500)))[1], 'Far')
+
+    def test_request_is_split_across_nearest_depots(self):
+        self.depots.add_stock('Centre', 'Water', 30)
+        self.depots.add_stock('East', 'water', 50)
+        self.depots.add_stock('Far', 'water', 100)
+        self.assertEqual(self.depots.fulfil('water', 60, (8, 0), actor='Ann'), [('East', 50), ('Centre', 10)])
+        self.assertEqual(self.depots.stock('East', 'water'), 0)
+        self.assertEqual(self.depots.total('water'), 120)
+        with self.assertRaises(ValueError):
+            self.depots.fulfil('water', 500, (0, 0))
+        reloaded = Storage(self.path)
+        self.assertEqual(DepotNetwork(self.stations, reloaded).inventory, {'Centre': {'water': 20}, 'Far': {'water': 100}})
+
+    def test_depot_stock_is_storage_stock(self):
+        self.storage.add_supplies('food', 4)
+        self.depots.add_stock('Centre', 'food', 6)
+        self.depots.add_stock('East', 'food', 5, expiry='2020-01-01')
+        self.assertEqual(self.storage.check_inventory('food'), 10)
+        self.assertEqual(self.depots.total('food'), 6)
+        self.depots.fulfil('food', 6, (0, 0), actor='Ann', truck='Truck 1')
+        # Central stock is untouched; the ledger and forecaster saw the depot dispatch
+        self.assertEqual(self.storage.check_inventory('food', depot=None), 4)
+        self.assertEqual(self.storage.ledger.stock, {'food': 9})
+        self.assertEqual(self.storage.ledger.dispatch_totals(), {'food': 6})
+        self.assertEqual(list(self.storage.ledger.entries())[-1]['depot'], 'Centre')
+        self.assertGreater(self.storage.forecaster.daily_rate('food'), 0)
+        self.assertEqual(self.storage.sweep_expired(discard=True),
+                         [{'item': 'food', 'expiry': '2020-01-01', 'quantity': 5, 'depot': 'East'}])
+
+    def test_stock_requires_a_station(self):
+        with self.assertRaises(ValueError):
+            self.depots.add_stock('Nowhere', 'food', 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from src.companion_router import DISASTER_ADVICE
+from src.disaster_types import (CANONICAL_TYPES, MENTAL_SUPPORT, OTHER, TYPE_CODES, edit_distance,
+                                normalize_disaster_type, type_code, type_name)
+from src.storage import Storage
+
+
+class TestDisasterTypes(unittest.TestCase):
+    def test_canonical_types_match_companion_keywords(self):
+        self.assertEqual(set(CANONICAL_TYPES), set(DISASTER_ADVICE))
+
+    def test_normalize_free_text(self):
+        cases = {
+            'Flood': 'flood',
+            'huricane': 'hurricane',
+            'tsunami': 'tsunami',
+            'flash flooding': 'flood',
+            'Wild fire': 'fire',
+            'earthqake': 'earthquake',
+            'typhoon': 'hurricane',
+            'mental_support': MENTAL_SUPPORT,
+            'alien invasion': OTHER,
+            '': OTHER,
+        }
+        for text, expected in cases.items():
+            self.assertEqual(normalize_disaster_type(text), expected, text)
+
+    def test_codes_round_trip(self):
+        self.assertEqual(type_name(type_code('Tornado')), 'tornado')
+        self.assertEqual(type_code('landslide'), TYPE_CODES[OTHER])
+        self.assertEqual(type_name(99), OTHER)
+
+    def test_edit_distance_stops_past_limit(self):
+        self.assertEqual(edit_distance('flood', 'flod', 2), 1)
+        self.assertEqual(edit_distance('flood', 'hurricane', 2), 3)
+
+    def test_add_report_stores_type_code_and_filters_by_it(self):
+        storage = Storage()
+        storage.add_report('Ann', 'Flooding', 'basement under water')
+        storage.add_report('Bob', 'huricane', 'wind')
+        storage.add_report('Cy', 'landslide', 'mud')
+        self.assertEqual(storage.get_reports()[0]['type_code'], TYPE_CODES['flood'])
+        self.assertEqual([r['name'] for r in storage.iter_reports(disaster_type='flood')], ['Ann'])
+        self.assertEqual([r['name'] for r in storage.iter_reports(disaster_type='Hurricane')], ['Bob'])
+        self.assertEqual([r['name'] for r in storage.iter_reports(disaster_type='landslide')], ['Cy'])
+
+if __name__ == '__main__':
+    unittest.main()
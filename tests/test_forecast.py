@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from src.forecast import DemandForecaster, DAY_SECONDS
+from src.storage import Storage
+
+
+class TestDemandForecaster(unittest.TestCase):
+    def test_rate_is_smoothed_over_closed_days(self):
+        forecaster = DemandForecaster(alpha=0.5)
+        forecaster.record('Water', 10, when=0)
+        forecaster.record('water', 10, when=3600)
+        forecaster.record('water', 40, when=DAY_SECONDS)
+        # Day 0 closed at 20; day 1 is still open with 40 so far
+        self.assertEqual(forecaster.daily_rate('water', when=DAY_SECONDS + 60), 40)
+        # Once day 1 closes: 0.5 * 40 + 0.5 * 20
+        self.assertEqual(forecaster.daily_rate('WATER', when=2 * DAY_SECONDS), 30)
+        self.assertEqual(forecaster.days_remaining('water', 90, when=2 * DAY_SECONDS), 3)
+
+    def test_idle_days_decay_the_rate(self):
+        forecaster = DemandForecaster(alpha=0.5)
+        forecaster.record('food', 8, when=0)
+        # Day 0 closes at 8, then two empty days halve it twice
+        self.assertEqual(forecaster.daily_rate('food', when=3 * DAY_SECONDS), 2)
+        forecaster.record('food', 4, when=3 * DAY_SECONDS)
+        self.assertEqual(forecaster.state['food']['level'], 2)
+        self.assertIsNone(forecaster.days_remaining('blankets', 10))
+
+
+class TestStorageForecast(unittest.TestCase):
+    def test_removals_are_forecast_and_persisted(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'storage.json')
+            storage = Storage(path)
+            storage.add_supplies('water', 100)
+            storage.add_supplies('food', 10)
+            storage.remove_supplies('Water', 20)
+            self.assertEqual(storage.days_of_stock(), {'water': 4.0, 'food': None})
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, 'storage.demand.json')))
+            self.assertEqual(Storage(path).days_of_stock()['water'], 4.0)
+
+    def test_expired_lots_are_not_counted_as_stock(self):
+        storage = Storage()
+        storage.add_supplies('water', 100)
+        storage.add_supplies('water', 50, expiry='2000-01-01')
+        storage.remove_supplies('water', 20)
+        # 80 unexpired units at 20 a day; the expired 50 are still on hand but not usable
+        self.assertEqual(storage.days_of_stock(), {'water': 4.0})
+
+if __name__ == '__main__':
+    unittest.main()
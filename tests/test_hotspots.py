@@ -0,0 +1,41 @@
+import unittest
+from src.hotspots import HotspotIndex, hotspots_from_storage
+from src.storage import Storage
+
+
+class TestHotspots(unittest.TestCase):
+    def test_dense_cells_form_clusters_and_sparse_points_are_noise(self):
+        index = HotspotIndex(eps_km=1.0, min_reports=3)
+        for i in range(5):
+            index.add(43.4640 + i * 0.001, -80.5200, 'flood')
+        index.add(43.4650, -80.5200, 'fire')
+        for i in range(3):
+            index.add(45.4200, -75.6900 + i * 0.0005, 'fire')
+        index.add(10.0, 10.0, 'storm')  # isolated: noise
+        clusters = index.clusters()
+        self.assertEqual([c['size'] for c in clusters], [6, 3])
+        self.assertEqual(clusters[0]['dominant_type'], 'flood')
+        self.assertAlmostEqual(clusters[1]['lat'], 45.42, places=3)
+
+    def test_clusters_update_as_reports_arrive(self):
+        index = HotspotIndex(eps_km=1.0, min_reports=2)
+        index.add(0.0, 0.0)
+        self.assertEqual(index.clusters(), [])
+        index.add(0.0, 0.001)
+        self.assertEqual(index.clusters()[0]['size'], 2)
+        # A dense cell next to the existing one merges into the same cluster
+        index.add(0.0, 0.0095)
+        index.add(0.0, 0.0096)
+        self.assertEqual([c['size'] for c in index.clusters()], [4])
+
+    def test_hotspots_from_storage_uses_geocoded_details(self):
+        storage = Storage()
+        for name, details in (('Ann', 'water rising'), ('Bob', 'basement flooded')):
+            storage.add_report(name, 'Flood', f'{details} | location_resolved: Elmira | lat:43.5997 lon:-80.5706')
+        storage.add_report('Cy', 'fire', 'no address')
+        index = hotspots_from_storage(storage, eps_km=1.0, min_reports=2)
+        self.assertEqual(index.located, 2)
+        self.assertEqual(index.clusters()[0]['dominant_type'], 'flood')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from src.ledger import InventoryLedger, OPENING
+from src.storage import Storage
+
+
+class TestInventoryLedger(unittest.TestCase):
+    def _fill(self, ledger):
+        # One entry per minute from 10:00: +100 water, then alternating dispatches
+        ledger.record('water', 100, actor='gov', when='2025-11-09T10:00:00Z')
+        for minute in range(1, 10):
+            ledger.record('water', -5, actor='ann', truck='Truck 1', when=f'2025-11-09T10:{minute:02d}:00Z')
+
+    def test_stock_at_and_dispatch_totals(self):
+        ledger = InventoryLedger(checkpoint_every=3)
+        self._fill(ledger)
+        self.assertEqual(ledger.stock_at('2025-11-09T09:59:00Z'), {})
+        self.assertEqual(ledger.stock_at('2025-11-09T10:04:00Z'), {'water': 80})
+        self.assertEqual(ledger.stock_at('2025-11-09T10:04:30Z'), {'water': 80})
+        self.assertEqual(ledger.stock, {'water': 55})
+        self.assertEqual(ledger.dispatch_totals('2025-11-09T10:02:00Z', '2025-11-09T10:06:00Z'), {'water': 20})
+        self.assertEqual(ledger.dispatch_totals(), {'water': 45})
+        self.assertEqual(len(ledger._checkpoints), 3)
+
+    def test_file_ledger_reloads_from_last_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'ledger.jsonl')
+            ledger = InventoryLedger(path, checkpoint_every=4)
+            self._fill(ledger)
+            ledger.flush()
+            reloaded = InventoryLedger(path, checkpoint_every=4)
+            self.assertEqual((reloaded.stock, reloaded.count), ({'water': 55}, 10))
+            self.assertEqual(reloaded.stock_at('2025-11-09T10:05:00Z'), {'water': 75})
+            entries = list(reloaded.entries())
+            self.assertEqual(entries[1]['truck'], 'Truck 1')
+            self.assertEqual(len(entries), 10)
+
+
+class TestStorageLedger(unittest.TestCase):
+    def test_existing_stock_becomes_opening_balance(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'storage.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('{"supplies": {"food": 50}}')
+            storage = Storage(path)
+            storage.remove_supplies('Food', 10, actor='ann', truck='Truck 2')
+            storage.add_supplies('water', 5, actor='gov')
+            entries = list(Storage(path).ledger.entries())
+            self.assertEqual([(e['item'], e['delta'], e['actor']) for e in entries],
+                             [('food', 50, OPENING), ('food', -10, 'ann'), ('water', 5, 'gov')])
+            self.assertEqual(Storage(path).ledger.dispatch_totals(), {'food': 10})
+
+if __name__ == '__main__':
+    unittest.main()
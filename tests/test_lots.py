@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from src.lots import push_lot, take_fefo, expired_lots, pop_expired, NO_EXPIRY
+from src.storage import Storage
+
+
+class TestLotHeap(unittest.TestCase):
+    def test_fefo_and_expiry(self):
+        heap = []
+        for seq, (expiry, qty) in enumerate([('2025-03-01', 5), (None, 10), ('2025-01-15', 3), ('2025-02-01', 4)]):
+            push_lot(heap, expiry, seq, qty)
+        self.assertEqual(take_fefo(heap, 5), [('2025-01-15', 3), ('2025-02-01', 2)])
+        self.assertEqual([lot[0] for lot in expired_lots(heap, '2025-03-02')], ['2025-02-01', '2025-03-01'])
+        self.assertEqual(len(heap), 3)
+        self.assertEqual([lot[2] for lot in pop_expired(heap, '2025-03-02')], [2, 5])
+        self.assertEqual(heap, [[NO_EXPIRY, 1, 10]])
+
+    def test_fefo_skips_lots_expired_before_as_of(self):
+        heap = []
+        push_lot(heap, '2020-01-01', 1, 5)
+        push_lot(heap, '2030-01-01', 2, 5)
+        self.assertEqual(take_fefo(heap, 3, as_of='2025-01-01'), [('2030-01-01', 3)])
+        self.assertEqual(sorted(heap), [['2020-01-01', 1, 5], ['2030-01-01', 2, 2]])
+
+    def test_invalid_expiry(self):
+        with self.assertRaises(ValueError):
+            push_lot([], 'next tuesday', 1, 1)
+
+
+class TestStorageLots(unittest.TestCase):
+    def test_remove_takes_first_expiring_and_lots_persist(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'storage.json')
+            storage = Storage(path)
+            storage.add_supplies('water', 10)
+            storage.add_supplies('Water', 6, expiry='2030-06-01')
+            storage.add_supplies('water', 4, expiry='2030-01-01')
+            storage.remove_supplies('water', 7)
+            self.assertEqual(storage.check_inventory('water'), 13)
+            expected = [{'expiry': '2030-06-01', 'quantity': 3}, {'expiry': None, 'quantity': 10}]
+            self.assertEqual(storage.get_lots('water'), expected)
+            self.assertEqual(Storage(path).get_lots('WATER'), expected)
+
+    def test_sweep_flags_and_discards_expired_lots(self):
+        storage = Storage()
+        storage.add_supplies('food', 5, expiry='2025-01-01')
+        storage.add_supplies('food', 2, expiry='2025-12-01')
+        storage.add_supplies('medical', 1, expiry='2024-06-01')
+        flagged = storage.sweep_expired(as_of='2025-06-01')
+        self.assertEqual(sorted((f['item'], f['quantity']) for f in flagged), [('food', 5), ('medical', 1)])
+        self.assertEqual(storage.get_supplies()['food'], 7)
+        storage.sweep_expired(as_of='2025-06-01', discard=True)
+        self.assertEqual(storage.get_supplies(), {'food': 2})
+        self.assertEqual(storage.ledger.dispatch_totals(), {})
+        self.assertEqual([e['actor'] for e in storage.ledger.entries()][-2:], ['expired', 'expired'])
+
+    def test_expired_stock_is_neither_available_nor_dispatched(self):
+        storage = Storage()
+        storage.add_supplies('food', 5, expiry='2020-01-01')
+        storage.add_supplies('food', 5, expiry='2030-01-01')
+        self.assertEqual(storage.check_inventory('food'), 5)
+        storage.remove_supplies('food', 5)
+        self.assertEqual(storage.get_lots('food'), [{'expiry': '2020-01-01', 'quantity': 5}])
+        with self.assertRaises(ValueError):
+            storage.remove_supplies('food', 1)
+        self.assertEqual(storage.sweep_expired(discard=True), [{'item': 'food', 'expiry': '2020-01-01', 'quantity': 5}])
+        self.assertEqual(storage.get_supplies(), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,695 @@
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+import mental_health_ai as mha
+from src import companion_client, companion_router, companion_turns
+from src.companion_memory import _compact_json
+from src.companion_patch import _schema_errors
+
+
+def fresh_memory():
+    return {
+        "user_name": "Sam", "pronouns": None, "age": None, "location": None,
+        "parents": {}, "siblings": {}, "friends": {}, "pets": {}, "significant_others": {},
+        "losses": [], "major_events": [], "recent_emotions": [], "coping_strategies": [],
+        "conversation_history": [], "preferences": {"tone": None, "topics_to_avoid": [], "favorites": []},
+        "crisis_info": {}, "disasters": [], "conversation_summary": "",
+    }
+
+
+class TestMemoryManager(unittest.TestCase):
+    def test_prompt_memory_stays_within_budget_over_long_sessions(self):
+        manager = mha.MemoryManager(fresh_memory(), token_budget=300, recent_turns=4, summary_limit=60)
+        for i in range(200):
+            manager.memory["recent_emotions"].append(f"feeling anxious about aftershock number {i}")
+            manager.record_turn(f"Turn {i}: the shaking keeps coming back. I can't sleep.", "I'm here with you.")
+            context = manager.build_context("my dog is scared of the shaking")
+            self.assertLessEqual(mha.estimate_tokens(_compact_json(context)), 300 + 20)
+        self.assertEqual(len(manager.memory["conversation_history"]), 4)
+        self.assertIn("Turn 195", manager.memory["conversation_summary"])
+        self.assertNotIn("Turn 0:", manager.memory["conversation_summary"])
+
+    def test_relevant_facts_are_preferred(self):
+        memory = fresh_memory()
+        memory["pets"] = {"Rex": "golden retriever"}
+        memory["major_events"] = [f"unrelated event {i} " * 5 for i in range(40)]
+        manager = mha.MemoryManager(memory, token_budget=120)
+        context = manager.build_context("Is Rex going to be okay?")
+        self.assertEqual(context["pets"], {"Rex": "golden retriever"})
+        self.assertEqual(context["user_name"], "Sam")
+        self.assertLess(len(context.get("major_events", [])), 40)
+
+    def test_merge_keeps_facts_the_model_did_not_see(self):
+        memory = fresh_memory()
+        memory["losses"] = [{"person": "Dad"}, {"person": "Max"}]
+        manager = mha.MemoryManager(memory)
+        manager.merge_update({"losses": [{"person": "Max"}, {"person": "Ana"}], "age": 30,
+                              "conversation_history": []})
+        self.assertEqual([l["person"] for l in memory["losses"]], ["Dad", "Max", "Ana"])
+        self.assertEqual(memory["age"], 30)
+
+
+class TestUpdateMemory(unittest.TestCase):
+    def setUp(self):
+        self.saved = (companion_turns.memory_manager, companion_turns.get_chat_completion)
+        companion_turns.memory_manager = mha.MemoryManager(fresh_memory())
+        self.prompts = []
+
+        def fake_completion(system_prompt, user_input):
+            self.prompts.append(system_prompt)
+            return 'Sure! {"memory": {"recent_emotions": ["sad"]}, "response": "I hear you."}'
+
+        companion_turns.get_chat_completion = fake_completion
+
+    def tearDown(self):
+        companion_turns.memory_manager, companion_turns.get_chat_completion = self.saved
+
+    def test_turn_is_recorded_with_prompt_size(self):
+        self.assertEqual(mha.update_memory_with_gpt("I feel sad today"), "I hear you.")
+        self.assertEqual(companion_turns.memory_manager.memory["recent_emotions"], ["sad"])
+        self.assertEqual(len(companion_turns.memory_manager.memory["conversation_history"]), 1)
+        stats = companion_turns.memory_manager.turn_stats[-1]
+        self.assertEqual(stats["prompt_tokens"], mha.estimate_tokens(self.prompts[0]) + mha.estimate_tokens("I feel sad today"))
+
+    def test_local_intents_skip_the_model(self):
+        reply = mha.update_memory_with_gpt("What should I do in a flood?")
+        self.assertIn(mha.DISASTER_ADVICE["flood"], reply)
+        self.assertEqual(mha.update_memory_with_gpt("I want to die"), mha.CRISIS_RESPONSE)
+        self.assertEqual(self.prompts, [])
+        # Canned answers are remembered, crisis messages are not
+        self.assertEqual(len(companion_turns.memory_manager.memory["conversation_history"]), 1)
+
+
+class FakeStreamingClient:
+    """Stands in for the OpenAI client: streams the given pieces as completion chunks."""
+
+    def __init__(self, pieces, events=None, legacy=False):
+        self.pieces = pieces
+        self.events = events if events is not None else []
+        self.legacy = legacy
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.ChatCompletion = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        for i, piece in enumerate(self.pieces):
+            self.events.append(f"chunk {i}")
+            if self.legacy:
+                yield {"choices": [{"delta": {"content": piece}}]}
+            else:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.saved = (companion_turns.memory_manager, companion_client.client, companion_client._legacy_openai,
+                      companion_client.NEW_SDK)
+        companion_turns.memory_manager = mha.MemoryManager(fresh_memory())
+
+    def tearDown(self):
+        companion_turns.memory_manager = self.saved[0]
+        companion_client.client, companion_client._legacy_openai, companion_client.NEW_SDK = self.saved[1:]
+
+    def test_reply_streams_before_the_completion_ends(self):
+        events = []
+        companion_client.client = FakeStreamingClient(
+            ["That sounds ", "really hard. ", "I'm here.\n<<<MEM", 'ORY>>>\n{"recent_', 'emotions": ["grief"]}'],
+            events)
+        companion_client.NEW_SDK = True
+        shown = []
+        reply = mha.update_memory_with_gpt("I miss my home", on_text=lambda t: (events.append("text"), shown.append(t)))
+        self.assertEqual(reply, "That sounds really hard. I'm here.")
+        self.assertEqual("".join(shown).strip(), reply)
+        self.assertLess(events.index("text"), events.index("chunk 4"))
+        self.assertEqual(companion_turns.memory_manager.memory["recent_emotions"], ["grief"])
+        self.assertTrue(companion_client.client.calls[0]["stream"])
+
+    def test_legacy_sdk_and_json_envelope(self):
+        legacy = FakeStreamingClient(
+            ['{"memory": {"recent_emotions": ["calm"]}, ', '"response": "Glad you feel calmer."}'], legacy=True)
+        del legacy.chat
+        companion_client.client = companion_client._legacy_openai = legacy
+        companion_client.NEW_SDK = False
+        shown = []
+        reply = mha.update_memory_with_gpt("I feel calmer", on_text=shown.append)
+        self.assertEqual(reply, "Glad you feel calmer.")
+        # Only the envelope's response string is shown
+        self.assertEqual("".join(shown), "Glad you feel calmer.")
+        self.assertEqual(companion_turns.memory_manager.memory["recent_emotions"], ["calm"])
+        self.assertEqual(legacy.calls[0]["request_timeout"], mha.REQUEST_TIMEOUT_SECONDS)
+
+    def test_marker_split_across_chunks_is_never_shown(self):
+        shown = []
+        stream = mha.ReplyStream(shown.append)
+        for piece in ["Take a breath. <", "<<MEMORY", ">>> {}"]:
+            stream.feed(piece)
+        self.assertEqual(stream.close(), ("Take a breath.", {}))
+        self.assertNotIn("<", "".join(shown))
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.saved = (companion_turns.memory_manager, companion_client.client, companion_turns.response_cache)
+        companion_turns.memory_manager = mha.MemoryManager(fresh_memory())
+        companion_turns.response_cache = mha.ResponseCache()
+        self.local = mha.LocalClient()
+        mha.use_client(self.local)
+
+    def tearDown(self):
+        companion_turns.memory_manager, companion_client.client, companion_turns.response_cache = self.saved
+
+    def test_lru_and_ttl(self):
+        now = [0.0]
+        cache = mha.ResponseCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 10.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.metrics()["evictions"], 1)
+
+    def test_repeated_quick_messages_hit_the_cache(self):
+        first = mha.update_memory_with_gpt("Help please!", cache=True)
+        shown = []
+        second = mha.update_memory_with_gpt("help   please", on_text=shown.append, cache=True)
+        self.assertEqual(first, second)
+        self.assertEqual(shown, [second])
+        self.assertEqual(self.local.requests, 1)
+        # Without cache=True (the interactive companion) every message goes to the model
+        mha.update_memory_with_gpt("help please")
+        self.assertEqual(self.local.requests, 2)
+        self.assertEqual(companion_turns.response_cache.metrics()["hits"], 1)
+
+    def test_crisis_messages_are_never_cached(self):
+        for _ in range(2):
+            self.assertEqual(mha.update_memory_with_gpt("help please, I want to die", cache=True), mha.CRISIS_RESPONSE)
+        self.assertEqual(len(companion_turns.response_cache), 0)
+        self.assertEqual(self.local.requests, 0)
+
+    def test_fallback_replies_are_returned_quietly_and_not_cached(self):
+        mha.use_client(mha.LocalClient(lambda system_prompt, user_input: ""))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for _ in range(2):
+                self.assertEqual(mha.update_memory_with_gpt("help please", cache=True), mha.FALLBACK_REPLY)
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(len(companion_turns.response_cache), 0)
+        self.assertEqual(companion_client.client.requests, 2)
+
+    def test_concurrent_identical_requests_share_one_completion(self):
+        prompts = []
+        mha.use_client(mha.LocalClient(lambda system_prompt, user_input: prompts.append(system_prompt)
+                                       or mha.LocalClient._default_reply(system_prompt, user_input), delay=0.2))
+        sessions = []
+        for name in ("Ann", "Bob", "Cy", "Dee", "Eve"):
+            memory = fresh_memory()
+            memory["user_name"] = None
+            memory["conversation_summary"] = f"{name} talked about the storm"
+            sessions.append(mha.Session(name, memory))
+        replies = []
+        threads = [threading.Thread(target=lambda s=s: replies.append(mha.update_memory_with_gpt("help please", s, cache=True)))
+                   for s in sessions]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(companion_client.client.requests, 1)
+        self.assertEqual(len(set(replies)), 1)
+        metrics = companion_turns.response_cache.metrics()
+        self.assertEqual(metrics["misses"] + metrics["coalesced"] + metrics["hits"], 5)
+        self.assertEqual(metrics["misses"], 1)
+        self.assertTrue(all(len(s.memory["conversation_history"]) == 1 for s in sessions))
+        # The shared prompt does not identify whichever requester it was built for
+        self.assertEqual(len(prompts), 1)
+        self.assertFalse(any(name in prompts[0] for name in ("Ann", "Bob", "Cy", "Dee", "Eve")))
+        # Different stored facts still get their own reply
+        sessions[0].memory["location"] = "Halifax"
+        mha.update_memory_with_gpt("help please", sessions[0], cache=True)
+        self.assertEqual(len(prompts), 2)
+
+
+class TestClientResilience(unittest.TestCase):
+    def setUp(self):
+        self.saved = (companion_turns.memory_manager, companion_client.client, companion_client.breaker,
+                      companion_client.api_stats, companion_client._sleep)
+        companion_turns.memory_manager = mha.MemoryManager(fresh_memory())
+        self.now = [0.0]
+        companion_client.breaker = mha.CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=lambda: self.now[0])
+        companion_client.api_stats = dict.fromkeys(self.saved[3], 0)
+        self.sleeps = []
+        companion_client._sleep = self.sleeps.append
+        self.failures_left = 0
+
+        def reply(system_prompt, user_input):
+            if self.failures_left:
+                self.failures_left -= 1
+                raise TimeoutError("timed out")
+            return "I'm listening.\n<<<MEMORY>>>\n{}"
+
+        self.local = mha.LocalClient(reply)
+        mha.use_client(self.local)
+
+    def tearDown(self):
+        companion_turns.memory_manager = self.saved[0]
+        (companion_client.client, companion_client.breaker, companion_client.api_stats,
+         companion_client._sleep) = self.saved[1:]
+
+    def test_transient_failures_are_retried_with_backoff(self):
+        self.failures_left = 2
+        self.assertEqual(mha.update_memory_with_gpt("rough day"), "I'm listening.")
+        self.assertEqual(self.local.requests, 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(all(0 <= d <= mha.RETRY_MAX_SECONDS for d in self.sleeps))
+        self.assertEqual(mha.client_metrics()["retries"], 2)
+        self.assertEqual(companion_client.breaker.state, "closed")
+
+    def test_rejected_requests_are_not_retried(self):
+        error = RuntimeError("bad key")
+        error.status_code = 401
+
+        def reject(system_prompt, user_input):
+            raise error
+
+        mha.use_client(mha.LocalClient(reject))
+        self.assertEqual(mha.update_memory_with_gpt("hello there friend"), mha.FALLBACK_REPLY)
+        self.assertEqual(companion_client.client.requests, 1)
+        self.assertEqual(companion_client.breaker.state, "closed")
+
+    def test_breaker_fails_fast_while_the_api_is_down(self):
+        self.failures_left = 10 ** 6
+        for _ in range(2):
+            self.assertEqual(mha.update_memory_with_gpt("rough day"), mha.FALLBACK_REPLY)
+        self.assertEqual(companion_client.breaker.state, "open")
+        requests = self.local.requests
+        self.assertEqual(mha.update_memory_with_gpt("rough day"), mha.FALLBACK_REPLY)
+        self.assertEqual(self.local.requests, requests)
+        self.assertEqual(mha.client_metrics()["fast_failures"], 1)
+        # One trial after the reset period; success closes the breaker
+        self.now[0] = 30.0
+        self.failures_left = 0
+        self.assertEqual(mha.update_memory_with_gpt("rough day"), "I'm listening.")
+        self.assertEqual(mha.client_metrics()["breaker_state"], "closed")
+
+    def test_async_requests_share_the_retry_policy(self):
+        saved_backoff = companion_client._backoff
+        companion_client._backoff = lambda attempt: 0
+        self.failures_left = 1
+        service = mha.AsyncCompanion(mha.SessionStore(None), client=mha.AsyncLocalClient(self.local.reply))
+        try:
+            self.assertEqual(asyncio.run(service.reply("Ann", "rough day")), "I'm listening.")
+        finally:
+            companion_client._backoff = saved_backoff
+        self.assertEqual(mha.client_metrics()["retries"], 1)
+        self.assertEqual(mha.client_metrics()["requests"], 2)
+        self.failures_left = 10 ** 6
+        for _ in range(2):
+            self.assertEqual(asyncio.run(service.reply("Ann", "rough day")), mha.FALLBACK_REPLY)
+        self.assertEqual(companion_client.breaker.state, "open")
+
+
+class TestAsyncCompanion(unittest.TestCase):
+    def setUp(self):
+        self.saved = companion_client.client
+        self.store = mha.SessionStore(None)
+
+    def tearDown(self):
+        companion_client.client = self.saved
+
+    def test_sessions_run_concurrently_within_the_limit(self):
+        model = mha.AsyncLocalClient(delay=0.05)
+        service = mha.AsyncCompanion(self.store, max_concurrency=8, client=model)
+
+        async def run():
+            return await asyncio.gather(*(service.reply(f"user{i}", "I feel lost") for i in range(40)))
+
+        start = time.perf_counter()
+        replies = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(replies), 40)
+        self.assertEqual(model.requests, 40)
+        self.assertEqual(service.peak_in_flight, 8)
+        # 5 waves of 8 rather than 40 calls in a row
+        self.assertLess(elapsed, 40 * 0.05 / 2)
+        self.assertEqual(len(self.store.get("user7").memory["conversation_history"]), 1)
+
+    def test_turns_in_one_session_are_applied_in_order(self):
+        service = mha.AsyncCompanion(self.store, client=mha.AsyncLocalClient(delay=0.01))
+
+        async def run():
+            await asyncio.gather(*(service.reply("Ann", f"message {i}") for i in range(5)))
+
+        asyncio.run(run())
+        history = self.store.get("Ann").memory["conversation_history"]
+        self.assertEqual([turn["user"] for turn in history], [f"message {i}" for i in range(5)])
+        self.assertEqual(service._locks, {})
+
+    def test_blocking_client_runs_in_the_thread_pool(self):
+        mha.use_client(mha.LocalClient(delay=0.05))
+        service = mha.AsyncCompanion(self.store, max_concurrency=4)
+        service.client = None
+
+        async def run():
+            return await asyncio.gather(*(service.reply(f"user{i}", "I feel lost") for i in range(8)))
+
+        start = time.perf_counter()
+        replies = asyncio.run(run())
+        service.close()
+        self.assertLess(time.perf_counter() - start, 8 * 0.05)
+        self.assertTrue(all(r.startswith("Thank you") for r in replies))
+
+    def test_held_session_lock_does_not_stall_other_sessions(self):
+        service = mha.AsyncCompanion(self.store, client=mha.AsyncLocalClient(delay=0.01))
+        ann = self.store.get("Ann")
+        held = threading.Event()
+        release = threading.Event()
+
+        def blocking_turn():
+            with ann.lock:
+                held.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=blocking_turn)
+        worker.start()
+        held.wait(5)
+
+        async def run():
+            ann_turn = asyncio.ensure_future(service.reply("Ann", "I feel lost"))
+            start = time.perf_counter()
+            await service.reply("Bob", "I feel lost")
+            bob_elapsed = time.perf_counter() - start
+            self.assertFalse(ann_turn.done())
+            release.set()
+            await ann_turn
+            return bob_elapsed
+
+        try:
+            self.assertLess(asyncio.run(run()), 0.5)
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(len(ann.memory["conversation_history"]), 1)
+
+    def test_spellings_of_one_name_share_a_lock(self):
+        service = mha.AsyncCompanion(self.store, client=mha.AsyncLocalClient(delay=0.01))
+
+        async def run():
+            turns = [service.reply(name, f"message {i}") for i, name in enumerate(["Ann", " Ann", "Ann "])]
+            turns = [asyncio.ensure_future(turn) for turn in turns]
+            await asyncio.sleep(0)
+            self.assertEqual(list(service._locks), ["Ann"])
+            self.assertEqual(service._locks["Ann"][1], 3)
+            await asyncio.gather(*turns)
+
+        asyncio.run(run())
+        history = self.store.get("Ann").memory["conversation_history"]
+        self.assertEqual([turn["user"] for turn in history], [f"message {i}" for i in range(3)])
+        self.assertEqual(service._locks, {})
+
+    def test_sessions_are_loaded_off_the_event_loop(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = mha.SessionStore(tmpdir)
+            load = store._load
+            threads = []
+
+            def checked_load(name):
+                threads.append(threading.get_ident())
+                return load(name)
+
+            store._load = checked_load
+            service = mha.AsyncCompanion(store, client=mha.AsyncLocalClient())
+
+            async def run():
+                await service.reply("Ann", "I feel lost")
+                await service.reply("Ann", "still here")
+                return threading.get_ident()
+
+            loop_thread = asyncio.run(run())
+            self.assertEqual(len(threads), 1)
+            self.assertNotEqual(threads[0], loop_thread)
+            self.assertEqual(len(store.get("Ann").memory["conversation_history"]), 2)
+
+
+class TestIntentRouter(unittest.TestCase):
+    def test_trie_pattern_matches_exactly_the_words(self):
+        import re
+        pattern = re.compile(r"^(?:" + mha.trie_pattern(["hurt", "hurt myself", "help"]) + r")$")
+        for word in ["hurt", "hurt myself", "help"]:
+            self.assertTrue(pattern.match(word))
+        for word in ["he", "hurt my", "helps"]:
+            self.assertIsNone(pattern.match(word))
+
+    def test_routing_and_metrics(self):
+        router = mha.IntentRouter()
+        mem = fresh_memory()
+        mem["losses"].append({"person": "Rex", "timestamp": "2024-05-01T09:30:00", "cause": "flood"})
+        cases = {
+            "Thank you so much!": "thanks",
+            "hey there": "greeting",
+            "What should I do during a fire?": "disaster_advice",
+            "When did we lose Rex?": "time_question",
+            "I can't sleep since the earthquake": "model",
+            "hello, I lost my home in the flood": "model",
+        }
+        for text, intent in cases.items():
+            self.assertEqual(router.route(text, mem)[0], intent, text)
+        self.assertIn("May 01, 2024", router.route("What time did Rex die?", mem)[1])
+        self.assertEqual(router.route("x " * 3000 + "suicide", mem)[0], "crisis")
+        metrics = router.metrics()
+        self.assertEqual(metrics["total"], 8)
+        self.assertEqual(metrics["escalated"], 2)
+        self.assertAlmostEqual(metrics["hit_rate"], 6 / 8)
+        self.assertEqual(metrics["by_intent"]["time_question"], 2)
+
+    def test_ordinary_messages_are_not_disaster_or_time_questions(self):
+        router = mha.IntentRouter()
+        mem = fresh_memory()
+        mem["disasters"].append({"type": "flood", "timestamp": "2024-05-01T09:30:00", "advice": "Move to higher ground."})
+        for text in ["I got fired today, any advice?", "My mind is flooded with grief, what should I do?",
+                     "When will I feel better?", "When did my mom die?"]:
+            self.assertEqual(router.route(text, mem), ("model", None), text)
+        self.assertIn("Move to higher ground", router.route("When did the flood happen?", mem)[1])
+
+    def test_only_preparedness_questions_get_canned_disaster_advice(self):
+        router = mha.IntentRouter()
+        mem = fresh_memory()
+        for text in ["My mom died in the earthquake and I don't know what to do",
+                     "I lost everything in the flood, any advice on how to keep going?",
+                     "Is there a fire near me? Any tips?",
+                     "I'm so scared, what should I do during the next earthquake?"]:
+            self.assertEqual(router.route(text, mem), ("model", None), text)
+        for text in ["What should I do during an earthquake?", "how do we stay safe in a tornado",
+                     "flood safety tips please"]:
+            self.assertEqual(router.route(text, mem)[0], "disaster_advice", text)
+        self.assertTrue(router.route("What should I do during an earthquake?", mem)[1].startswith(
+            "Earthquake safety: Drop, cover, and hold on."))
+
+
+class TestKeywordScanner(unittest.TestCase):
+    def test_overlapping_keywords_are_all_found(self):
+        scanner = mha.KeywordScanner({"a": ["he", "she", "hers"], "b": ["his"]})
+        self.assertEqual(scanner.scan("USHERS and his"), {"a": ["she", "he", "hers"], "b": ["his"]})
+
+    def test_whole_word_groups(self):
+        scan = mha.scanner.scan("The flood damaged the basement at 5 PM; my mom died")
+        self.assertEqual(scan["disaster"], ["flood"])
+        self.assertNotIn("disaster", mha.scanner.scan("the flooded basement, I got fired"))
+        self.assertEqual(scan["temporal"], ["pm"])
+        self.assertEqual(scan["relation"], ["mom"])
+        self.assertNotIn("temporal", mha.scanner.scan("the damage is massive"))
+
+    def test_time_is_only_parsed_when_the_message_mentions_one(self):
+        saved = companion_router.extract_time_from_text
+        calls = []
+        companion_router.extract_time_from_text = lambda text: calls.append(text) or "2024-05-01T17:00:00"
+        try:
+            mem = fresh_memory()
+            mha.update_losses_with_time("my dad died in a fire", mem)
+            self.assertEqual(calls, [])
+            mha.update_losses_with_time("my mom died yesterday at 5pm", mem)
+            self.assertEqual(len(calls), 1)
+        finally:
+            companion_router.extract_time_from_text = saved
+        self.assertEqual([loss["person"] for loss in mem["losses"]], ["Dad", "Mom"])
+        self.assertEqual(mem["losses"][0]["cause"], "fire")
+        self.assertEqual(mem["losses"][1]["timestamp"], "2024-05-01T17:00:00")
+
+
+class TestMemoryPatches(unittest.TestCase):
+    def test_operations_are_applied_in_place(self):
+        mem = fresh_memory()
+        mem["pets"]["Rex"] = {"type": "dog"}
+        ops = [
+            {"op": "add", "path": "/recent_emotions/-", "value": "sad"},
+            {"op": "add", "path": "/recent_emotions/-", "value": "sad"},
+            {"op": "replace", "path": "/location", "value": "Halifax"},
+            {"op": "add", "path": "/friends/Jo~1Jay", "value": {"since": "school"}},
+            {"op": "replace", "path": "/pets/Rex/type", "value": "puppy"},
+            {"op": "remove", "path": "/preferences/tone"},
+            {"op": "remove", "path": "/losses"},
+        ]
+        self.assertEqual(mha.apply_memory_patch(mem, ops), len(ops))
+        self.assertEqual(mem["recent_emotions"], ["sad"])
+        self.assertEqual(mem["location"], "Halifax")
+        self.assertEqual(mem["friends"], {"Jo/Jay": {"since": "school"}})
+        self.assertEqual(mem["pets"]["Rex"], {"type": "puppy"})
+        self.assertNotIn("tone", mem["preferences"])
+        self.assertEqual(mem["losses"], [])
+
+    def test_invalid_operations_are_skipped(self):
+        mem = fresh_memory()
+        ops = [
+            {"op": "add", "path": "/conversation_history/-", "value": {"user": "x"}},
+            {"op": "replace", "path": "/recent_emotions", "value": "sad"},
+            {"op": "add", "path": "/location"},
+            {"op": "move", "path": "/location", "value": "x"},
+            {"op": "add", "path": "/location", "value": "x", "from": "/age"},
+            {"op": "replace", "path": "/pets/Rex", "value": {}},
+            {"op": "remove", "path": "/recent_emotions/3"},
+            "not an operation",
+            {"op": "replace", "path": "/age", "value": 34},
+        ]
+        manager = mha.MemoryManager(mem)
+        self.assertEqual(manager.apply_patch(ops), 1)
+        self.assertEqual(manager.patch_stats, {"applied": 1, "rejected": len(ops) - 1})
+        self.assertEqual(mem["age"], 34)
+        self.assertEqual(mem["conversation_history"], [])
+        self.assertEqual(mem["recent_emotions"], [])
+
+    def test_minimal_validator_matches_the_schema(self):
+        self.assertEqual(_schema_errors({"op": "remove", "path": "/pets/Rex"}, mha.PATCH_OP_SCHEMA), [])
+        self.assertTrue(_schema_errors({"op": "replace", "path": "/age", "value": True}, mha.PATCH_OP_SCHEMA))
+        self.assertTrue(_schema_errors({"op": "add", "path": "pets"}, mha.PATCH_OP_SCHEMA))
+
+    def test_model_reply_carries_a_patch(self):
+        saved = (companion_turns.memory_manager, companion_client.client)
+        companion_turns.memory_manager = mha.MemoryManager(fresh_memory())
+        mha.use_client(mha.LocalClient(lambda system_prompt, user_input: (
+            'That is a lot to carry.\n<<<MEMORY>>>\n[{"op":"add","path":"/recent_emotions/-","value":"overwhelmed"}]')))
+        try:
+            self.assertEqual(mha.update_memory_with_gpt("everything is too much"), "That is a lot to carry.")
+            self.assertEqual(companion_turns.memory_manager.memory["recent_emotions"], ["overwhelmed"])
+            self.assertEqual(companion_turns.memory_manager.patch_stats["applied"], 1)
+        finally:
+            companion_turns.memory_manager, companion_client.client = saved
+
+
+# (model output, expected reply, expected memory update)
+MALFORMED_OUTPUTS = [
+    ('Sure! {"memory": {"recent_emotions": ["sad"]}, "response": "I hear you."} Let me know if that helps :}',
+     "I hear you.", {"recent_emotions": ["sad"]}),
+    ('{"response": "Try box breathing {in 4, hold 4, out 4}.", "memory": {}}',
+     "Try box breathing {in 4, hold 4, out 4}.", {}),
+    ('```json\n{"response": "You did well to reach out.", "memory": {"coping_strategies": ["talking"],},}\n```',
+     "You did well to reach out.", {"coping_strategies": ["talking"]}),
+    ('{oops} {"response": "Still here.", "memory": {}}', "Still here.", {}),
+    ('{"response": "It makes sense to feel \\"stuck\\" after this", "memory": {"recent_emotions": ["st',
+     'It makes sense to feel "stuck" after this', {}),
+    ('That sounds exhausting.\n<<<MEMORY>>>\n```json\n[{"op": "add", "path": "/recent_emotions/-", "value": "tired"}, '
+     '{"op": "replace", "path": "/location", "value": "Hali',
+     "That sounds exhausting.", [{"op": "add", "path": "/recent_emotions/-", "value": "tired"}]),
+    ('I\'m glad you told me.\n<<<MEMORY>>>\n[] (no changes)', "I'm glad you told me.", []),
+    ("Just plain words, with a [bracket] and a {brace}.", "Just plain words, with a [bracket] and a {brace}.", {}),
+]
+
+
+class TestJSONExtraction(unittest.TestCase):
+    def test_malformed_outputs(self):
+        for text, reply, update in MALFORMED_OUTPUTS:
+            self.assertEqual(mha.parse_model_output(text), (reply, update), text)
+
+    def test_malformed_outputs_streamed_in_small_chunks(self):
+        for text, reply, update in MALFORMED_OUTPUTS:
+            shown = []
+            stream = mha.ReplyStream(shown.append)
+            for i in range(0, len(text), 3):
+                stream.feed(text[i:i + 3])
+            self.assertEqual(stream.close(), (reply, update), text)
+            # Words before an envelope are shown, its JSON never is
+            self.assertTrue("".join(shown).strip().endswith(reply), text)
+            self.assertNotIn('"response"', "".join(shown))
+
+    def test_partial_recovery(self):
+        extractor = mha.JSONExtractor()
+        extractor.feed('{"a": [1, {"b": "x\\u00')
+        self.assertFalse(extractor.complete)
+        self.assertEqual(extractor.partial(), {"a": [1, {"b": "x"}]})
+        self.assertEqual(extractor.partial(whole_items=True), {})
+        extractor.feed('e9"}], "c": 2} trailing')
+        self.assertEqual(extractor.value(), {"a": [1, {"b": "x\u00e9"}], "c": 2})
+        self.assertEqual(extractor.rest, " trailing")
+        with self.assertRaises(ValueError):
+            mha.extract_json("no json here")
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.saved = companion_turns.get_chat_completion
+        companion_turns.get_chat_completion = lambda system_prompt, user_input: (
+            '{"memory": {"recent_emotions": ["%s"]}, "response": "ok"}' % user_input)
+
+    def tearDown(self):
+        companion_turns.get_chat_completion = self.saved
+        self.tmpdir.cleanup()
+
+    def test_sessions_are_isolated_and_persisted(self):
+        store = mha.SessionStore(self.tmpdir.name)
+        ann, bob = store.get('Ann'), store.get('Bob')
+        mha.update_memory_with_gpt('tired', ann)
+        mha.update_memory_with_gpt('there was a flood', bob)
+        self.assertEqual(ann.memory['recent_emotions'], ['tired'])
+        self.assertEqual(ann.memory['disasters'], [])
+        self.assertEqual(bob.memory['disasters'][0]['type'], 'flood')
+        store.save_all()
+        reloaded = mha.SessionStore(self.tmpdir.name).get('Ann')
+        self.assertEqual(reloaded.memory['recent_emotions'], ['tired'])
+        self.assertEqual(reloaded.memory['user_name'], 'Ann')
+        self.assertTrue(store.path_for('Ann').endswith('.json.gz'))
+
+    def test_idle_sessions_are_evicted_and_saved(self):
+        store = mha.SessionStore(self.tmpdir.name, max_in_memory=4, shards=2)
+        for i in range(20):
+            mha.update_memory_with_gpt(f'note {i}', store.get(f'user{i}'))
+        self.assertLessEqual(len(store), 4)
+        self.assertTrue(os.path.exists(store.path_for('user0')))
+        self.assertEqual(store.get('user0').memory['recent_emotions'], ['note 0'])
+
+    def test_concurrent_turns_in_one_session_are_serialised(self):
+        store = mha.SessionStore(None)
+        session = store.get('Ann')
+        threads = [threading.Thread(target=mha.update_memory_with_gpt, args=(f'msg {i}', session)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(session.memory['recent_emotions']), 20)
+        self.assertEqual(len(session.memory['conversation_history']), mha.RECENT_TURNS)
+
+    def test_session_files_are_read_outside_the_shard_lock(self):
+        store = mha.SessionStore(self.tmpdir.name)
+        load = store._load
+        held = []
+
+        def checked_load(name):
+            held.append(store._shard(name)[0].locked())
+            return load(name)
+
+        store._load = checked_load
+        session = store.get(' Ann ')
+        self.assertEqual(held, [False])
+        self.assertIs(store.get('Ann'), session)
+        self.assertIs(store.cached('Ann'), session)
+        self.assertEqual(held, [False])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from src.profiling import SessionProfiler, report_path_from_env, DEFAULT_REPORT
+from src.storage import Storage
+
+
+class TestSessionProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.report = os.path.join(self.tmpdir.name, 'profile.txt')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_report_lists_instrumented_call_sites(self):
+        profiler = SessionProfiler(self.report, targets=[('src.storage', ['Storage'])])
+        profiler.start()
+        try:
+            storage = Storage()
+            storage.add_supplies('water', 10)
+            storage.check_inventory('water')
+        finally:
+            profiler.stop()
+        profiler.write_report()
+        with open(self.report, encoding='utf-8') as f:
+            text = f.read()
+        self.assertIn('Storage.add_supplies', text)
+        self.assertIn('storage.py', text)
+        self.assertIn('Peak allocations by call site', text)
+
+    def test_stop_restores_original_methods(self):
+        original = Storage.add_supplies
+        profiler = SessionProfiler(self.report, targets=[('src.storage', ['Storage'])])
+        profiler.start()
+        self.assertIsNot(Storage.add_supplies, original)
+        profiler.stop()
+        self.assertIs(Storage.add_supplies, original)
+
+    def test_report_path_from_env(self):
+        self.assertIsNone(report_path_from_env(None))
+        self.assertIsNone(report_path_from_env('0'))
+        self.assertEqual(report_path_from_env('1'), DEFAULT_REPORT)
+        self.assertEqual(report_path_from_env('out/p.txt'), 'out/p.txt')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import math
+import random
+import unittest
+from src.rationing import Rationer, water_fill
+from src.storage import Storage
+from src.trucks import Truck
+from src.triage import TriageQueue
+
+
+class TestWaterFill(unittest.TestCase):
+    def test_small_demands_are_filled_and_rest_shared(self):
+        allocations, level = water_fill([('a', 2, 1), ('b', 10, 1), ('c', 10, 1)], 12)
+        self.assertEqual(allocations, {'a': 2, 'b': 5, 'c': 5})
+        self.assertEqual(level, 5)
+
+    def test_weights_and_whole_units(self):
+        allocations, _ = water_fill(sorted([('a', 100, 1), ('b', 100, 2)], key=lambda r: r[1] / r[2]), 10)
+        self.assertEqual(sum(allocations.values()), 10)
+        self.assertEqual(allocations, {'a': 3, 'b': 7})
+
+    def test_enough_stock_fills_everyone(self):
+        self.assertEqual(water_fill([('a', 2, 1)], 5), ({'a': 2}, math.inf))
+
+
+class TestRationer(unittest.TestCase):
+    def test_allocations_follow_stock_and_demand_changes(self):
+        storage = Storage()
+        storage.add_supplies('water', 30)
+        rationer = Rationer(storage)
+        rationer.set_demand('Water', 'ann', 20)
+        rationer.set_demand('water', 'bob', 20, weight=2)
+        self.assertEqual(rationer.allocations('water'), {'ann': 10, 'bob': 20})
+        storage.remove_supplies('water', 15)
+        self.assertEqual(rationer.allocations('water'), {'ann': 5, 'bob': 10})
+        rationer.set_demand('water', 'bob', 0)
+        self.assertEqual(rationer.allocations('water'), {'ann': 15})
+        self.assertEqual(rationer.pending('water'), 20)
+
+    def test_many_requests_never_exceed_stock(self):
+        rng = random.Random(5)
+        rationer = Rationer()
+        for i in range(3000):
+            rationer.set_demand('food', i, rng.randint(1, 50), weight=rng.randint(1, 6))
+        allocations = rationer.allocations('food', stock=20000)
+        self.assertEqual(sum(allocations.values()), 20000)
+        level = rationer.level('food', stock=20000)
+        for i, (demand, weight, _) in rationer._demand['food'].items():
+            self.assertLessEqual(allocations[i], demand)
+            self.assertLessEqual(abs(allocations[i] - min(demand, level * weight)), 1)
+
+    def test_triage_dispatch_sends_fair_shares(self):
+        storage = Storage()
+        storage.add_supplies('water', 10)
+        trucks = Truck()
+        trucks.add_truck('Truck 1')
+        trucks.add_truck('Truck 2')
+        queue = TriageQueue(rationer=Rationer(storage))
+        queue.submit('Ann', 'water', 10)
+        queue.submit('Bob', 'water', 10)
+        sent = [request['sent'] for request, _ in queue.dispatch(storage, trucks)]
+        self.assertEqual(sent, [5, 5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+try:
+    import numpy as np
+    from src.report_analytics import ReportAnalytics
+except ImportError:  # numpy is optional for the rest of the app
+    np = None
+
+
+def _report(name, dtype, ts, lat=None, lon=None):
+    details = 'help'
+    if lat is not None:
+        details += f" | location_resolved: somewhere | lat:{lat} lon:{lon}"
+    return {'name': name, 'disaster_type': dtype, 'details': details, 'timestamp': ts}
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestReportAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.analytics = ReportAnalytics(capacity=2)
+        self.analytics.extend([
+            _report('Ann', 'Flood', '2025-11-09T10:15:00Z', 43.0, -80.0),
+            _report('Bob', 'fire', '2025-11-09T10:45:00Z', 45.0, -75.0),
+            _report('Ann', 'flood', '2025-11-09T12:05:00Z'),
+            {'name': 'x', 'disaster_type': 'flood'},  # no timestamp: skipped
+        ])
+
+    def test_columns_and_type_counts(self):
+        self.assertEqual(len(self.analytics), 3)
+        self.assertEqual(self.analytics.counts_by_type(), {'flood': 2, 'fire': 1})
+        self.assertEqual(self.analytics.reporter_ids.tolist(), [0, 1, 0])
+        self.assertTrue(np.isnan(self.analytics.lats[2]))
+
+    def test_counts_by_bucket_updates_incrementally(self):
+        starts, counts = self.analytics.counts_by_bucket(3600)
+        self.assertEqual(counts.shape, (len(self.analytics.type_names), 3))
+        self.assertEqual(counts.sum(axis=0).tolist(), [2, 0, 1])
+        # An earlier report and a new type extend the cached matrix
+        self.analytics.add(_report('Cy', 'storm', '2025-11-09T08:30:00Z'))
+        starts2, counts2 = self.analytics.counts_by_bucket(3600)
+        self.assertEqual(counts2.shape[1], 5)
+        self.assertEqual(counts2.sum(axis=0).tolist(), [1, 0, 2, 0, 1])
+        self.assertEqual(starts2[0] + 2 * 3600, starts[0])
+
+    def test_rolling_rate(self):
+        _, rates = self.analytics.rolling_rate(window_seconds=7200, step_seconds=3600)
+        self.assertEqual(rates.tolist(), [1.0, 1.0, 0.5])
+        _, fire = self.analytics.rolling_rate(7200, 3600, disaster_type='fire')
+        self.assertEqual(fire.tolist(), [0.5, 0.5, 0.0])
+
+    def test_station_catchment_totals(self):
+        stations = {'Waterloo': (43.46, -80.52), 'Ottawa': (45.42, -75.69)}
+        self.assertEqual(self.analytics.station_catchment_totals(stations), {'Ottawa': 1, 'Waterloo': 1})
+        self.analytics.add(_report('Di', 'flood', '2025-11-09T13:00:00Z', 43.5, -80.4))
+        self.assertEqual(self.analytics.station_catchment_totals(stations), {'Ottawa': 1, 'Waterloo': 2})
+        self.assertEqual(self.analytics.station_catchment_totals(stations, max_km=15), {'Ottawa': 0, 'Waterloo': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from src.report_store import iter_jsonl, write_jsonl, filter_reports
+from src.storage import Storage
+
+
+class TestReportStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'storage.json')
+        self.reports_path = os.path.join(self.tmpdir.name, 'storage.reports.jsonl')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_reports_are_appended_as_json_lines(self):
+        storage = Storage(self.path)
+        storage.add_report('Ann', 'flood', 'water rising')
+        storage.add_report('Bob', 'fire', 'smoke')
+        with open(self.reports_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Ann', 'Bob'])
+        self.assertEqual(Storage(self.path).report_count(), 2)
+
+    def test_iter_reports_filters_by_type_and_time(self):
+        reports = [
+            {'name': 'a', 'disaster_type': 'Flood', 'timestamp': '2025-11-09T10:00:00Z'},
+            {'name': 'b', 'disaster_type': 'fire', 'timestamp': '2025-11-09T12:00:00Z'},
+            {'name': 'c', 'disaster_type': 'flood', 'timestamp': '2025-11-10T09:00:00Z'},
+            {'name': 'd', 'disaster_type': 'flood'},
+        ]
+        write_jsonl(self.reports_path, reports)
+        storage = Storage(self.path)
+        self.assertEqual([r['name'] for r in storage.iter_reports(disaster_type='flood')], ['a', 'c', 'd'])
+        window = storage.iter_reports(since='2025-11-09T11:00:00Z', until='2025-11-10')
+        self.assertEqual([r['name'] for r in window], ['b'])
+
+    def test_delete_and_export(self):
+        storage = Storage(self.path)
+        for name, details in (('Ann', 'wind'), ('Bob', 'hail on roof'), ('Cy', 'power lines down')):
+            storage.add_report(name, 'storm', details)
+        self.assertTrue(storage.delete_report(2))
+        self.assertFalse(storage.delete_report(5))
+        dest = os.path.join(self.tmpdir.name, 'export', 'reports.jsonl')
+        self.assertEqual(storage.export_reports(dest), 2)
+        self.assertEqual([r['name'] for r in iter_jsonl(dest)], ['Ann', 'Cy'])
+
+    def test_json_array_segment_is_converted(self):
+        with open(os.path.join(self.tmpdir.name, 'storage.reports.json'), 'w', encoding='utf-8') as f:
+            json.dump([{'name': 'Ann'}], f)
+        self.assertEqual(Storage(self.path).get_reports(), [{'name': 'Ann'}])
+        self.assertTrue(os.path.exists(self.reports_path))
+
+    def test_export_memory_is_bounded(self):
+        report = {'name': 'x', 'disaster_type': 'flood', 'details': 'd' * 200, 'timestamp': '2025-11-09T10:00:00Z'}
+        write_jsonl(self.reports_path, (report for _ in range(20000)))
+        storage = Storage(self.path)
+        dest = os.path.join(self.tmpdir.name, 'out.jsonl')
+        tracemalloc.start()
+        try:
+            count = storage.export_reports(dest, disaster_type='flood')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, 20000)
+        # The archive is ~5 MB; streaming keeps the peak far below that
+        self.assertLess(peak, 512 * 1024)
+
+    def test_filter_reports_is_lazy(self):
+        def endless():
+            while True:
+                yield {'disaster_type': 'fire'}
+        self.assertEqual(next(filter_reports(endless(), disaster_type='fire')), {'disaster_type': 'fire'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import json
+import os
+import tempfile
+import unittest
+from benchmarks.startup import run_startup, loaded_modules, DEFERRED_MODULES
+from src.storage import Storage
+
+
+class TestLazyStartup(unittest.TestCase):
+    def test_startup_defers_heavy_modules(self):
+        stdout, _ = run_startup(importtime=False)
+        modules = loaded_modules(stdout)
+        self.assertIn('storage', modules)
+        for name in DEFERRED_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_storage_reads_file_on_first_use(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'storage.json')
+            storage = Storage(path)
+            # Written after construction, so it is only seen if loading is deferred
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'supplies': {'food': 12}}, f)
+            self.assertEqual(storage.check_inventory('food'), 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,6 @@
+import json
+import os
+import tempfile
 import unittest
 from src.storage import Storage
 
@@ -27,5 +30,51 @@ class TestStorage(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.storage.remove_supplies('bandages', 20)
 
+
+class TestStorageSegments(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'storage.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _read(self, path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_legacy_document_is_split_into_segments(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'supplies': {'food': 5}, 'reports': [{'name': 'Ann'}], 'requesters': ['Ann']}, f)
+        storage = Storage(self.path)
+        self.assertEqual(storage.check_inventory('food'), 5)
+        self.assertEqual(self._read(self.path), {'supplies': {'food': 5}})
+        reloaded = Storage(self.path)
+        self.assertEqual(reloaded.get_reports(), [{'name': 'Ann'}])
+        self.assertEqual(reloaded.requesters, ['Ann'])
+
+    def test_inventory_operations_do_not_touch_reports(self):
+        storage = Storage(self.path)
+        storage.add_report('Ann', 'flood', 'water rising')
+        reports_path = os.path.join(self.tmpdir.name, 'storage.reports.jsonl')
+        with open(reports_path, 'w', encoding='utf-8') as f:
+            f.write('not json')
+        fresh = Storage(self.path)
+        fresh.add_supplies('water', 10)
+        fresh.remove_supplies('water', 4)
+        self.assertEqual(Storage(self.path).check_inventory('water'), 6)
+        self.assertNotIn('reports', fresh._loaded)
+        with open(reports_path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'not json')
+
+    def test_bulk_update_writes_each_changed_segment_once(self):
+        storage = Storage(self.path)
+        with storage.bulk_update():
+            storage.add_supplies('food', 1)
+            storage.add_requester('Bob')
+            self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self._read(self.path), {'supplies': {'food': 1}})
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, 'storage.reports.json')))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
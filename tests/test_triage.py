@@ -0,0 +1,123 @@
+import os
+import random
+import tempfile
+import unittest
+from src.triage import IndexedHeap, TriageQueue
+from src.storage import Storage
+from src.trucks import Truck
+from src.help_stations import HelpStation
+
+HAMILTON = (43.2609, -79.9192)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIndexedHeap(unittest.TestCase):
+    def test_update_and_remove_keep_heap_order(self):
+        rng = random.Random(7)
+        heap = IndexedHeap()
+        keys = {i: rng.random() for i in range(200)}
+        for i, key in keys.items():
+            heap.push(i, key)
+        for i in range(0, 200, 3):
+            keys[i] = rng.random()
+            heap.update(i, keys[i])
+        for i in range(1, 200, 5):
+            heap.remove(i)
+            del keys[i]
+        popped = [heap.pop()[0] for _ in range(len(heap))]
+        self.assertEqual(popped, sorted(keys, key=keys.get))
+
+
+class TestTriageQueue(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.queue = TriageQueue(aging_per_minute=0.1, clock=self.clock)
+
+    def test_medical_after_earthquake_goes_first(self):
+        self.queue.submit('Ann', 'blankets', disaster_type='storm')
+        self.queue.submit('Bob', 'Medical', disaster_type='quake')
+        self.queue.submit('Cy', 'water', disaster_type='flood')
+        self.assertEqual([r['name'] for r in self.queue.ranked()], ['Bob', 'Cy', 'Ann'])
+        self.assertEqual(self.queue.pop()['name'], 'Bob')
+
+    def test_waiting_requests_age_past_newer_urgent_ones(self):
+        old = self.queue.submit('Ann', 'blankets', disaster_type='storm')
+        self.clock.now = 60 * 60  # an hour later the blanket request has gained 6 points
+        self.queue.submit('Bob', 'medical', disaster_type='earthquake')
+        self.assertAlmostEqual(self.queue.score(old), 2.5 + 6.0)
+        self.assertEqual(self.queue.pop()['name'], 'Ann')
+
+    def test_reprioritize_and_distance(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            stations = HelpStation(os.path.join(tmpdir, 'stations.json'))
+            stations.add_station('Depot', HAMILTON)
+            queue = TriageQueue(stations, clock=self.clock)
+            near = queue.submit('Ann', 'food', location=(43.27, -79.90))
+            far = queue.submit('Bob', 'food', location=(45.42, -75.70))
+            self.assertEqual(queue.ranked()[0]['id'], near)
+            queue.reprioritize(far, location=HAMILTON)
+            self.assertEqual(queue.ranked()[0]['id'], far)
+            self.assertTrue(queue.cancel(far))
+            self.assertEqual(len(queue), 1)
+
+    def test_distance_never_outweighs_need_and_unlocated_requests_are_neutral(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            stations = HelpStation(os.path.join(tmpdir, 'stations.json'))
+            stations.add_station('Depot', HAMILTON)
+            queue = TriageQueue(stations, clock=self.clock)
+            far = queue.submit('Ann', 'water', disaster_type='flood', location=(45.42, -75.70))
+            queue.submit('Bob', 'blankets')
+            near = queue.submit('Cy', 'food', location=HAMILTON)
+            unlocated = queue.submit('Dee', 'food')
+            farther = queue.submit('Eve', 'food', location=(45.42, -75.70))
+            self.assertEqual([r['name'] for r in queue.ranked()], ['Ann', 'Cy', 'Dee', 'Eve', 'Bob'])
+            self.assertAlmostEqual(queue.score(far), 5.0 - 0.2)
+            self.assertAlmostEqual(queue.score(near), 3.0 + 0.2)
+            self.assertAlmostEqual(queue.score(unlocated), 3.0)
+            self.assertAlmostEqual(queue.score(farther), 3.0 - 0.2)
+
+    def test_dispatch_assigns_scarce_trucks_by_priority(self):
+        storage = Storage()
+        storage.add_supplies('medical', 1)
+        storage.add_supplies('food', 10)
+        trucks = Truck()
+        trucks.add_truck('Truck 1')
+        trucks.add_truck('Truck 2')
+        self.queue.submit('Ann', 'food', 5)
+        self.queue.submit('Bob', 'water', 5, disaster_type='earthquake')  # out of stock
+        self.queue.submit('Cy', 'medical', 1, disaster_type='fire')
+        self.queue.submit('Dee', 'blankets', 1)
+        dispatched = self.queue.dispatch(storage, trucks)
+        self.assertEqual([(r['name'], truck) for r, truck in dispatched], [('Cy', 'Truck 1'), ('Ann', 'Truck 2')])
+        self.assertEqual(storage.check_inventory('food'), 5)
+        self.assertEqual(sorted(r['name'] for r in self.queue.ranked()), ['Bob', 'Dee'])
+
+    def test_queue_persists_between_sessions(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'queue.json')
+            queue = TriageQueue(clock=self.clock, persistence_file=path)
+            queue.submit('Ann', 'blankets', 2)
+            queue.submit('Bob', 'medical', 1, disaster_type='earthquake', location=(1, 2))
+            reloaded = TriageQueue(clock=self.clock, persistence_file=path)
+            self.assertEqual([r['name'] for r in reloaded.ranked()], ['Bob', 'Ann'])
+            self.assertEqual(reloaded.ranked()[0]['location'], (1, 2))
+            cy = reloaded.submit('Cy', 'water', 1)
+            self.assertEqual(cy, 3)
+            self.assertEqual(reloaded.position(cy), 2)
+            storage = Storage()
+            storage.add_supplies('medical', 1)
+            trucks = Truck()
+            trucks.add_truck('Truck 1')
+            reloaded.dispatch(storage, trucks)
+            self.assertEqual([r['name'] for r in TriageQueue(clock=self.clock, persistence_file=path).ranked()],
+                             ['Cy', 'Ann'])
+
+if __name__ == '__main__':
+    unittest.main()